@@ -2,6 +2,9 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to the live score endpoint are answered by ``football.live`` as
+Server-Sent Events, everything else is handled by Django, serving football
+reads with async views (see ``football.asynchronous``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -9,8 +12,15 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from football import asynchronous, fixtures, live  # noqa: E402
+
+django_application = asynchronous.ASGIHandler()
+
+fixtures.warm_up()
+application = live.router(django_application)
@@ -0,0 +1,13 @@
+"""
+URL configuration of the ASGI application
+
+The same as ``app.urls``, with football reads served by async views
+(see ``football.asynchronous``).
+"""
+from django.urls import include, path
+
+from app import urls
+
+urlpatterns = [
+    path('api/football/', include('football.async_urls')),
+] + urls.urlpatterns
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,18 +52,89 @@ LOCAL_APPS = [
     # My Applications
     'core.apps.CoreConfig',
     'user.apps.UserConfig',
+    'football.apps.FootballConfig',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',  # <-- And here
+        'user.authentication.CachedTokenAuthentication',  # <-- And here
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '10/min',
+    },
+}
+
+# Bounded pool running password checks of token issuance
+TOKEN_ISSUANCE = {
+    'MAX_CONCURRENCY': 2,
+    'MAX_QUEUE': 8,
+    'TIMEOUT': 10,
+}
+
+# Token -> user cache of CachedTokenAuthentication
+TOKEN_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+}
+
+# Cursor pagination of football list endpoints
+FOOTBALL_PAGINATION = {
+    'PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 1000,
+}
+
+# Days around today kept in memory for the fixtures endpoint
+FOOTBALL_FIXTURES = {
+    'DAYS_BEFORE': 1,
+    'DAYS_AFTER': 1,
+}
+
+# Rows read per database round trip by streaming exports
+FOOTBALL_EXPORT = {
+    'CHUNK_SIZE': 2000,
+}
+
+# Serve football lists from .values() rows through precompiled mappers
+# instead of ModelSerializer instances (same output, less CPU)
+FOOTBALL_FAST_LISTS = False
+
+# Async football reads of the ASGI application (football.asynchronous).
+# THREADS bounds the requests using database connections at once, URLCONF
+# None serves every request through Django's single sync thread instead
+FOOTBALL_ASYNC = {
+    'URLCONF': 'app.asgi_urls',
+    'THREADS': int(os.environ.get('FOOTBALL_ASYNC_THREADS', 32)),
+}
+
+# Write-behind queue of score updates (football.score_queue). Updates
+# arriving within WINDOW_MS are flushed in one transaction, writing each
+# match once. ACK 'commit' answers once the update is committed, 'queued'
+# answers 202 as soon as it is queued (lost if the process dies). Beyond
+# MAX_PENDING queued updates, writers get 503
+FOOTBALL_SCORE_QUEUE = {
+    'ENABLED': False,
+    'WINDOW_MS': 20,
+    'MAX_BATCH': 500,
+    'MAX_PENDING': 10000,
+    'ACK': 'commit',
+    'ACK_TIMEOUT': 10,
+}
+
+# Sampled per-route request metrics, served by /metrics to admin users
+# (scrapers send an admin token) unless PUBLIC. Sampled requests slower
+# than SLOW_REQUEST_MS are logged with their SQL (None disables)
+REQUEST_METRICS = {
+    'SAMPLE_RATE': float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', 0)),
+    'SLOW_REQUEST_MS': 1000,
+    'PUBLIC': False,
 }
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.InstrumentationMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,6 +145,14 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'app.urls'
 
+# Live score push channel (served by the ASGI application)
+FOOTBALL_LIVE = {
+    'BACKEND': 'football.live.LocalBackend',
+    'PATH': '/api/football/live/',
+    'KEEPALIVE': 15,
+    'QUEUE_SIZE': 100,
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -102,6 +182,62 @@ DATABASES = {
     }
 }
 
+# Applied to every SQLite connection (core.sqlite): WAL lets readers run
+# during writes, NORMAL syncs on checkpoints instead of every commit (use
+# FULL to survive power loss of the last commits), busy_timeout is in ms
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+}
+
+# Read replicas, e.g. DATABASE_REPLICAS=replica1,replica2 runs locally
+# with SQLite files standing in for replicas (copy db.sqlite3 to them or
+# run ``migrate --database replica1``). Tests mirror them to default.
+DATABASE_REPLICAS = {
+    'ALIASES': [
+        alias for alias in os.environ.get('DATABASE_REPLICAS', '').split(',')
+        if alias
+    ],
+    'APPS': ['core', 'authtoken'],
+    'STICKY_SECONDS': 5,
+}
+
+for alias in DATABASE_REPLICAS['ALIASES']:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Use a shared backend (Memcached, Redis) when running several workers,
+# otherwise cached football responses are only invalidated in the worker
+# handling the write.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'football': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'football',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+FOOTBALL_CACHE = {
+    'ALIAS': 'football',
+    'TIMEOUT': 60 * 60,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
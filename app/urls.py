@@ -16,9 +16,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
     path('api/', include('user.urls')),
     path('api/football/', include('football.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,10 +1,21 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 
 from core import football_models as football
 from core import models
+from football import search
+
+# Unfiltered changelists of tables estimated above this many rows show
+# the estimate instead of counting every row
+EXACT_COUNT_LIMIT = 10000
+# Most objects a search of the name index returns
+SEARCH_LIMIT = 1000
 
 
 class UserAdmin(BaseUserAdmin):
@@ -33,10 +44,113 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+def estimate_count(queryset):
+    """
+    Return the estimated row count of the table of ``queryset``
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
+    # Rows are rarely deleted, the highest id is read from the index
+    return queryset.model._default_manager.db_manager(
+        queryset.db).aggregate(highest=Max('pk'))['highest'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator estimating the count of unfiltered large tables
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class FootballAdmin(admin.ModelAdmin):
+    """
+    Admin of football tables which may hold millions of rows
+    """
+    paginator = EstimatedCountPaginator
+    # Avoids counting the whole table next to filtered results
+    show_full_result_count = False
+
+
+def search_pks(model, search_term):
+    """
+    Return pks of ``model`` objects with a word starting with the term
+    """
+    return list(search.prefix_matches(
+        search.KINDS[model], search.normalize(search_term), SEARCH_LIMIT))
+
+
+class NameSearchAdmin(FootballAdmin):
+    """
+    Admin searching names through the ``football.search`` index
+    """
+    search_fields = ('name',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        pks = search_pks(self.model, search_term)
+        return queryset.filter(pk__in=pks), False
+
+
+class LeagueAdmin(FootballAdmin):
+    search_fields = ('name',)
+    list_display = ('name', 'country')
+
+
+class ClubAdmin(NameSearchAdmin):
+    list_display = ('name', 'league')
+    list_select_related = ('league',)
+    autocomplete_fields = ('league',)
+
+
+class PositionAdmin(FootballAdmin):
+    search_fields = ('short_name', 'long_name')
+    list_display = ('long_name', 'short_name')
+
+
+class PlayerAdmin(NameSearchAdmin):
+    list_display = ('name', 'number', 'club', 'position')
+    list_select_related = ('club', 'position')
+    autocomplete_fields = ('club', 'position')
+
+
+class MatchAdmin(FootballAdmin):
+    # Match.__str__ renders both clubs
+    list_select_related = ('home_team', 'away_team')
+    list_display = ('__str__', 'date', 'home_team_score', 'away_team_score')
+    date_hierarchy = 'date'
+    # Ordered by the (date, id) index
+    ordering = ('-date', '-id')
+    autocomplete_fields = ('home_team', 'away_team')
+    # Searches club names, see get_search_results
+    search_fields = ('home_team__name', 'away_team__name')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        pks = search_pks(football.Club, search_term)
+        # Both teams are indexed together with date
+        return queryset.filter(
+            Q(home_team__in=pks) | Q(away_team__in=pks)), False
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.unregister(Group)
-admin.site.register(football.League)
-admin.site.register(football.Club)
-admin.site.register(football.Match)
-admin.site.register(football.Player)
-admin.site.register(football.Position)
+admin.site.register(football.League, LeagueAdmin)
+admin.site.register(football.Club, ClubAdmin)
+admin.site.register(football.Match, MatchAdmin)
+admin.site.register(football.Player, PlayerAdmin)
+admin.site.register(football.Position, PositionAdmin)
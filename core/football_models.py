@@ -1,4 +1,5 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
 from django_countries.fields import CountryField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import ugettext_lazy as _
@@ -8,15 +9,22 @@ class League(models.Model):
     name = models.CharField(max_length=100)
     country = CountryField()
 
+    class Meta:
+        indexes = [models.Index(fields=['country'])]
+
     def __str__(self):
         return self.name
 
 
 class Club(models.Model):
+    # Indexed by (league, name) below
     league = models.ForeignKey(
-        League, on_delete=models.CASCADE)
+        League, on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [models.Index(fields=['league', 'name'])]
+
     def __str__(self):
         return self.name
 
@@ -36,27 +44,43 @@ class Player(models.Model):
     age = models.IntegerField()
     nationality = CountryField(max_length=100)
     position = models.ForeignKey(Position, on_delete=models.DO_NOTHING)
-    club = models.ForeignKey(Club, on_delete=models.DO_NOTHING)
+    # Indexed by the unique (club, number) constraint
+    club = models.ForeignKey(
+        Club, on_delete=models.DO_NOTHING, db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['club', 'number'], name='unique_club_number'),
+        ]
 
     def clean(self, *args, **kwargs):
-        from django.core.exceptions import ValidationError
-        reserved_numbers = self._get_all_reserved_numbers()
-        print(reserved_numbers)
-        if self.number in reserved_numbers:
-            raise ValidationError(
-                _(f"{self.number} is reserved"))
+        if self._is_number_reserved():
+            raise self._number_reserved_error()
         super().clean(*args, **kwargs)
 
-    def _get_all_reserved_numbers(self):
-        reserved_numbers = []
-        players = Player.objects.filter(club__name=self.club.name)
-        for player in players:
-            reserved_numbers.append(player.number)
-        return reserved_numbers
+    def _is_number_reserved(self):
+        players = Player.objects.filter(
+            club_id=self.club_id, number=self.number)
+        if self.pk is not None:
+            players = players.exclude(pk=self.pk)
+        return players.exists()
+
+    def _number_reserved_error(self):
+        return ValidationError({'number': ValidationError(
+            _("%(number)s is reserved"), code='reserved',
+            params={'number': self.number})})
 
     def save(self, *args, **kwargs):
-        self.clean(*args, **kwargs)
-        super().save(*args, **kwargs)
+        self.clean()
+        try:
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+        except IntegrityError:
+            # Lost a race with a concurrent save of the same number
+            if self._is_number_reserved():
+                raise self._number_reserved_error()
+            raise
 
     def __str__(self):
         return f"{self.name}"
@@ -66,26 +90,217 @@ class Contract(models.Model):
     pass
 
 
+class MatchConflict(Exception):
+    """
+    Raised when saving a match written since it was loaded
+    """
+
+
 class Match(models.Model):
+    # Teams are indexed together with date below
     home_team = models.ForeignKey(Club,
                                   related_name='home_matches',
-                                  on_delete=models.CASCADE)
+                                  on_delete=models.CASCADE,
+                                  db_index=False)
     away_team = models.ForeignKey(Club,
                                   related_name='away_matches',
-                                  on_delete=models.CASCADE)
+                                  on_delete=models.CASCADE,
+                                  db_index=False)
     date = models.DateField()
     home_team_score = models.IntegerField()
     away_team_score = models.IntegerField()
+    # Sequence number of the last MatchEvent
+    last_event_sequence = models.PositiveIntegerField(default=0)
+    # Bumped by every score write, compared by concurrent score updates
+    version = models.PositiveIntegerField(default=0)
+    # Client supplied id of the last score update, to detect retries
+    last_update_id = models.CharField(max_length=64, blank=True)
 
     class Meta:
         verbose_name = "Football Exhibition"
+        indexes = [
+            models.Index(fields=['date', 'id']),
+            models.Index(fields=['home_team', 'date']),
+            models.Index(fields=['away_team', 'date']),
+        ]
 
     def clean(self, *args, **kwargs):
-        from django.core.exceptions import ValidationError
-        if self.home_team == self.away_team:
+        if self.home_team_id is not None and \
+                self.home_team_id == self.away_team_id:
             raise ValidationError(
                 _("Same Team can not play against eatch other"))
         super().clean(*args, **kwargs)
 
+    def save(self, *args, **kwargs):
+        self._saved_version = None
+        if not self._state.adding:
+            self._saved_version = self.version
+            self.version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+        try:
+            # Standings are diffed against the loaded state by signals
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+        except MatchConflict:
+            self.version = self._saved_version
+            raise
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        """
+        Update the row only if it is still at the version loaded
+        """
+        if getattr(self, '_saved_version', None) is None:
+            return super()._do_update(base_qs, using, pk_val, values,
+                                      update_fields, forced_update)
+        updated = super()._do_update(
+            base_qs.filter(version=self._saved_version), using, pk_val,
+            values, update_fields, forced_update)
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise MatchConflict(
+                f'Match {pk_val} was written since version '
+                f'{self._saved_version} was loaded')
+        return updated
+
     def __str__(self):
         return f"{self.home_team} - {self.away_team}"
+
+
+class MatchEvent(models.Model):
+    """
+    Append-only timeline entry of a match, numbered per match
+    """
+    GOAL = 'goal'
+    CARD = 'card'
+    SUBSTITUTION = 'substitution'
+    PERIOD = 'period'
+    KIND_CHOICES = (
+        (GOAL, 'Goal'),
+        (CARD, 'Card'),
+        (SUBSTITUTION, 'Substitution'),
+        (PERIOD, 'Period change'),
+    )
+    HOME = 'home'
+    AWAY = 'away'
+    SIDE_CHOICES = ((HOME, 'Home'), (AWAY, 'Away'))
+
+    # Indexed by (match, sequence) below
+    match = models.ForeignKey(
+        Match, related_name='events', on_delete=models.CASCADE,
+        db_index=False)
+    sequence = models.PositiveIntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Team the event is credited to, empty for period changes
+    side = models.CharField(max_length=4, choices=SIDE_CHOICES, blank=True)
+    minute = models.PositiveSmallIntegerField(null=True, blank=True)
+    player = models.ForeignKey(
+        Player, related_name='+', null=True, blank=True,
+        on_delete=models.SET_NULL)
+    detail = models.CharField(max_length=100, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('match', 'sequence')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['match', 'sequence'],
+                name='unique_match_event_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.match_id}#{self.sequence} {self.kind}"
+
+
+class Standing(models.Model):
+    """
+    League table row of a club, maintained incrementally from Matches
+    """
+    # Indexed by (league, rank) below
+    league = models.ForeignKey(
+        League, related_name='standings', on_delete=models.CASCADE,
+        db_index=False)
+    club = models.OneToOneField(
+        Club, related_name='standing', on_delete=models.CASCADE)
+    rank = models.PositiveIntegerField(default=0)
+    played = models.PositiveIntegerField(default=0)
+    won = models.PositiveIntegerField(default=0)
+    drawn = models.PositiveIntegerField(default=0)
+    lost = models.PositiveIntegerField(default=0)
+    goals_for = models.PositiveIntegerField(default=0)
+    goals_against = models.PositiveIntegerField(default=0)
+    points = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('league', 'rank')
+        indexes = [models.Index(fields=['league', 'rank'])]
+
+    @property
+    def goal_difference(self):
+        return self.goals_for - self.goals_against
+
+    def __str__(self):
+        return f"{self.rank}. {self.club}"
+
+
+class Change(models.Model):
+    """
+    Entry of the football change log, its id is the log version
+    """
+    # Kind of the entries telling clients to download everything again
+    RESET = '*'
+
+    kind = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField(default=0)
+    deleted = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', 'object_id'])]
+
+    def __str__(self):
+        return f"{self.pk}: {self.kind} {self.object_id}"
+
+
+class SearchTerm(models.Model):
+    """
+    Normalized name of a Club or Player from one of its words to the end,
+    for prefix search
+    """
+    kind = models.CharField(max_length=10)
+    object_id = models.PositiveIntegerField()
+    term = models.CharField(max_length=100)
+    # 0 when the term is the whole name, 1 when it starts at a later word
+    tier = models.PositiveSmallIntegerField()
+    # Index of the word the term starts at
+    position = models.PositiveSmallIntegerField()
+    # Length of the whole normalized name
+    length = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'tier', 'term']),
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class SearchTrigram(models.Model):
+    """
+    Trigram of the normalized name of a Club or Player, for fuzzy search
+    """
+    kind = models.CharField(max_length=10)
+    object_id = models.PositiveIntegerField()
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'trigram', 'object_id']),
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+    def __str__(self):
+        return self.trigram
@@ -0,0 +1,196 @@
+"""
+Per-route request metrics in the Prometheus text format
+
+``core.middleware.InstrumentationMiddleware`` measures a sample of requests
+and adds them to the histograms below, which ``/metrics`` renders. Metrics
+live in process memory, so with several workers each one is scraped on its
+own (or the scraper sums what it sees).
+"""
+import bisect
+import threading
+
+from django.conf import settings
+
+DEFAULT_SAMPLE_RATE = 0.0
+DEFAULT_SLOW_REQUEST_MS = 1000
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576,
+                4194304)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def get_option(name, default):
+    return getattr(settings, 'REQUEST_METRICS', {}).get(name, default)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"').replace('\n', r'\n'))
+        for name, value in labels)
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    """
+    Cumulative histogram per set of label values
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [
+                    [0] * len(self.buckets), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total, count)
+                      for labels, (counts, total, count)
+                      in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            labels = list(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (f'{self.name}_bucket',
+                       labels + [('le', format_value(bound))], cumulative)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Collector:
+    """
+    Gauges or counters read from a callable at scrape time
+    """
+    def __init__(self, name, documentation, kind, collect):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, list(labels), value
+
+    def clear(self):
+        pass
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(
+                    f'{name}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = Registry()
+
+REQUEST_LABELS = ('route', 'method')
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time to build the response.',
+    REQUEST_LABELS + ('status',), TIME_BUCKETS))
+db_queries = registry.register(Histogram(
+    'http_request_db_queries', 'Database queries run per request.',
+    REQUEST_LABELS, QUERY_BUCKETS))
+db_duration = registry.register(Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries.',
+    REQUEST_LABELS, TIME_BUCKETS))
+view_duration = registry.register(Histogram(
+    'http_request_view_duration_seconds',
+    'Time spent in views and serializers, excluding database queries.',
+    REQUEST_LABELS, TIME_BUCKETS))
+render_duration = registry.register(Histogram(
+    'http_request_render_duration_seconds', 'Time spent rendering.',
+    REQUEST_LABELS, TIME_BUCKETS))
+response_size = registry.register(Histogram(
+    'http_response_size_bytes', 'Size of non streaming response bodies.',
+    REQUEST_LABELS, SIZE_BUCKETS))
+
+score_queue_wait = registry.register(Histogram(
+    'score_queue_wait_seconds',
+    'Time score updates spent queued before their flush started.', (),
+    TIME_BUCKETS))
+score_queue_flush = registry.register(Histogram(
+    'score_queue_flush_seconds', 'Time to write one batch of score updates.',
+    (), TIME_BUCKETS))
+score_queue_batch = registry.register(Histogram(
+    'score_queue_batch_size', 'Score updates written per batch.', (),
+    BATCH_BUCKETS))
+
+
+def token_cache_stats():
+    from user.authentication import token_cache
+
+    return [((('stat', name),), value)
+            for name, value in sorted(token_cache.stats().items())]
+
+
+def password_check_stats():
+    from user.admission import password_checks
+
+    return [((('stat', 'pending'),), password_checks.pending),
+            ((('stat', 'rejected'),), password_checks.rejected)]
+
+
+def score_queue_stats():
+    from football import score_queue
+
+    stats = score_queue.get_queue().stats()
+    return [((('stat', name),), value) for name, value in sorted(
+        stats.items())]
+
+
+registry.register(Collector(
+    'token_cache', 'Token cache hits, misses, evictions and size.', 'gauge',
+    token_cache_stats))
+registry.register(Collector(
+    'password_checks', 'Pending and rejected login password checks.',
+    'gauge', password_check_stats))
+registry.register(Collector(
+    'score_queue', 'Pending score updates, and totals of submitted, '
+    'coalesced, rejected, conflicting and failed ones.', 'gauge',
+    score_queue_stats))
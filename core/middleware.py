@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from core import metrics
+from core.routers import get_option, use_replica
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+DEFAULT_STICKY_SECONDS = 5
+
+
+class AsyncCapableMiddleware:
+    """
+    Middleware called as a coroutine when the rest of the chain is async,
+    so that it does not make Django run the chain in its sync thread.
+    Subclasses override ``handle`` and ``__acall__``, which pass the
+    request on by default
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks instances as coroutine functions for Django
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class ReplicaMiddleware(AsyncCapableMiddleware):
+    """
+    Allow replica reads for safe requests, except shortly after the client
+    wrote. Writes are remembered by a ``primary_until`` cookie, repeated in
+    the ``X-Primary-Until`` header for clients not keeping cookies.
+    """
+    cookie_name = 'primary_until'
+    header_name = 'X-Primary-Until'
+
+    def handle(self, request):
+        token = self.set_replica(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        return self.remember_write(request, response)
+
+    async def __acall__(self, request):
+        token = self.set_replica(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        return self.remember_write(request, response)
+
+    def set_replica(self, request):
+        return use_replica.set(
+            request.method in SAFE_METHODS and not self.is_sticky(request))
+
+    def remember_write(self, request, response):
+        if request.method not in SAFE_METHODS:
+            sticky = get_option('STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+            until = str(int(time.time() + sticky) + 1)
+            response.set_cookie(
+                self.cookie_name, until, max_age=sticky + 1, httponly=True,
+                samesite='Lax')
+            response[self.header_name] = until
+        return response
+
+    def is_sticky(self, request):
+        value = request.COOKIES.get(self.cookie_name) or request.META.get(
+            'HTTP_' + self.header_name.upper().replace('-', '_'))
+        try:
+            return float(value) > time.time()
+        except (TypeError, ValueError):
+            return False
+
+
+class RequestTimings:
+    """
+    Database, view and render timings of one sampled request
+    """
+    def __init__(self, keep_sql):
+        self.keep_sql = keep_sql
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = []
+        self.render_start = self.render_end = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            if self.keep_sql:
+                self.sql.append((duration, sql))
+
+
+class InstrumentationMiddleware(AsyncCapableMiddleware):
+    """
+    Measure a sample of requests per route: database queries, view and
+    serializer time, render time and response size. Sampled responses get
+    a ``Server-Timing`` header, and slow ones are logged with their SQL.
+    Requests that are not sampled only cost a random number. Under ASGI,
+    queries run by ``football.asynchronous`` views are the ones recorded.
+    """
+    def handle(self, request):
+        timings = self.sample(request)
+        if timings is None:
+            return self.get_response(request)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        self.finish(request, response, timings, start)
+        return response
+
+    async def __acall__(self, request):
+        timings = self.sample(request)
+        if timings is None:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.finish(request, response, timings, start)
+        return response
+
+    def sample(self, request):
+        """
+        Return timings to fill if ``request`` is sampled
+        """
+        sample_rate = metrics.get_option(
+            'SAMPLE_RATE', metrics.DEFAULT_SAMPLE_RATE)
+        if not sample_rate or random.random() >= sample_rate:
+            return None
+        request._timings = RequestTimings(keep_sql=metrics.get_option(
+            'SLOW_REQUEST_MS', metrics.DEFAULT_SLOW_REQUEST_MS) is not None)
+        return request._timings
+
+    def finish(self, request, response, timings, start):
+        total = time.perf_counter() - start
+        self.record(request, response, timings, total)
+        slow_ms = metrics.get_option(
+            'SLOW_REQUEST_MS', metrics.DEFAULT_SLOW_REQUEST_MS)
+        if slow_ms is not None and total * 1000 >= slow_ms:
+            self.log_slow_request(request, response, timings, total)
+
+    def process_template_response(self, request, response):
+        timings = getattr(request, '_timings', None)
+        if timings is not None:
+            timings.render_start = time.perf_counter()
+
+            def rendered(response):
+                timings.render_end = time.perf_counter()
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, timings, total):
+        match = request.resolver_match
+        labels = (match.route if match else '<unmatched>', request.method)
+        render = 0.0
+        if timings.render_end is not None:
+            render = timings.render_end - timings.render_start
+        view = max(0.0, total - render - timings.db_time)
+
+        metrics.request_duration.observe(
+            total, *labels, str(response.status_code))
+        metrics.db_queries.observe(timings.queries, *labels)
+        metrics.db_duration.observe(timings.db_time, *labels)
+        metrics.view_duration.observe(view, *labels)
+        metrics.render_duration.observe(render, *labels)
+        if not response.streaming:
+            metrics.response_size.observe(len(response.content), *labels)
+
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timings.db_time * 1000:.3f};'
+            f'desc="{timings.queries} queries"',
+            f'view;dur={view * 1000:.3f}',
+            f'render;dur={render * 1000:.3f}',
+            f'total;dur={total * 1000:.3f}',
+        ))
+
+    def log_slow_request(self, request, response, timings, total):
+        logger.warning(
+            'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms\n%s',
+            request.method, request.get_full_path(), response.status_code,
+            total * 1000, timings.queries, timings.db_time * 1000,
+            '\n'.join(f'  {duration * 1000:.1f} ms  {sql}'
+                      for duration, sql in timings.sql),
+        )
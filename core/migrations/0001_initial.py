@@ -0,0 +1,151 @@
+# Generated by Django 3.1.5 on 2026-10-18 12:05
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django_countries.fields
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('email', models.EmailField(max_length=255, unique=True, verbose_name='email address')),
+                ('name', models.CharField(blank=True, max_length=50, verbose_name='name')),
+                ('is_active', models.BooleanField(default=True, verbose_name='is_active')),
+                ('is_staff', models.BooleanField(default=False)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Club',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Contract',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='League',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('country', django_countries.fields.CountryField(max_length=2)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('short_name', models.CharField(max_length=3)),
+                ('long_name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Standing',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(default=0)),
+                ('played', models.PositiveIntegerField(default=0)),
+                ('won', models.PositiveIntegerField(default=0)),
+                ('drawn', models.PositiveIntegerField(default=0)),
+                ('lost', models.PositiveIntegerField(default=0)),
+                ('goals_for', models.PositiveIntegerField(default=0)),
+                ('goals_against', models.PositiveIntegerField(default=0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('club', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='standing', to='core.club')),
+                ('league', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='core.league')),
+            ],
+            options={
+                'ordering': ('league', 'rank'),
+            },
+        ),
+        migrations.CreateModel(
+            name='Player',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('number', models.IntegerField(validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('age', models.IntegerField()),
+                ('nationality', django_countries.fields.CountryField(max_length=100)),
+                ('club', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='core.club')),
+                ('position', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='core.position')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Match',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('home_team_score', models.IntegerField()),
+                ('away_team_score', models.IntegerField()),
+                ('away_team', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='away_matches', to='core.club')),
+                ('home_team', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='home_matches', to='core.club')),
+            ],
+            options={
+                'verbose_name': 'Football Exhibition',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='league',
+            index=models.Index(fields=['country'], name='core_league_country_1f3c4a_idx'),
+        ),
+        migrations.AddField(
+            model_name='club',
+            name='league',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.league'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.Group', verbose_name='groups'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='user_permissions',
+            field=models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.Permission', verbose_name='user permissions'),
+        ),
+        migrations.AddIndex(
+            model_name='standing',
+            index=models.Index(fields=['league', 'rank'], name='core_standi_league__ad0754_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='player',
+            constraint=models.UniqueConstraint(fields=('club', 'number'), name='unique_club_number'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['date', 'id'], name='core_match_date_2596ac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['home_team', 'date'], name='core_match_home_te_6f2a0f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['away_team', 'date'], name='core_match_away_te_e8dbc7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='club',
+            index=models.Index(fields=['league', 'name'], name='core_club_league__29addf_idx'),
+        ),
+    ]
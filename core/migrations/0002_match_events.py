@@ -0,0 +1,40 @@
+# Generated by Django 3.1.5 on 2026-10-18 12:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='last_event_sequence',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='MatchEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('goal', 'Goal'), ('card', 'Card'), ('substitution', 'Substitution'), ('period', 'Period change')], max_length=20)),
+                ('side', models.CharField(blank=True, choices=[('home', 'Home'), ('away', 'Away')], max_length=4)),
+                ('minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('detail', models.CharField(blank=True, max_length=100)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('match', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='core.match')),
+                ('player', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.player')),
+            ],
+            options={
+                'ordering': ('match', 'sequence'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='matchevent',
+            constraint=models.UniqueConstraint(fields=('match', 'sequence'), name='unique_match_event_sequence'),
+        ),
+    ]
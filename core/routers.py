@@ -0,0 +1,64 @@
+"""
+Read replica routing with read-your-writes stickiness
+
+Reads are sent to a replica only while ``core.middleware.ReplicaMiddleware``
+marks the current request as a safe, non sticky one. Everything else,
+including management commands and reads inside a transaction on the primary,
+uses the primary database.
+
+Stickiness only covers the client that wrote. Responses cached for every
+client are keyed by versions bumped on the primary, so a body read from a
+replica behind them would be served as current until the next write:
+reads filling shared caches must run in ``primary_reads()``.
+"""
+import contextlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+use_replica = ContextVar('use_replica', default=False)
+
+
+def get_option(name, default):
+    return getattr(settings, 'DATABASE_REPLICAS', {}).get(name, default)
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """
+    Send the reads of the block to the primary database
+    """
+    token = use_replica.set(False)
+    try:
+        yield
+    finally:
+        use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Route reads of ``DATABASE_REPLICAS['APPS']`` to replica aliases
+    """
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if not use_replica.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in get_option('APPS', ()):
+            return DEFAULT_DB_ALIAS
+        replicas = get_option('ALIASES', ())
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_option('ALIASES', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,23 @@
+"""
+Pragmas of SQLite connections
+
+The default journal makes writers block readers and every commit sync
+the database file. ``SQLITE_PRAGMAS`` is applied to every new SQLite
+connection, e.g. ``journal_mode=WAL`` lets readers run during a write and
+``busy_timeout`` makes writers wait for the lock instead of failing.
+"""
+from django.conf import settings
+
+DEFAULT_PRAGMAS = {}
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    Apply ``SQLITE_PRAGMAS`` to a new SQLite connection
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+    # On the DB-API connection, not counted as queries of the request
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,81 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import admin, football_models
+
+
+class FootballAdminTests(TestCase):
+    """
+    Test the admin changelists of football tables
+    """
+    def setUp(self):
+        user = get_user_model().objects.create_superuser(
+            'admin@example.com', 'password')
+        self.client.force_login(user)
+        league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.clubs = [
+            football_models.Club.objects.create(league=league, name=name)
+            for name in ('Legia Warszawa', 'Lech Poznań', 'Wisła Kraków')
+        ]
+
+    def create_matches(self, count):
+        for day in range(count):
+            football_models.Match.objects.create(
+                home_team=self.clubs[day % 2], away_team=self.clubs[2],
+                date=datetime.date(2021, 1, 1 + day),
+                home_team_score=0, away_team_score=0)
+
+    def changelist_queries(self, params=None):
+        url = reverse('admin:core_match_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_match_changelist_queries(self):
+        """
+        Test that listing matches does not query clubs per row
+        """
+        self.create_matches(2)
+        queries = self.changelist_queries()
+        self.create_matches(6)
+        self.assertEqual(self.changelist_queries(), queries)
+
+    def test_match_search_by_club(self):
+        """
+        Test that matches are found by club names through the index
+        """
+        self.create_matches(3)
+        response = self.client.get(
+            reverse('admin:core_match_changelist'), {'q': 'lech'})
+        self.assertEqual(
+            [match.home_team_id
+             for match in response.context['cl'].result_list],
+            [self.clubs[1].id])
+        response = self.client.get(
+            reverse('admin:core_club_changelist'), {'q': 'krakow'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.clubs[2]])
+
+    def test_estimated_count(self):
+        """
+        Test that unfiltered large tables are not counted
+        """
+        self.create_matches(3)
+        with mock.patch.object(admin, 'EXACT_COUNT_LIMIT', 1):
+            response = self.client.get(
+                reverse('admin:core_match_changelist'))
+        self.assertEqual(response.context['cl'].result_count,
+                         football_models.Match.objects.latest('pk').pk)
+        self.assertIsNone(response.context['cl'].full_result_count)
+
+        response = self.client.get(
+            reverse('admin:core_match_changelist'), {'q': 'legia'})
+        self.assertEqual(response.context['cl'].result_count, 2)
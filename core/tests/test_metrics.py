@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core import football_models, metrics
+
+
+class InstrumentationTests(TestCase):
+    """
+    Test request instrumentation and the metrics endpoint
+    """
+    def setUp(self):
+        metrics.registry.clear()
+        football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@test.com', 'adminpassword123')
+        self.client.force_login(self.admin)
+
+    def tearDown(self):
+        metrics.registry.clear()
+
+    @override_settings(REQUEST_METRICS={'SAMPLE_RATE': 1.0,
+                                        'SLOW_REQUEST_MS': None})
+    def test_sampled_request_is_measured(self):
+        """
+        Test that sampled requests get Server-Timing and per route histograms
+        """
+        response = self.client.get(reverse('football:league-list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+
+        content = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'http_request_db_queries_bucket{route="api/football/leagues/$",'
+            'method="GET",le="1"} 1', content)
+        self.assertIn('http_response_size_bytes_count{route=', content)
+        self.assertIn('# TYPE http_request_duration_seconds histogram',
+                      content)
+        self.assertIn('token_cache{stat="hits"}', content)
+
+    @override_settings(REQUEST_METRICS={'SAMPLE_RATE': 0})
+    def test_unsampled_request_is_not_measured(self):
+        """
+        Test that nothing is recorded when sampling is off
+        """
+        response = self.client.get(reverse('football:league-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        content = self.client.get(reverse('metrics')).content.decode()
+        self.assertNotIn('http_request_db_queries_bucket', content)
+
+    @override_settings(REQUEST_METRICS={'SAMPLE_RATE': 1.0,
+                                        'SLOW_REQUEST_MS': 0})
+    def test_slow_request_is_logged_with_sql(self):
+        """
+        Test that slow requests are logged with their queries
+        """
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('football:league-list'))
+        message = logs.output[0]
+        self.assertIn('Slow request GET /api/football/leagues/', message)
+        self.assertIn('SELECT', message)
+
+    def test_metrics_access(self):
+        """
+        Test that metrics are served to admins, by session or token
+        """
+        self.client.logout()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 401)
+        user = get_user_model().objects.create_user(
+            'user@test.com', 'userpassword123')
+        self.client.force_login(user)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.logout()
+        token = Token.objects.create(user=self.admin)
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4')
+
+        with override_settings(REQUEST_METRICS={'PUBLIC': True}):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
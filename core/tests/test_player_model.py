@@ -0,0 +1,62 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from core import football_models
+
+
+class PlayerModelTests(TestCase):
+    """
+    Test shirt number reservation of Player Model
+    """
+    def setUp(self):
+        league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.club = football_models.Club.objects.create(
+            league=league, name='Legia')
+        self.other_club = football_models.Club.objects.create(
+            league=league, name='Lech')
+        self.position = football_models.Position.objects.create(
+            short_name='GK', long_name='Goalkeeper')
+
+    def create_player(self, club, number, name='Player'):
+        return football_models.Player.objects.create(
+            name=name, number=number, age=25, nationality='PL',
+            position=self.position, club=club)
+
+    def test_reserved_number_raises_validation_error(self):
+        """
+        Test that a number taken in the club is rejected
+        """
+        self.create_player(self.club, 1)
+        with self.assertRaises(ValidationError) as error:
+            self.create_player(self.club, 1, name='Second')
+        self.assertIn('number', error.exception.message_dict)
+
+    def test_same_number_in_other_club(self):
+        """
+        Test that numbers are reserved per club
+        """
+        self.create_player(self.club, 1)
+        player = self.create_player(self.other_club, 1)
+        self.assertEqual(player.number, 1)
+
+    def test_resave_keeps_own_number(self):
+        """
+        Test that a player does not collide with itself
+        """
+        player = self.create_player(self.club, 1)
+        player.age = 26
+        with self.assertNumQueries(4):
+            player.save()
+
+    def test_constraint_is_mapped_to_validation_error(self):
+        """
+        Test that a violation found by the database is a validation error
+        """
+        self.create_player(self.club, 1)
+        player = football_models.Player(
+            name='Second', number=1, age=25, nationality='PL',
+            position=self.position, club=self.club)
+        player.clean = lambda: None
+        with self.assertRaises(ValidationError):
+            player.save()
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase,
+                         TransactionTestCase, override_settings)
+
+from core import football_models
+from core.middleware import AsyncCapableMiddleware, ReplicaMiddleware
+from core.routers import ReplicaRouter, primary_reads, use_replica
+
+REPLICAS = {
+    'ALIASES': ['replica1', 'replica2'],
+    'APPS': ['core'],
+    'STICKY_SECONDS': 5,
+}
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    Test routing reads between primary and replicas
+    """
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.token = use_replica.set(True)
+
+    def tearDown(self):
+        use_replica.reset(self.token)
+
+    def test_reads_go_to_replicas(self):
+        """
+        Test that safe request reads use a replica and writes the primary
+        """
+        self.assertIn(self.router.db_for_read(football_models.Club),
+                      REPLICAS['ALIASES'])
+        self.assertEqual(
+            self.router.db_for_write(football_models.Club), 'default')
+
+    def test_reads_outside_requests_use_primary(self):
+        """
+        Test that reads default to the primary
+        """
+        use_replica.set(False)
+        self.assertEqual(
+            self.router.db_for_read(football_models.Club), 'default')
+
+    def test_primary_reads(self):
+        """
+        Test that reads filling shared caches can be kept on the primary
+        """
+        with primary_reads():
+            self.assertEqual(
+                self.router.db_for_read(football_models.Club), 'default')
+        self.assertIn(self.router.db_for_read(football_models.Club),
+                      REPLICAS['ALIASES'])
+
+    def test_reads_in_transaction_use_primary(self):
+        """
+        Test that reads inside a transaction see its writes
+        """
+        with transaction.atomic():
+            self.assertEqual(
+                self.router.db_for_read(football_models.Club), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    """
+    Test read-your-writes stickiness
+    """
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+
+        def view(request):
+            self.seen.append(use_replica.get())
+            return HttpResponse()
+
+        self.middleware = ReplicaMiddleware(view)
+
+    def test_write_pins_following_reads_to_primary(self):
+        """
+        Test that a write sets a cookie keeping reads on the primary
+        """
+        response = self.middleware(self.factory.post('/'))
+        cookie = response.cookies['primary_until'].value
+        self.assertGreater(float(cookie), time.time())
+        self.assertEqual(response['X-Primary-Until'], cookie)
+
+        request = self.factory.get('/')
+        request.COOKIES['primary_until'] = cookie
+        self.middleware(request)
+        self.middleware(self.factory.get('/', HTTP_X_PRIMARY_UNTIL=cookie))
+        self.middleware(self.factory.get('/'))
+        self.assertEqual(self.seen, [False, False, False, True])
+
+    def test_expired_stickiness(self):
+        """
+        Test that an expired marker allows replica reads again
+        """
+        request = self.factory.get('/')
+        request.COOKIES['primary_until'] = str(time.time() - 1)
+        self.middleware(request)
+        self.assertEqual(self.seen, [True])
+        self.assertFalse(use_replica.get())
+
+    def test_async_chain(self):
+        """
+        Test that the middleware is called as a coroutine in async chains
+        """
+        async def view(request):
+            self.seen.append(use_replica.get())
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(self.factory.post('/'))
+        self.assertIn('primary_until', response.cookies)
+        async_to_sync(middleware)(self.factory.get('/'))
+        self.assertEqual(self.seen, [False, True])
+
+    def test_base_middleware_passes_requests_on(self):
+        """
+        Test that the base hooks return the response of the chain
+        """
+        response = HttpResponse()
+
+        async def view(request):
+            return response
+
+        request = self.factory.get('/')
+        self.assertIs(
+            AsyncCapableMiddleware(lambda request: response)(request),
+            response)
+        self.assertIs(
+            async_to_sync(AsyncCapableMiddleware(view))(request), response)
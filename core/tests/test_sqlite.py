@@ -0,0 +1,15 @@
+from django.db import connection
+from django.test import TestCase
+
+
+class SqlitePragmaTests(TestCase):
+    """
+    Test the pragmas applied to SQLite connections
+    """
+    def test_busy_timeout(self):
+        """
+        Test that new connections wait for the database lock
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
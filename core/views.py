@@ -0,0 +1,28 @@
+from django.http import HttpResponse
+from rest_framework import authentication, permissions
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from core import metrics
+
+
+class MetricsView(APIView):
+    """
+    Request metrics in the Prometheus text format, for admins unless
+    ``REQUEST_METRICS['PUBLIC']``
+    """
+    # Scrapers send an admin token, admins browse with their session
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES + [
+        authentication.SessionAuthentication]
+
+    def get_permissions(self):
+        if metrics.get_option('PUBLIC', False):
+            return [permissions.AllowAny()]
+        return [permissions.IsAdminUser()]
+
+    def get(self, request):
+        return HttpResponse(metrics.registry.render(),
+                            content_type='text/plain; version=0.0.4')
+
+
+metrics_view = MetricsView.as_view()
@@ -0,0 +1,107 @@
+"""
+Team form and head-to-head records aggregated in the database
+
+Matches of a club are read through ``home_matches`` and ``away_matches``
+separately, so each query is served by the ``(home_team, date)`` or
+``(away_team, date)`` index, and wins, draws, losses and goals are summed
+with conditional aggregates instead of loading the matches.
+"""
+from django.db.models import (Case, CharField, Count, F, Max, Q, Sum, Value,
+                              When)
+
+from football.standings import POINTS_FOR_DRAW, POINTS_FOR_WIN
+
+DEFAULT_FORM_LENGTH = 5
+MAX_FORM_LENGTH = 50
+
+# Score fields as (goals for, goals against) of the club on each side
+SIDES = {
+    'home': ('home_team_score', 'away_team_score'),
+    'away': ('away_team_score', 'home_team_score'),
+}
+RECORD_FIELDS = ('played', 'won', 'drawn', 'lost', 'goals_for',
+                 'goals_against')
+
+
+def record(queryset, side):
+    """
+    Aggregate results of ``queryset`` from the point of view of ``side``
+    """
+    goals_for, goals_against = SIDES[side]
+    totals = queryset.aggregate(
+        played=Count('pk'),
+        won=Count('pk', filter=Q(**{f'{goals_for}__gt': F(goals_against)})),
+        drawn=Count('pk', filter=Q(**{goals_for: F(goals_against)})),
+        lost=Count('pk', filter=Q(**{f'{goals_for}__lt': F(goals_against)})),
+        goals_for=Sum(goals_for),
+        goals_against=Sum(goals_against),
+        last_match=Max('date'),
+    )
+    summary = {field: totals[field] or 0 for field in RECORD_FIELDS}
+    summary['last_match'] = totals['last_match']
+    return summary
+
+
+def combine(*records):
+    summary = {field: sum(rec[field] for rec in records)
+               for field in RECORD_FIELDS}
+    summary['goal_difference'] = \
+        summary['goals_for'] - summary['goals_against']
+    summary['points'] = \
+        summary['won'] * POINTS_FOR_WIN + summary['drawn'] * POINTS_FOR_DRAW
+    return summary
+
+
+def result(side):
+    """
+    SQL expression of the result letter of the club playing on ``side``
+    """
+    goals_for, goals_against = SIDES[side]
+    return Case(
+        When(**{f'{goals_for}__gt': F(goals_against)}, then=Value('W')),
+        When(**{goals_for: F(goals_against)}, then=Value('D')),
+        default=Value('L'),
+        output_field=CharField(),
+    )
+
+
+def team_form(club, last=DEFAULT_FORM_LENGTH):
+    """
+    Results of the ``last`` most recent matches of ``club``
+    """
+    recent = []
+    for side, matches in (('home', club.home_matches),
+                          ('away', club.away_matches)):
+        recent.extend(matches.order_by('-date', '-pk').annotate(
+            result=result(side)).values_list('date', 'pk', 'result')[:last])
+    recent = sorted(recent, reverse=True)[:last]
+
+    summary = dict(combine(), last_match=None)
+    if recent:
+        date, pk, _ = recent[-1]
+        since = Q(date__gt=date) | Q(date=date, pk__gte=pk)
+        summary = combine(
+            record(club.home_matches.filter(since), 'home'),
+            record(club.away_matches.filter(since), 'away'))
+        summary['last_match'] = recent[0][0]
+    return dict(
+        club=club.pk,
+        form=''.join(letter for _, _, letter in recent),
+        **summary)
+
+
+def head_to_head(club, opponent):
+    """
+    All time record of ``club`` against ``opponent``
+    """
+    home = record(club.home_matches.filter(away_team=opponent), 'home')
+    away = record(club.away_matches.filter(home_team=opponent), 'away')
+    last_dates = [rec.pop('last_match') for rec in (home, away)]
+    last_dates = [date for date in last_dates if date is not None]
+    return dict(
+        club=club.pk,
+        opponent=opponent.pk,
+        last_match=max(last_dates) if last_dates else None,
+        home=home,
+        away=away,
+        **combine(home, away))
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class FootballConfig(AppConfig):
     name = 'football'
+
+    def ready(self):
+        from football import signals  # noqa: F401
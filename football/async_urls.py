@@ -0,0 +1,14 @@
+"""
+Football URLs of the ASGI application
+
+Viewset list and retrieve routes are served by async views, listed first
+so that they take precedence over the same routes in ``football.urls``.
+"""
+from django.urls import include, path
+
+from football import asynchronous, urls
+
+app_name = urls.app_name
+urlpatterns = [
+    path(r'', include(asynchronous.async_patterns(urls.router.urls))),
+] + urls.urlpatterns
@@ -0,0 +1,375 @@
+"""
+In-process benchmark of the API endpoints
+
+Requests go through the full Django stack with the test client, recording
+latency, number of queries on every database and response size for
+every endpoint.
+``run_concurrency`` instead drives the WSGI and ASGI applications with
+concurrent clients, as a threaded WSGI server and an ASGI server would.
+"""
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.cache import caches
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from rest_framework.authtoken.models import Token
+
+from core import football_models
+from football import urls as football_urls
+from user import urls as user_urls
+
+BENCHMARK_EMAIL = 'benchmark@example.com'
+
+
+def sample_ids():
+    """
+    Ids of existing rows used to fill endpoint URLs
+    """
+    def first(model):
+        return model.objects.order_by('pk').values_list(
+            'pk', flat=True).first()
+
+    club = first(football_models.Club)
+    name = football_models.Club.objects.filter(pk=club).values_list(
+        'name', flat=True).first()
+    return {
+        'league': first(football_models.League),
+        'club': club,
+        'opponent': football_models.Club.objects.filter(
+            home_matches__away_team=club).values_list(
+                'pk', flat=True).first(),
+        'position': first(football_models.Position),
+        'match': first(football_models.Match),
+        # Prefix of a club name
+        'query': name[:3] if name else None,
+    }
+
+
+def endpoints(ids, user):
+    """
+    Return ``[(name, url)]`` of GET endpoints under ``api/``, one per
+    route of ``read_routes()`` when ``ids`` has all rows
+    """
+    fixtures = reverse('football:fixtures')
+    if ids['league']:
+        fixtures += f'?league={ids["league"]}'
+    urls = [
+        ('user:list', reverse('user:list')),
+        ('user:manage', reverse('user:manage', kwargs={'pk': user.pk})),
+        ('football:api-root', reverse('football:api-root')),
+        ('football:league-list', reverse('football:league-list')),
+        ('football:club-list', reverse('football:club-list')),
+        ('football:position-list', reverse('football:position-list')),
+        ('football:match-list', reverse('football:match-list')),
+        ('football:fixtures', fixtures),
+        ('football:changes', reverse('football:changes') + '?since=0'),
+        ('football:export',
+         reverse('football:export', args=['matches'])),
+    ]
+    if ids['query']:
+        urls.append(('football:search',
+                     reverse('football:search') + f'?q={ids["query"]}'))
+    if ids['league']:
+        urls += [
+            ('football:league-detail',
+             reverse('football:league-detail', args=[ids['league']])),
+            ('football:league-standings',
+             reverse('football:league-standings', args=[ids['league']])),
+        ]
+    if ids['club']:
+        urls += [
+            ('football:club-detail',
+             reverse('football:club-detail', args=[ids['club']])),
+            ('football:club-form',
+             reverse('football:club-form', args=[ids['club']])),
+            ('football:club-players',
+             reverse('football:club-players', args=[ids['club']])),
+        ]
+    if ids['opponent']:
+        urls.append(('football:club-head-to-head',
+                     reverse('football:club-head-to-head',
+                             args=[ids['club'], ids['opponent']])))
+    if ids['position']:
+        urls.append(('football:position-detail',
+                     reverse('football:position-detail',
+                             args=[ids['position']])))
+    if ids['match']:
+        urls += [
+            ('football:match-detail',
+             reverse('football:match-detail', args=[ids['match']])),
+            ('football:match-events',
+             reverse('football:match-events', args=[ids['match']])),
+        ]
+    return urls
+
+
+def _patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def read_routes():
+    """
+    Return names of the routes answering GET under ``api/``
+    """
+    names = set()
+    for module in (user_urls, football_urls):
+        for pattern in _patterns(module.urlpatterns):
+            actions = getattr(pattern.callback, 'actions', None)
+            if actions is not None:
+                reads = 'get' in actions
+            else:
+                reads = hasattr(pattern.callback.view_class, 'get')
+            if reads:
+                names.add(f'{module.app_name}:{pattern.name}')
+    return names
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a sorted list
+    """
+    if not values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(timings, queries, sizes, statuses):
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'queries': max(queries),
+        'bytes': max(sizes),
+        'status': sorted(set(statuses)),
+    }
+
+
+def get_token(user_model):
+    user = user_model.objects.filter(email=BENCHMARK_EMAIL).first()
+    if user is None:
+        user = user_model.objects.create_user(
+            email=BENCHMARK_EMAIL, password=None, name='Benchmark')
+    token, _ = Token.objects.get_or_create(user=user)
+    return user, token
+
+
+def run(user_model, requests=100, warmup=5, cold=False, host='localhost',
+        only=None):
+    """
+    Drive every endpoint ``requests`` times, returning stats per endpoint
+    """
+    user, token = get_token(user_model)
+    client = Client(HTTP_HOST=host,
+                    HTTP_AUTHORIZATION=f'Token {token.key}')
+    response_cache = caches['football']
+    results = {}
+    for name, url in endpoints(sample_ids(), user):
+        if only and name not in only:
+            continue
+        for _ in range(warmup):
+            client.get(url)
+        timings, queries, sizes, statuses = [], [], [], []
+        for _ in range(requests):
+            if cold:
+                response_cache.clear()
+            with ExitStack() as stack:
+                # Replica reads run on their own connections
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connection))
+                    for connection in connections.all()]
+                start = time.perf_counter()
+                response = client.get(url)
+                content = b''.join(response) if response.streaming \
+                    else response.content
+                timings.append(time.perf_counter() - start)
+            queries.append(sum(len(context) for context in captured))
+            sizes.append(len(content))
+            statuses.append(response.status_code)
+        results[name] = dict(
+            summarize(timings, queries, sizes, statuses), url=url)
+    return results
+
+
+def compare(previous, current):
+    """
+    Return ``{endpoint: {metric: relative change}}`` between two runs
+    """
+    changes = {}
+    for name, stats in current.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: round((stats[metric] - before[metric]) / before[metric], 3)
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'bytes')
+            if before.get(metric)
+        }
+    return changes
+
+
+def concurrency_endpoints(ids):
+    """
+    Return ``[(name, url)]`` of routes served by async views under ASGI
+    """
+    urls = [(f'football:{kind}-list', reverse(f'football:{kind}-list'))
+            for kind in ('league', 'club', 'position', 'match')]
+    for kind in ('league', 'club', 'position'):
+        if ids[kind]:
+            urls.append((f'football:{kind}-detail', reverse(
+                f'football:{kind}-detail', args=[ids[kind]])))
+    return urls
+
+
+def wsgi_get(application, url, host, client_delay):
+    """
+    GET ``url`` from a WSGI application, reading the body in chunks
+    ``client_delay`` seconds apart like a slow client would
+    """
+    parts = urlsplit(url)
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host,
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(), 'wsgi.multithread': True,
+        'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    status = []
+    body = application(environ, lambda line, headers: status.append(line))
+    try:
+        for _ in body:
+            if client_delay:
+                time.sleep(client_delay)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_get(application, url, host, client_delay):
+    """
+    GET ``url`` from an ASGI application, acknowledging body messages
+    ``client_delay`` seconds apart like a slow client would
+    """
+    parts = urlsplit(url)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': parts.path,
+        'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(), 'root_path': '',
+        'headers': [(b'host', host.encode())],
+        'client': ('127.0.0.1', 0), 'server': (host, 80),
+    }
+    disconnected = asyncio.Event()
+    requested = False
+    status = []
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif client_delay:
+            await asyncio.sleep(client_delay)
+
+    await application(scope, receive, send)
+    disconnected.set()
+    return status[0]
+
+
+def summarize_concurrency(timings, statuses, elapsed):
+    summary = summarize(timings, [0], [0], statuses)
+    del summary['queries'], summary['bytes']
+    summary['requests_per_second'] = round(len(timings) / elapsed, 1)
+    return summary
+
+
+def run_wsgi(application, url, requests, concurrency, host, client_delay,
+             threads):
+    """
+    Clients wait for one of the ``threads`` of the WSGI server, which is
+    held until the client has read the response
+    """
+    def timed(server):
+        start = time.perf_counter()
+        status = server.submit(
+            wsgi_get, application, url, host, client_delay).result()
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as server, \
+            ThreadPoolExecutor(max_workers=concurrency) as clients:
+        results = list(clients.map(timed, [server] * requests))
+    elapsed = time.perf_counter() - start
+    return summarize_concurrency(
+        [timing for timing, _ in results],
+        [status for _, status in results], elapsed)
+
+
+def run_asgi(application, url, requests, concurrency, host, client_delay):
+    async def client(queue, results):
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            status = await asgi_get(application, url, host, client_delay)
+            results.append((time.perf_counter() - start, status))
+
+    async def main():
+        queue, results = asyncio.Queue(), []
+        for i in range(requests):
+            queue.put_nowait(i)
+        await asyncio.gather(*(client(queue, results)
+                               for _ in range(concurrency)))
+        return results
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    return summarize_concurrency(
+        [timing for timing, _ in results],
+        [status for _, status in results], elapsed)
+
+
+def run_concurrency(wsgi_application, asgi_application, requests=200,
+                    concurrency=50, host='localhost', client_delay=0.0,
+                    wsgi_threads=8, only=None):
+    """
+    Drive every endpoint ``requests`` times from ``concurrency`` clients
+    through a WSGI server of ``wsgi_threads`` threads and through ASGI,
+    returning ``{endpoint: {interface: stats}}``
+    """
+    results = {}
+    for name, url in concurrency_endpoints(sample_ids()):
+        if only and name not in only:
+            continue
+        results[name] = {
+            'wsgi': run_wsgi(wsgi_application, url, requests, concurrency,
+                             host, client_delay, wsgi_threads),
+            'asgi': run_asgi(asgi_application, url, requests, concurrency,
+                             host, client_delay),
+            'url': url,
+        }
+    return results
@@ -0,0 +1,121 @@
+"""
+Conditional GET and response caching for football reference data
+
+Every cached model has a version, the timestamp of its last write, kept in
+the cache configured by ``FOOTBALL_CACHE['ALIAS']`` and bumped by
+``post_save``/``post_delete`` signals. ETags are derived from the request
+and the versions of the models a response depends on, so they are known
+before touching the database and old entries are never served after a
+write. Club analytics depend on a version per club instead, bumped when
+one of its matches is written. With several workers the alias must point
+to a shared cache.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_http_date_safe, parse_etags
+
+DEFAULT_ALIAS = 'default'
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def get_option(name, default):
+    return getattr(settings, 'FOOTBALL_CACHE', {}).get(name, default)
+
+
+def get_cache():
+    return caches[get_option('ALIAS', DEFAULT_ALIAS)]
+
+
+def version_key(model):
+    return f'football:version:{model._meta.label_lower}'
+
+
+def club_matches_key(club_id):
+    return f'football:version:club-matches:{club_id}'
+
+
+def response_key(etag):
+    return f'football:response:{etag}'
+
+
+def bump_keys(keys):
+    """
+    Invalidate responses depending on ``keys``, again once committed
+    so that nothing read during the transaction stays cached
+    """
+    def bump():
+        now = time.time()
+        get_cache().set_many({key: now for key in keys}, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def bump_version(model):
+    bump_keys([version_key(model)])
+
+
+def bump_club_matches(club_ids):
+    """
+    Invalidate responses computed from the matches of given clubs
+    """
+    bump_keys([club_matches_key(club_id) for club_id in club_ids])
+
+
+def get_versions(models):
+    """
+    Return versions of given models, initializing the missing ones
+    """
+    return get_key_versions([version_key(model) for model in models])
+
+
+def get_key_versions(keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def make_etag(*parts):
+    digest = hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(request, etag, last_modified):
+    """
+    Evaluate If-None-Match, falling back to If-Modified-Since
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return (if_modified_since is not None and
+            int(last_modified) <= if_modified_since)
+
+
+def last_modified_second(last_modified):
+    """
+    Return the second to send as Last-Modified of ``last_modified``. Until
+    that second is over a later write may share it, so the previous one
+    is sent, which If-Modified-Since of the current version never matches
+    """
+    second = int(last_modified)
+    return second if time.time() >= second + 1 else second - 1
+
+
+def get_response(etag):
+    return get_cache().get(response_key(etag))
+
+
+def set_response(etag, content, content_type):
+    get_cache().set(response_key(etag), (content, content_type),
+                    get_option('TIMEOUT', DEFAULT_TIMEOUT))
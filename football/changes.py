@@ -0,0 +1,154 @@
+"""
+Change log backing delta sync of football reference data
+
+Every write of a synced model appends a ``Change`` row, whose id is the
+version of the log. Clients keep the last version they have seen and ask
+for what changed since, receiving the current rows of changed objects and
+the ids of deleted ones. Compaction drops entries superseded by a newer
+one for the same object, and everything older than the retention period,
+leaving a reset entry so that clients behind it download the full lists
+again. Bulk tools writing too many rows to log add a reset entry instead.
+
+Ids are given when entries are inserted, not when their transaction
+commits. A client must never see a version before a lower one is
+committed, so appends are serialized until the writing transaction ends:
+SQLite runs one writing transaction at a time already, PostgreSQL locks
+the log table against other appends (reads are not blocked). Other
+databases are not supported.
+"""
+import contextlib
+import datetime
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from core import football_models
+from football import serializers
+from football.querysets import optimize_queryset
+
+SYNCED = {
+    'league': (football_models.League, serializers.LeagueSerializer),
+    'club': (football_models.Club, serializers.ClubSerializer),
+    'position': (football_models.Position, serializers.PositionSerializer),
+    'match': (football_models.Match, serializers.MatchSerializer),
+}
+SYNCED_MODELS = {model: kind for kind, (model, _) in SYNCED.items()}
+DEFAULT_RETENTION_DAYS = 30
+# Self-conflicting, so appends wait for each other but not for reads
+LOCK_STATEMENTS = {
+    'postgresql': 'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE',
+}
+
+
+@contextlib.contextmanager
+def appending():
+    """
+    Keep other appends out until the current transaction ends
+    """
+    using = router.db_for_write(football_models.Change)
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        yield
+        return
+    if connection.vendor not in LOCK_STATEMENTS:
+        raise ImproperlyConfigured(
+            f'The change log does not support {connection.vendor}')
+    with transaction.atomic(using=using, savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(LOCK_STATEMENTS[connection.vendor].format(
+                table=connection.ops.quote_name(
+                    football_models.Change._meta.db_table)))
+        yield
+
+
+def record(model, pks, deleted=False):
+    """
+    Append changes of ``model`` objects with given primary keys
+    """
+    kind = SYNCED_MODELS.get(model)
+    if kind is None:
+        return
+    with appending():
+        football_models.Change.objects.bulk_create([
+            football_models.Change(kind=kind, object_id=pk, deleted=deleted)
+            for pk in pks
+        ])
+
+
+def reset():
+    """
+    Make every client download the full lists again
+    """
+    with appending():
+        football_models.Change.objects.create(
+            kind=football_models.Change.RESET)
+
+
+def current_version():
+    return football_models.Change.objects.aggregate(
+        version=Max('pk'))['version'] or 0
+
+
+def changes_since(since, limit):
+    """
+    Return a sync payload with at most ``limit`` log entries after
+    version ``since``, or a reset one if the log no longer covers it
+    """
+    changes = football_models.Change.objects
+    if since is None or changes.filter(
+            kind=football_models.Change.RESET, pk__gt=since).exists():
+        return {'version': current_version(), 'reset': True, 'more': False,
+                'upserts': {}, 'deletes': {}}
+
+    entries = list(changes.filter(pk__gt=since).order_by('pk').values_list(
+        'pk', 'kind', 'object_id', 'deleted')[:limit])
+    # The latest entry of an object wins
+    latest = {(kind, object_id): deleted
+              for _, kind, object_id, deleted in entries}
+    upserts, deletes = {}, {}
+    for kind, (model, serializer_class) in SYNCED.items():
+        deleted = sorted(pk for (entry_kind, pk), gone in latest.items()
+                         if entry_kind == kind and gone)
+        if deleted:
+            deletes[kind] = deleted
+        changed = [pk for (entry_kind, pk), gone in latest.items()
+                   if entry_kind == kind and not gone]
+        if changed:
+            queryset = optimize_queryset(
+                model.objects.filter(pk__in=changed).order_by('pk'),
+                serializer_class)
+            upserts[kind] = serializer_class(queryset, many=True).data
+    return {
+        'version': entries[-1][0] if entries else since,
+        'reset': False,
+        'more': len(entries) == limit,
+        'upserts': upserts,
+        'deletes': deletes,
+    }
+
+
+def compact(retention_days=DEFAULT_RETENTION_DAYS):
+    """
+    Drop superseded entries and entries older than the retention period,
+    returns the number of deleted entries
+    """
+    Change = football_models.Change
+    superseded = Change.objects.filter(Exists(Change.objects.filter(
+        kind=OuterRef('kind'), object_id=OuterRef('object_id'),
+        pk__gt=OuterRef('pk'))))
+    deleted, _ = superseded.delete()
+    if retention_days is None:
+        return deleted
+
+    cutoff = timezone.now() - datetime.timedelta(days=retention_days)
+    horizon = Change.objects.filter(created__lt=cutoff).aggregate(
+        version=Max('pk'))['version']
+    if horizon is not None:
+        expired, _ = Change.objects.filter(pk__lt=horizon).delete()
+        deleted += expired
+        # The newest expired entry becomes the reset entry at the horizon
+        Change.objects.filter(pk=horizon).update(
+            kind=Change.RESET, object_id=0, deleted=False)
+    return deleted
@@ -0,0 +1,70 @@
+"""
+Country representations computed once per process and language
+
+django-countries resolves and translates the name of a country through
+lazy translation objects every time a row is rendered. Here the
+``{code, name}`` representation of every country is built once per
+language and shared by all rows rendering it, so the returned dicts must
+not be modified. Clients wanting bare codes ask for ``?country=code``,
+which swaps serializers for a variant rendering codes only.
+"""
+from functools import lru_cache
+
+from django.utils import translation
+from django.utils.encoding import force_str
+from django_countries import countries
+from django_countries.serializer_fields import \
+    CountryField as BaseCountryField
+
+QUERY_PARAM = 'country'
+CODE_FORMAT = 'code'
+
+
+@lru_cache(maxsize=None)
+def get_table(language):
+    """
+    Return ``{code: {'code', 'name'}}`` of all countries in ``language``
+    """
+    with translation.override(language):
+        return {code: {'code': code, 'name': force_str(name)}
+                for code, name in countries}
+
+
+class CountryField(BaseCountryField):
+    """
+    Country serializer field reading names from the precomputed table
+    """
+    def __init__(self, *args, code_only=False, **kwargs):
+        self.code_only = code_only
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, obj):
+        country = get_table(translation.get_language()).get(str(obj))
+        if country is None:
+            # Blank, or a code the table does not hold as is
+            return super().to_representation(obj)
+        if self.code_only or not (self.country_dict or self.name_only):
+            return country['code']
+        if self.name_only:
+            return country['name']
+        return country
+
+
+def wants_codes(request):
+    return getattr(request, 'query_params', {}).get(
+        QUERY_PARAM) == CODE_FORMAT
+
+
+@lru_cache(maxsize=None)
+def code_only(serializer_class):
+    """
+    Subclass of ``serializer_class`` rendering countries as bare codes
+    """
+    fields = {
+        name: type(field)(*field._args, **dict(field._kwargs, code_only=True))
+        for name, field in serializer_class._declared_fields.items()
+        if isinstance(field, CountryField)
+    }
+    if not fields:
+        return serializer_class
+    return type(serializer_class.__name__, (serializer_class,), fields)
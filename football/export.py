@@ -0,0 +1,136 @@
+"""
+Streaming export of Club, Player and Match rows
+
+Rows are read with ``values_list().iterator()`` in primary key order, so
+only one chunk is held in memory whatever the table size, and written as
+NDJSON or CSV lines as they are read. Columns use the names of the ingest
+rows, so an export can be fed back to ``ingest``. An interrupted export is
+resumed by passing the last exported id as ``after``.
+"""
+import csv
+import functools
+import operator
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework import serializers
+
+from core import football_models
+
+DEFAULT_CHUNK_SIZE = 2000
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def get_option(name, default):
+    return getattr(settings, 'FOOTBALL_EXPORT', {}).get(name, default)
+
+
+class Export:
+    """
+    Columns and filters of one exported model
+    """
+    def __init__(self, model, columns, league_lookups, date_field=None):
+        self.model = model
+        # (output name, model attribute)
+        self.columns = columns
+        # Rows matching any of them are in the league
+        self.league_lookups = league_lookups
+        self.date_field = date_field
+
+    @property
+    def names(self):
+        return [name for name, attname in self.columns]
+
+    def get_queryset(self, league=None, date_from=None, date_to=None,
+                     after=None):
+        queryset = self.model.objects.all()
+        if league is not None:
+            queryset = queryset.filter(functools.reduce(operator.or_, (
+                Q(**{lookup: league}) for lookup in self.league_lookups)))
+        if date_from is not None:
+            queryset = queryset.filter(
+                **{f'{self.date_field}__gte': date_from})
+        if date_to is not None:
+            queryset = queryset.filter(
+                **{f'{self.date_field}__lte': date_to})
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        return queryset.order_by('pk').values_list(
+            *(attname for name, attname in self.columns))
+
+
+EXPORTS = {
+    'clubs': Export(
+        football_models.Club,
+        (('id', 'id'), ('name', 'name'), ('league', 'league_id')),
+        league_lookups=('league_id',)),
+    'players': Export(
+        football_models.Player,
+        (('id', 'id'), ('name', 'name'), ('number', 'number'),
+         ('age', 'age'), ('nationality', 'nationality'),
+         ('position', 'position_id'), ('club', 'club_id')),
+        league_lookups=('club__league_id',)),
+    'matches': Export(
+        football_models.Match,
+        (('id', 'id'), ('home_team', 'home_team_id'),
+         ('away_team', 'away_team_id'), ('date', 'date'),
+         ('home_team_score', 'home_team_score'),
+         ('away_team_score', 'away_team_score')),
+        league_lookups=('home_team__league_id', 'away_team__league_id'),
+        date_field='date'),
+}
+
+
+class ExportFilterSerializer(serializers.Serializer):
+    """
+    Serializer for export format and filters
+    """
+    fmt = serializers.ChoiceField(choices=list(FORMATS), default='ndjson')
+    league = serializers.IntegerField(required=False, min_value=1)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    after = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        export = self.context['export']
+        if export.date_field is None and (
+                'date_from' in attrs or 'date_to' in attrs):
+            raise serializers.ValidationError(
+                'Date filters are only supported for matches')
+        return attrs
+
+
+class Echo:
+    """
+    File-like object returning what is written, for ``csv.writer``
+    """
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(names, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def csv_lines(names, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream(kind, fmt='ndjson', chunk_size=None, **filters):
+    """
+    Yield the export of ``kind`` as lines of text
+    """
+    export = EXPORTS[kind]
+    chunk_size = chunk_size or get_option('CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    rows = export.get_queryset(**filters).iterator(chunk_size=chunk_size)
+    lines = csv_lines if fmt == 'csv' else ndjson_lines
+    return lines(export.names, rows)
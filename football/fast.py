@@ -0,0 +1,111 @@
+"""
+Lean read path for football list endpoints
+
+Instead of building model instances and running every serializer field per
+row, list endpoints can fetch only the rendered columns with ``.values()``
+and map each row with a mapper compiled once per serializer. The output is
+the same as the serializer's. Serializers using fields the compiler does
+not know keep the regular path.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields as drf_fields
+from rest_framework import relations
+
+from core import football_models
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (drf_fields.CharField, drf_fields.IntegerField)
+
+# Columns and formatting reproducing ``__str__`` of related models
+STR_COLUMNS = {
+    football_models.League: (('name',), lambda name: name),
+    football_models.Club: (('name',), lambda name: name),
+    football_models.Position: (
+        ('short_name', 'long_name'),
+        lambda short_name, long_name: f"{long_name} - {short_name}"),
+}
+
+
+def is_enabled():
+    return getattr(settings, 'FOOTBALL_FAST_LISTS', False)
+
+
+class RowMapper:
+    """
+    Maps ``.values()`` rows to serializer output
+    """
+    def __init__(self, columns, mappings):
+        self.columns = columns
+        self.mappings = mappings
+
+    def map(self, rows):
+        mappings = self.mappings
+        return [
+            {key: convert(row) for key, convert in mappings}
+            for row in rows
+        ]
+
+
+def _column(column, to_representation=None):
+    if to_representation is None:
+        return lambda row: row[column]
+
+    def convert(row):
+        value = row[column]
+        return None if value is None else to_representation(value)
+    return convert
+
+
+def _str_related(columns, formatter):
+    def convert(row):
+        values = [row[column] for column in columns]
+        if all(value is None for value in values):
+            return None
+        return formatter(*values)
+    return convert
+
+
+@lru_cache(maxsize=None)
+def get_mapper(serializer_class):
+    """
+    Compile a RowMapper for ``serializer_class``, None if not supported
+    """
+    serializer = serializer_class()
+    model = serializer.Meta.model
+    columns, mappings = [], []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if len(field.source_attrs) != 1:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+
+        if isinstance(field, relations.StringRelatedField):
+            related = STR_COLUMNS.get(model_field.related_model)
+            if not model_field.many_to_one or related is None:
+                return None
+            related_columns = [f'{model_field.name}__{column}'
+                               for column in related[0]]
+            columns.extend(related_columns)
+            mappings.append((name, _str_related(related_columns, related[1])))
+        elif isinstance(field, (relations.RelatedField,
+                                relations.ManyRelatedField)) or \
+                model_field.is_relation:
+            return None
+        elif type(field) in PASSTHROUGH_FIELDS:
+            columns.append(model_field.attname)
+            mappings.append((name, _column(model_field.attname)))
+        elif isinstance(field, drf_fields.Field) and \
+                not isinstance(field, drf_fields.SerializerMethodField):
+            columns.append(model_field.attname)
+            mappings.append((name, _column(
+                model_field.attname, field.to_representation)))
+        else:
+            return None
+    return RowMapper(tuple(dict.fromkeys(columns)), tuple(mappings))
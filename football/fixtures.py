@@ -0,0 +1,259 @@
+"""
+Process-local index of the matches around today
+
+Matches from ``DAYS_BEFORE`` days before today to ``DAYS_AFTER`` days after
+are kept in memory grouped by date and league, so the fixtures endpoint
+answers without touching the database. The index is warmed when the
+application is loaded and rebuilt when the day changes. Match and Club
+signals refresh the written match, or the matches of the written club,
+once the transaction commits, and bump a counter in the shared
+``FOOTBALL_CACHE`` cache: other workers notice the counter moved on their
+next read and rebuild. Bulk writers only bump the counter.
+"""
+import datetime
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils import timezone
+
+from core import football_models
+from core.routers import primary_reads
+from football import caching
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAYS_BEFORE = 1
+DEFAULT_DAYS_AFTER = 1
+VERSION_KEY = 'football:version:fixtures'
+FIELDS = {
+    'id': 'id',
+    'date': 'date',
+    'home_team': 'home_team_id',
+    'home_team_name': 'home_team__name',
+    'away_team': 'away_team_id',
+    'away_team_name': 'away_team__name',
+    'home_team_score': 'home_team_score',
+    'away_team_score': 'away_team_score',
+}
+LEAGUE_FIELDS = ('home_team__league_id', 'away_team__league_id')
+
+
+def get_option(name, default):
+    return getattr(settings, 'FOOTBALL_FIXTURES', {}).get(name, default)
+
+
+def get_window(today=None):
+    today = today or timezone.localdate()
+    return (
+        today - datetime.timedelta(
+            days=get_option('DAYS_BEFORE', DEFAULT_DAYS_BEFORE)),
+        today + datetime.timedelta(
+            days=get_option('DAYS_AFTER', DEFAULT_DAYS_AFTER)),
+    )
+
+
+def load_matches(*conditions, **filters):
+    """
+    Return ``[(match, league ids)]`` of matches matching ``filters``
+    """
+    rows = football_models.Match.objects.filter(
+        *conditions, **filters).values_list(
+        *FIELDS.values(), *LEAGUE_FIELDS)
+    count = len(FIELDS)
+    return [(dict(zip(FIELDS, row[:count])), set(row[count:]))
+            for row in rows]
+
+
+def group(matches):
+    """
+    Group matches as ``{date: {league id: [match]}}``
+    """
+    dates = defaultdict(lambda: defaultdict(list))
+    for match, league_ids in matches:
+        for league_id in league_ids:
+            dates[match['date']][league_id].append(match)
+    return dates
+
+
+def render(date, leagues, league=None):
+    return {
+        'date': date,
+        'leagues': [
+            {'league': league_id,
+             'matches': sorted(matches, key=lambda match: match['id'])}
+            for league_id, matches in sorted(leagues.items())
+            if league is None or league_id == league
+        ],
+    }
+
+
+class FixturesIndex:
+    """
+    Matches of the current window grouped by date and league
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.window = None
+        self.version = None
+        self.dates = {}
+        self.locations = {}
+
+    def build(self):
+        window = get_window()
+        cache = caching.get_cache()
+        cache.add(VERSION_KEY, 0, None)
+        version = cache.get(VERSION_KEY)
+        # A replica behind the counter would be kept until the next write
+        with primary_reads():
+            matches = load_matches(date__range=window)
+        with self._lock:
+            self.window = window
+            self.version = version
+            self.dates = group(matches)
+            self.locations = {match['id']: (match['date'], league_ids)
+                              for match, league_ids in matches}
+
+    def is_stale(self):
+        return (self.window != get_window() or
+                self.version != caching.get_cache().get(VERSION_KEY))
+
+    def get(self, date, league=None):
+        """
+        Fixtures of ``date``, None if the date is out of the window
+        """
+        if self.is_stale():
+            self.build()
+        with self._lock:
+            start, end = self.window
+            if not start <= date <= end:
+                return None
+            return render(date, self.dates.get(date, {}), league)
+
+    def refresh(self, pk):
+        """
+        Reload one match written by this process
+        """
+        if self.window is None:
+            return
+        matches = load_matches(pk=pk, date__range=self.window)
+        with self._lock:
+            self._remove(pk)
+            self._add(matches)
+
+    def refresh_clubs(self, club_ids):
+        """
+        Reload the matches of clubs written by this process
+        """
+        if self.window is None:
+            return
+        club_ids = set(club_ids)
+        matches = load_matches(
+            Q(home_team__in=club_ids) | Q(away_team__in=club_ids),
+            date__range=self.window)
+        with self._lock:
+            # Matches of a deleted club are gone from the database
+            stale = {
+                match['id']
+                for leagues in self.dates.values()
+                for league_matches in leagues.values()
+                for match in league_matches
+                if match['home_team'] in club_ids or
+                match['away_team'] in club_ids
+            }
+            for pk in stale | {match['id'] for match, _ in matches}:
+                self._remove(pk)
+            self._add(matches)
+
+    def _add(self, matches):
+        for match, league_ids in matches:
+            self.locations[match['id']] = (match['date'], league_ids)
+            leagues = self.dates.setdefault(match['date'], {})
+            for league_id in league_ids:
+                leagues.setdefault(league_id, []).append(match)
+
+    def _remove(self, pk):
+        location = self.locations.pop(pk, None)
+        if location is None:
+            return
+        date, league_ids = location
+        for league_id in league_ids:
+            matches = self.dates[date][league_id]
+            matches[:] = [match for match in matches if match['id'] != pk]
+
+
+def bump_version():
+    """
+    Returns the new counter of fixture writes shared by workers
+    """
+    cache = caching.get_cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 0, None)
+        return cache.incr(VERSION_KEY)
+
+
+def match_written(pk):
+    """
+    Refresh the local index and tell other workers to rebuild theirs
+    """
+    _written(get_index().refresh, pk)
+
+
+def clubs_written(club_ids):
+    """
+    Refresh matches of renamed, moved or deleted clubs in the local
+    index and tell other workers to rebuild theirs
+    """
+    _written(get_index().refresh_clubs, club_ids)
+
+
+def _written(refresh, *args):
+    index = get_index()
+    previous = index.version
+    version = bump_version()
+    refresh(*args)
+    # Keep the local index when no other worker wrote meanwhile
+    if previous is not None and version == previous + 1:
+        index.version = version
+
+
+def invalidate():
+    """
+    Make every worker rebuild its index, for bulk writes
+    """
+    bump_version()
+
+
+_index = FixturesIndex()
+
+
+def get_index():
+    return _index
+
+
+def warm_up():
+    """
+    Build the index when the application is loaded. Pre-fork servers load
+    it before forking workers, which must not share the connection used
+    """
+    try:
+        _index.build()
+    except DatabaseError:
+        logger.exception('Could not build the fixtures index')
+    finally:
+        connections.close_all()
+
+
+def fixtures(date, league=None):
+    """
+    Fixtures of ``date`` from the index, or the database out of the window
+    """
+    data = get_index().get(date, league)
+    if data is None:
+        data = render(date, group(load_matches(date=date))[date], league)
+    return data
@@ -0,0 +1,480 @@
+"""
+Bulk ingestion of Club, Player and Match rows from data feeds
+
+Rows are validated field by field without touching the database, then
+checked against it with one set-based query per relation or constraint,
+and finally written with ``bulk_create``/``bulk_update`` in one transaction.
+Rows with an ``id`` of an existing object update it, others are created.
+Invalid rows are reported by index and skipped. Match events are only
+appended, see ``MatchEventIngestor``.
+"""
+import json
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from django_countries.serializer_fields import CountryField
+from rest_framework import serializers
+
+from core import football_models
+from football import (caching, changes, fixtures, search, signals,
+                      standings)
+
+BATCH_SIZE = 500
+
+
+class ClubRowSerializer(serializers.Serializer):
+    """
+    Serializer for ingested Club rows
+    """
+    id = serializers.IntegerField(required=False, min_value=1)
+    name = serializers.CharField(max_length=100)
+    league = serializers.IntegerField(min_value=1)
+
+
+class PlayerRowSerializer(serializers.Serializer):
+    """
+    Serializer for ingested Player rows
+    """
+    id = serializers.IntegerField(required=False, min_value=1)
+    name = serializers.CharField(max_length=100)
+    number = serializers.IntegerField(min_value=0, max_value=100)
+    age = serializers.IntegerField()
+    nationality = CountryField()
+    position = serializers.IntegerField(min_value=1)
+    club = serializers.IntegerField(min_value=1)
+
+
+class MatchRowSerializer(serializers.Serializer):
+    """
+    Serializer for ingested Match rows
+    """
+    id = serializers.IntegerField(required=False, min_value=1)
+    home_team = serializers.IntegerField(min_value=1)
+    away_team = serializers.IntegerField(min_value=1)
+    date = serializers.DateField()
+    home_team_score = serializers.IntegerField(min_value=0)
+    away_team_score = serializers.IntegerField(min_value=0)
+
+    def validate(self, attrs):
+        if attrs['home_team'] == attrs['away_team']:
+            raise serializers.ValidationError(
+                'Same Team can not play against eatch other')
+        return attrs
+
+
+class MatchEventRowSerializer(serializers.Serializer):
+    """
+    Serializer for ingested MatchEvent rows
+    """
+    match = serializers.IntegerField(min_value=1)
+    kind = serializers.ChoiceField(
+        choices=football_models.MatchEvent.KIND_CHOICES)
+    side = serializers.ChoiceField(
+        choices=football_models.MatchEvent.SIDE_CHOICES, required=False,
+        allow_blank=True, default='')
+    minute = serializers.IntegerField(
+        min_value=0, max_value=200, required=False, allow_null=True)
+    player = serializers.IntegerField(
+        min_value=1, required=False, allow_null=True)
+    detail = serializers.CharField(
+        max_length=100, required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if attrs['kind'] != football_models.MatchEvent.PERIOD and \
+                not attrs['side']:
+            raise serializers.ValidationError(
+                {'side': 'This field is required for this kind of event.'})
+        return attrs
+
+
+class IngestError(Exception):
+    """
+    Raised when a batch can not be written at all
+    """
+
+
+class Ingestor:
+    """
+    Validates and writes one batch of rows of a single model
+    """
+    model = None
+    serializer_class = None
+    relations = {}
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.errors = {}
+        self.valid = {}
+
+    def error(self, index, field, message):
+        self.errors.setdefault(index, {}).setdefault(field, []).append(
+            message)
+        self.valid.pop(index, None)
+
+    def validate_fields(self):
+        serializer = self.serializer_class()
+        for index, row in enumerate(self.rows):
+            try:
+                self.valid[index] = serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                detail = exc.detail
+                if isinstance(detail, list):
+                    detail = {'non_field_errors': detail}
+                self.errors[index] = detail
+
+    def validate_ids(self):
+        seen = set()
+        for index, data in list(self.valid.items()):
+            pk = data.get('id')
+            if pk is None:
+                continue
+            if pk in seen:
+                self.error(index, 'id', 'Duplicate id in batch.')
+            seen.add(pk)
+        self.existing = self.load_existing(
+            [data['id'] for data in self.valid.values() if 'id' in data])
+
+    def load_existing(self, pks):
+        """
+        Return ``{pk: stored row}`` for rows that will be updated
+        """
+        return {row['id']: row for row in self.model.objects.filter(
+            pk__in=pks).values('id', *self.update_fields())}
+
+    def validate_relations(self):
+        for field, related_model in self.relations.items():
+            wanted = {data.get(field) for data in self.valid.values()}
+            wanted.discard(None)
+            found = set(related_model.objects.filter(
+                pk__in=wanted).values_list('pk', flat=True))
+            for index, data in list(self.valid.items()):
+                if data.get(field) is not None and data[field] not in found:
+                    self.error(index, field,
+                               f'Invalid pk "{data[field]}" - '
+                               f'object does not exist.')
+
+    def validate_batch(self):
+        """
+        Hook for set-based checks of the whole batch
+        """
+
+    def update_fields(self):
+        return [f'{name}_id' if name in self.relations else name
+                for name in self.serializer_class().fields if name != 'id']
+
+    def build(self, data):
+        return self.model(**{
+            f'{name}_id' if name in self.relations else name: value
+            for name, value in data.items()
+        })
+
+    def run(self):
+        self.validate_fields()
+        self.validate_ids()
+        self.validate_relations()
+        self.validate_batch()
+
+        created, updated = [], []
+        for index in sorted(self.valid):
+            obj = self.build(self.valid[index])
+            (updated if obj.pk in self.existing else created).append(obj)
+        try:
+            with transaction.atomic():
+                # Updates first, so released unique values can be reused
+                self.release_unique(updated)
+                self.model.objects.bulk_update(
+                    updated, self.update_fields(), batch_size=BATCH_SIZE)
+                top = self.model.objects.aggregate(
+                    top=Max('pk'))['top'] if created else None
+                self.model.objects.bulk_create(created, batch_size=BATCH_SIZE)
+                self.set_created_pks(created, top)
+                self.after_write(created, updated)
+                changes.record(
+                    self.model, [obj.pk for obj in created + updated])
+                if self.model in search.KINDS:
+                    search.index_objects(self.model, [
+                        (obj.pk, obj.name) for obj in created + updated])
+                caching.bump_version(self.model)
+        except IntegrityError as exc:
+            raise IngestError(str(exc))
+        return {
+            'created': len(created),
+            'updated': len(updated),
+            'errors': [{'row': index, 'errors': self.errors[index]}
+                       for index in sorted(self.errors)],
+        }
+
+    def release_unique(self, updated):
+        """
+        Hook for freeing unique values updated rows move away from, so
+        that rows of the batch can swap them
+        """
+
+    def after_write(self, created, updated):
+        """
+        Hook for maintaining data derived from the written rows
+        """
+
+    def set_created_pks(self, created, top):
+        """
+        Read back primary keys of created rows when the database does not
+        return them from bulk inserts, they follow ``top`` in insert order
+        """
+        missing = [obj for obj in created if obj.pk is None]
+        if not missing:
+            return
+        # Rows created with their id may come before, between or after
+        explicit = [obj.pk for obj in created if obj.pk is not None]
+        pks = self.model.objects.filter(pk__gt=top or 0).exclude(
+            pk__in=explicit).order_by('pk').values_list('pk', flat=True)
+        for obj, pk in zip(missing, pks):
+            obj.pk = pk
+
+
+class ClubIngestor(Ingestor):
+    model = football_models.Club
+    serializer_class = ClubRowSerializer
+    relations = {'league': football_models.League}
+
+    def after_write(self, created, updated):
+        league_ids = {club.league_id for club in created + updated}
+        league_ids.update(
+            self.existing[club.pk]['league_id'] for club in updated)
+        standings.sync_league_clubs(league_ids)
+        if updated:
+            pks = [club.pk for club in updated]
+            transaction.on_commit(lambda: fixtures.clubs_written(pks))
+
+
+class PlayerIngestor(Ingestor):
+    model = football_models.Player
+    serializer_class = PlayerRowSerializer
+    relations = {
+        'club': football_models.Club,
+        'position': football_models.Position,
+    }
+
+    def validate_batch(self):
+        """
+        Check that shirt numbers stay unique per club
+        """
+        clubs = {data['club'] for data in self.valid.values()}
+        stored = list(football_models.Player.objects.filter(
+            club_id__in=clubs).values_list('pk', 'club_id', 'number'))
+        # A rejected update keeps its number, check again without it
+        rejected = True
+        while rejected:
+            rejected = False
+            moving = {data['id'] for data in self.valid.values()
+                      if data.get('id') in self.existing}
+            taken = {(club_id, number) for pk, club_id, number in stored
+                     if pk not in moving}
+            for index, data in list(self.valid.items()):
+                slot = (data['club'], data['number'])
+                if slot in taken:
+                    self.error(
+                        index, 'number', f"{data['number']} is reserved")
+                    rejected |= data.get('id') in self.existing
+                taken.add(slot)
+
+    def release_unique(self, updated):
+        """
+        Park moving players on their negated pk, numbers are never below 0
+        """
+        moving = [
+            player.pk for player in updated
+            if (player.club_id, player.number) != (
+                self.existing[player.pk]['club_id'],
+                self.existing[player.pk]['number'])
+        ]
+        football_models.Player.objects.filter(pk__in=moving).update(
+            number=-F('pk'))
+
+
+class MatchIngestor(Ingestor):
+    model = football_models.Match
+    serializer_class = MatchRowSerializer
+    relations = {
+        'home_team': football_models.Club,
+        'away_team': football_models.Club,
+    }
+
+    def update_fields(self):
+        return super().update_fields() + ['version']
+
+    def build(self, data):
+        match = super().build(data)
+        if match.pk in self.existing:
+            match.version = F('version') + 1
+        return match
+
+    def after_write(self, created, updated):
+        """
+        Apply results to standings, expire club analytics and push new
+        scores to live subscribers, bulk writes send no signals
+        """
+        deltas = [
+            standings.match_deltas(*signals.match_state(match))
+            for match in created + updated
+        ]
+        deltas.extend(
+            standings.match_deltas(*(
+                self.existing[match.pk][field]
+                for field in signals.MATCH_FIELDS), sign=-1)
+            for match in updated)
+        standings.apply_deltas(standings.merge_deltas(*deltas))
+        club_ids = {club_id for match in created + updated
+                    for club_id in (match.home_team_id, match.away_team_id)}
+        club_ids.update(
+            self.existing[match.pk][field] for match in updated
+            for field in ('home_team_id', 'away_team_id'))
+        caching.bump_club_matches(club_ids)
+        transaction.on_commit(fixtures.invalidate)
+
+        scored = [
+            match for match in updated
+            if signals.match_state(match)[2:] != tuple(
+                self.existing[match.pk][field]
+                for field in signals.SCORE_FIELDS)]
+        leagues = dict(football_models.Club.objects.filter(pk__in={
+            club_id for match in created + scored
+            for club_id in (match.home_team_id, match.away_team_id)
+        }).values_list('pk', 'league_id'))
+        for match in created + scored:
+            signals.publish_match_score(
+                match, match.pk not in self.existing,
+                {leagues[match.home_team_id], leagues[match.away_team_id]})
+
+
+class MatchEventIngestor(Ingestor):
+    """
+    Appends events to their matches, numbering them after the last
+    sequence of each match and adding goals to the match score
+    """
+    model = football_models.MatchEvent
+    serializer_class = MatchEventRowSerializer
+    # Matches are checked while they are locked
+    relations = {'player': football_models.Player}
+
+    def lock_matches(self):
+        """
+        Lock the matches of the batch, returns ``{pk: Match}``
+        """
+        wanted = {data['match'] for data in self.valid.values()}
+        matches = football_models.Match.objects.select_for_update(
+            of=('self',)).filter(pk__in=wanted).only(
+                'date', 'last_event_sequence', *signals.MATCH_FIELDS)
+        matches = {match.pk: match for match in matches}
+        for index, data in list(self.valid.items()):
+            if data['match'] not in matches:
+                self.error(index, 'match',
+                           f'Invalid pk "{data["match"]}" - '
+                           f'object does not exist.')
+        return matches
+
+    def run(self):
+        self.validate_fields()
+        self.validate_relations()
+        try:
+            return self.append()
+        except IntegrityError as exc:
+            raise IngestError(str(exc))
+
+    def append(self):
+        with transaction.atomic():
+            matches = self.lock_matches()
+            events, goals = [], {}
+            for index in sorted(self.valid):
+                data = self.valid[index]
+                match = matches[data['match']]
+                match.last_event_sequence += 1
+                events.append(self.build(dict(
+                    data, sequence=match.last_event_sequence)))
+                if data['kind'] == football_models.MatchEvent.GOAL:
+                    side = goals.setdefault(match.pk, {'home': 0, 'away': 0})
+                    side[data['side']] += 1
+            self.model.objects.bulk_create(events, batch_size=BATCH_SIZE)
+            self.update_matches(matches, goals)
+        return {
+            'created': len(events),
+            'errors': [{'row': index, 'errors': self.errors[index]}
+                       for index in sorted(self.errors)],
+            'sequences': {match.pk: match.last_event_sequence
+                          for match in matches.values()},
+        }
+
+    def build(self, data):
+        data = dict(data)
+        data['match_id'] = data.pop('match')
+        return super().build(data)
+
+    def update_matches(self, matches, goals):
+        """
+        Move sequences and add goals to scores, then update standings and
+        notify live subscribers as saving the matches would
+        """
+        for match in matches.values():
+            fields = {'last_event_sequence': match.last_event_sequence}
+            scored = goals.get(match.pk)
+            if scored is not None:
+                fields.update(
+                    home_team_score=F('home_team_score') + scored['home'],
+                    away_team_score=F('away_team_score') + scored['away'],
+                    version=F('version') + 1)
+            football_models.Match.objects.filter(pk=match.pk).update(
+                **fields)
+        if not goals:
+            return
+
+        deltas, club_ids = [], set()
+        for pk, scored in goals.items():
+            match = matches[pk]
+            deltas.append(standings.match_deltas(
+                *signals.match_state(match), sign=-1))
+            match.home_team_score += scored['home']
+            match.away_team_score += scored['away']
+            deltas.append(standings.match_deltas(
+                *signals.match_state(match)))
+            club_ids.update((match.home_team_id, match.away_team_id))
+        standings.apply_deltas(standings.merge_deltas(*deltas))
+        caching.bump_club_matches(club_ids)
+        changes.record(football_models.Match, list(goals))
+        transaction.on_commit(fixtures.invalidate)
+
+        leagues = dict(football_models.Club.objects.filter(
+            pk__in=club_ids).values_list('pk', 'league_id'))
+        for pk in goals:
+            match = matches[pk]
+            league_ids = {leagues[match.home_team_id],
+                          leagues[match.away_team_id]}
+            signals.publish_match_score(match, False, league_ids)
+
+
+INGESTORS = {
+    'clubs': ClubIngestor,
+    'players': PlayerIngestor,
+    'matches': MatchIngestor,
+    'events': MatchEventIngestor,
+}
+
+
+def ingest(kind, rows):
+    """
+    Validate and write ``rows`` of given kind, returning a report
+    """
+    return INGESTORS[kind](rows).run()
+
+
+def parse_rows(content, ndjson=False):
+    """
+    Parse a JSON array or newline delimited JSON objects
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    if ndjson:
+        return [json.loads(line) for line in content.splitlines()
+                if line.strip()]
+    rows = json.loads(content)
+    if not isinstance(rows, list):
+        raise ValueError('Expected a JSON array of rows')
+    return rows
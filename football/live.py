@@ -0,0 +1,260 @@
+"""
+Live score push channel
+
+Match score changes are published to a pub/sub hub and streamed to clients
+as Server-Sent Events by a small ASGI application mounted in front of Django
+(see ``app/asgi.py``). Clients subscribe with query parameters, e.g.
+``/api/football/live/?match=1&club=4&league=2``.
+"""
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'football.live.LocalBackend'
+DEFAULT_PATH = '/api/football/live/'
+DEFAULT_KEEPALIVE = 15
+DEFAULT_QUEUE_SIZE = 100
+
+TOPIC_PARAMS = ('match', 'club', 'league')
+
+
+def topic(kind, pk):
+    """
+    Build a topic name for given object kind and primary key
+    """
+    return f"{kind}:{pk}"
+
+
+class Subscription:
+    """
+    Bounded queue of messages for a single subscriber
+
+    Messages are delivered from any thread onto the subscriber's event loop.
+    When a slow client lets the queue fill up, the oldest message is dropped.
+    """
+    def __init__(self, topics, maxsize=DEFAULT_QUEUE_SIZE):
+        self.topics = frozenset(topics)
+        self.loop = asyncio.get_event_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBackend:
+    """
+    In-process pub/sub backend
+
+    Only reaches subscribers connected to the same process. Deployments
+    running several workers should plug in a backend relaying messages
+    between them (e.g. through Redis) via ``FOOTBALL_LIVE['BACKEND']``.
+    """
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, subscription):
+        with self._lock:
+            for name in subscription.topics:
+                self._subscribers.setdefault(name, set()).add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for name in subscription.topics:
+                subscribers = self._subscribers.get(name)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[name]
+
+    def publish(self, topics, message):
+        with self._lock:
+            recipients = set()
+            for name in topics:
+                recipients.update(self._subscribers.get(name, ()))
+        for subscription in recipients:
+            subscription.deliver(message)
+        return len(recipients)
+
+
+class Hub:
+    """
+    Fan-out point for live score messages
+    """
+    def __init__(self, backend):
+        self.backend = backend
+
+    def subscribe(self, topics, maxsize=DEFAULT_QUEUE_SIZE):
+        subscription = Subscription(topics, maxsize=maxsize)
+        self.backend.subscribe(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.backend.unsubscribe(subscription)
+
+    def publish(self, topics, message):
+        return self.backend.publish(topics, message)
+
+
+def get_option(name, default):
+    return getattr(settings, 'FOOTBALL_LIVE', {}).get(name, default)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """
+    Return the process wide hub, creating it on first use
+    """
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                backend_class = import_string(
+                    get_option('BACKEND', DEFAULT_BACKEND))
+                _hub = Hub(backend_class(**get_option('OPTIONS', {})))
+    return _hub
+
+
+def match_message(match, league_ids, created=False):
+    """
+    Build the score delta message for a saved Match
+    """
+    return {
+        'match': match.pk,
+        'created': created,
+        'date': str(match.date),
+        'home_team': match.home_team_id,
+        'away_team': match.away_team_id,
+        'home_team_score': match.home_team_score,
+        'away_team_score': match.away_team_score,
+        'leagues': sorted(league_ids),
+    }
+
+
+def match_topics(match, league_ids):
+    topics = [
+        topic('match', match.pk),
+        topic('club', match.home_team_id),
+        topic('club', match.away_team_id),
+    ]
+    topics.extend(topic('league', pk) for pk in league_ids)
+    return topics
+
+
+def subscription_topics(query_string):
+    """
+    Parse ``match``/``club``/``league`` query parameters into topics
+    """
+    params = parse_qs(query_string)
+    topics = set()
+    for kind in TOPIC_PARAMS:
+        for value in params.get(kind, ()):
+            for pk in value.split(','):
+                if pk.strip().isdigit():
+                    topics.add(topic(kind, int(pk)))
+    return topics
+
+
+async def _send_error(send, status, detail):
+    body = json.dumps({'detail': detail}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def live_scores(scope, receive, send):
+    """
+    ASGI application streaming score deltas as Server-Sent Events
+    """
+    if scope['method'] != 'GET':
+        await _send_error(send, 405, 'Method not allowed.')
+        return
+    topics = subscription_topics(scope.get('query_string', b'').decode())
+    if not topics:
+        await _send_error(
+            send, 400, 'Subscribe with match, club or league parameters.')
+        return
+
+    hub = get_hub()
+    subscription = hub.subscribe(
+        topics, maxsize=get_option('QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+    keepalive = get_option('KEEPALIVE', DEFAULT_KEEPALIVE)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'retry: 3000\n\n',
+            'more_body': True,
+        })
+        while True:
+            message = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {message, disconnected}, timeout=keepalive,
+                return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                message.cancel()
+                break
+            if message in done:
+                chunk = 'event: score\ndata: {}\n\n'.format(
+                    json.dumps(message.result()))
+            else:
+                message.cancel()
+                chunk = ': keepalive\n\n'
+            await send({
+                'type': 'http.response.body',
+                'body': chunk.encode(),
+                'more_body': True,
+            })
+    finally:
+        hub.unsubscribe(subscription)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        event = await receive()
+        if event['type'] == 'http.disconnect':
+            return
+
+
+def router(application, path=None):
+    """
+    Wrap an ASGI application, serving the live endpoint on ``path``
+    """
+    path = path or get_option('PATH', DEFAULT_PATH)
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == path:
+            await live_scores(scope, receive, send)
+        else:
+            await application(scope, receive, send)
+
+    return app
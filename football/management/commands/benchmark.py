@@ -0,0 +1,80 @@
+import datetime
+import json
+import platform
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import football_models
+from football import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Benchmark api/ endpoints in-process, reporting latency '
+            'percentiles, queries and bytes per request')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Clear the response cache before every request')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Only run given URL name, e.g. football:club-list')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument(
+            '--output', help='Save results as JSON to this file')
+        parser.add_argument(
+            '--compare', help='JSON results of a previous run to compare')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as report:
+                    previous = json.load(report)['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f'Can not read {options["compare"]}: {exc}')
+
+        results = benchmark.run(
+            get_user_model(), requests=options['requests'],
+            warmup=options['warmup'], cold=options['cold'],
+            host=options['host'], only=options['endpoints'])
+        report = {
+            'meta': {
+                'timestamp': datetime.datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'cold': options['cold'],
+                'rows': {
+                    model.__name__: model.objects.count()
+                    for model in (football_models.League,
+                                  football_models.Club,
+                                  football_models.Player,
+                                  football_models.Match)
+                },
+            },
+            'results': results,
+        }
+
+        self.stdout.write(f"{'endpoint':32} {'p50':>9} {'p95':>9} "
+                          f"{'p99':>9} {'queries':>7} {'bytes':>9}")
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:32} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} "
+                f"{stats['p99_ms']:9.2f} {stats['queries']:7} "
+                f"{stats['bytes']:9}")
+        if previous is not None:
+            report['changes'] = benchmark.compare(previous, results)
+            for name, changes in report['changes'].items():
+                self.stdout.write(f'{name}: ' + ', '.join(
+                    f'{metric} {change:+.1%}'
+                    for metric, change in changes.items()))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f"Saved results to {options['output']}"))
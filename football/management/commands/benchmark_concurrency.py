@@ -0,0 +1,66 @@
+import datetime
+import json
+import platform
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from football import asynchronous, benchmark
+
+
+class Command(BaseCommand):
+    help = ('Compare football reads served by a threaded WSGI server with '
+            'the async ASGI path, under concurrent clients')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument(
+            '--wsgi-threads', type=int, default=8,
+            help='Threads of the WSGI server, e.g. gunicorn --threads')
+        parser.add_argument(
+            '--client-delay', type=float, default=0.0,
+            help='Milliseconds a slow client takes per response chunk')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Only run given URL name, e.g. football:club-list')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument(
+            '--output', help='Save results as JSON to this file')
+
+    def handle(self, *args, **options):
+        results = benchmark.run_concurrency(
+            WSGIHandler(), asynchronous.ASGIHandler(),
+            requests=options['requests'],
+            concurrency=options['concurrency'], host=options['host'],
+            client_delay=options['client_delay'] / 1000,
+            wsgi_threads=options['wsgi_threads'], only=options['endpoints'])
+
+        self.stdout.write(f"{'endpoint':26} {'interface':9} {'req/s':>9} "
+                          f"{'p50':>9} {'p95':>9} {'p99':>9}")
+        for name, interfaces in results.items():
+            for interface in ('wsgi', 'asgi'):
+                stats = interfaces[interface]
+                self.stdout.write(
+                    f"{name:26} {interface:9} "
+                    f"{stats['requests_per_second']:9.1f} "
+                    f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} "
+                    f"{stats['p99_ms']:9.2f}")
+        if options['output']:
+            report = {
+                'meta': {
+                    'timestamp': datetime.datetime.now().isoformat(),
+                    'python': platform.python_version(),
+                    'database': connection.vendor,
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                    'wsgi_threads': options['wsgi_threads'],
+                    'client_delay_ms': options['client_delay'],
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f"Saved results to {options['output']}"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from football import changes
+
+
+class Command(BaseCommand):
+    help = 'Compact the change log used by delta sync'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int,
+            default=changes.DEFAULT_RETENTION_DAYS,
+            help='Expire entries older than this, clients behind them '
+                 'download the full lists again')
+        parser.add_argument(
+            '--keep-history', action='store_true',
+            help='Only drop superseded entries')
+
+    def handle(self, *args, **options):
+        retention_days = None if options['keep_history'] \
+            else options['retention_days']
+        deleted = changes.compact(retention_days)
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} change log entries'))
@@ -0,0 +1,142 @@
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from core import football_models
+from football import serializers
+from football.pagination import KeysetCursorPagination, MatchCursorPagination
+from football.querysets import optimize_queryset
+
+# Plan lines reading a whole table or index, or sorting rows outside of
+# an index. SCAN of a table is flagged with or without USING (COVERING)
+# INDEX, only the rows of materialized subqueries may be scanned.
+FULL_SCAN = re.compile(
+    r'^(?:.*\bSCAN (?:TABLE )?(?P<table>\w+)|.*TEMP B-TREE|.*Seq Scan)',
+    re.MULTILINE)
+PAGE_SIZE = 100
+
+
+def index_name(model, fields):
+    return next(index.name for index in model._meta.indexes
+                if index.fields == fields)
+
+
+def full_scan(plan, tables):
+    for line in FULL_SCAN.finditer(plan):
+        if line['table'] is None or line['table'] in tables:
+            return line
+    return None
+
+
+def keyset_page(queryset, pagination_class, cursor):
+    paginator = pagination_class()
+    paginator.fields = [field.lstrip('-') for field in paginator.ordering]
+    paginator.descending = [
+        field.startswith('-') for field in paginator.ordering]
+    return queryset.filter(paginator.keyset_filter(cursor)).order_by(
+        *paginator.ordering)[:PAGE_SIZE + 1]
+
+
+def endpoint_queries():
+    """
+    Queries run by the main endpoints, with placeholder parameters
+    """
+    today = datetime.date.today()
+    return [
+        ('league list page', keyset_page(
+            optimize_queryset(football_models.League.objects.all(),
+                              serializers.LeagueSerializer),
+            KeysetCursorPagination, [1])),
+        ('club list page', keyset_page(
+            optimize_queryset(football_models.Club.objects.all(),
+                              serializers.ClubSerializer),
+            KeysetCursorPagination, [1])),
+        ('position list page', keyset_page(
+            football_models.Position.objects.all(),
+            KeysetCursorPagination, [1])),
+        ('match list page', keyset_page(
+            football_models.Match.objects.all(),
+            MatchCursorPagination, [today, 1])),
+        ('league standings', optimize_queryset(
+            football_models.Standing.objects.filter(
+                league_id=1).order_by('rank'),
+            serializers.StandingSerializer)),
+        ('leagues by country',
+            football_models.League.objects.filter(country='PL')),
+        ('clubs of league', football_models.Club.objects.filter(
+            league_id=1).order_by('name')),
+        ('matches on date',
+            football_models.Match.objects.filter(date=today)),
+        ('home matches of club', football_models.Match.objects.filter(
+            home_team_id=1).order_by('-date')[:10]),
+        ('away matches of club', football_models.Match.objects.filter(
+            away_team_id=1).order_by('-date')[:10]),
+        ('recent home matches of club', football_models.Match.objects.filter(
+            home_team_id=1).order_by('-date', '-pk')[:PAGE_SIZE]),
+        ('head-to-head matches', football_models.Match.objects.filter(
+            home_team_id=1, away_team_id=2)),
+        ('name prefix search', football_models.SearchTerm.objects.filter(
+            kind='player', tier=0, term__gte='lew',
+            term__lt='lew\uffff').order_by('term')[:PAGE_SIZE]),
+        ('name trigram count', football_models.SearchTrigram.objects.filter(
+            kind='player', trigram='lew').values('pk')[:PAGE_SIZE]),
+        ('name trigram candidates',
+            football_models.SearchTrigram.objects.filter(
+                kind='player', trigram__in=[' le', 'lew', 'ewa']).values_list(
+                    'object_id', flat=True)),
+        ('name trigram verification',
+            football_models.SearchTrigram.objects.filter(
+                kind='player', object_id__in=[1, 2],
+                trigram__in=[' le', 'lew', 'ewa']).values(
+                    'object_id').annotate(shared=Count('pk'))),
+        ('shirt number check', football_models.Player.objects.filter(
+            club_id=1, number=1).exclude(pk=1)),
+    ]
+
+
+def expected_indexes():
+    """
+    Indexes queries must use, where a worse index would still be searched
+    """
+    trigram = football_models.SearchTrigram
+    return {
+        'name prefix search': index_name(
+            football_models.SearchTerm, ['kind', 'tier', 'term']),
+        'name trigram count': index_name(
+            trigram, ['kind', 'trigram', 'object_id']),
+        'name trigram candidates': index_name(
+            trigram, ['kind', 'trigram', 'object_id']),
+        'name trigram verification': index_name(
+            trigram, ['kind', 'object_id']),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the main endpoint queries and check index use'
+
+    def handle(self, *args, **options):
+        tables = set(connection.introspection.table_names())
+        indexes = expected_indexes()
+        failures = []
+        for name, queryset in endpoint_queries():
+            plan = queryset.explain()
+            if full_scan(plan, tables):
+                status = 'NO INDEX'
+            elif name in indexes and f' {indexes[name]} ' not in plan:
+                status = f'NOT USING {indexes[name]}'
+            else:
+                status = None
+            if status:
+                failures.append(name)
+            self.stdout.write(f'{name}: ' + (
+                self.style.ERROR(status) if status
+                else self.style.SUCCESS('INDEX')))
+            if options['verbosity'] > 1 or status:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+        if failures:
+            raise CommandError(
+                f"Queries without index: {', '.join(failures)}")
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from football import export
+
+
+class Command(BaseCommand):
+    help = 'Stream all clubs, players or matches as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS))
+        parser.add_argument(
+            '--format', dest='fmt', choices=sorted(export.FORMATS),
+            default='ndjson')
+        parser.add_argument('--league', type=int)
+        parser.add_argument('--date-from', help='YYYY-MM-DD, matches only')
+        parser.add_argument('--date-to', help='YYYY-MM-DD, matches only')
+        parser.add_argument(
+            '--after', type=int,
+            help='Resume after this id, the last one already exported')
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument(
+            '--output', default='-', help='Output file, "-" for stdout')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        filters = export.ExportFilterSerializer(
+            data={name: options[name] for name in (
+                'fmt', 'league', 'date_from', 'date_to', 'after')
+                if options[name] is not None},
+            context={'export': export.EXPORTS[kind]})
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+        lines = export.stream(
+            kind, chunk_size=options['chunk_size'], **filters.validated_data)
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            for line in lines:
+                output.write(line)
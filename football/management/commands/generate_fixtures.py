@@ -0,0 +1,156 @@
+import datetime
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django_countries import countries
+
+from core import football_models
+from football import caching, changes, fixtures, search, standings
+
+BATCH_SIZE = 10000
+POSITIONS = (
+    ('GK', 'Goalkeeper'),
+    ('DF', 'Defender'),
+    ('MF', 'Midfielder'),
+    ('FW', 'Forward'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Generate a large seeded synthetic football dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leagues', type=int, default=2000)
+        parser.add_argument('--clubs', type=int, default=200000)
+        parser.add_argument('--players', type=int, default=500000)
+        parser.add_argument('--matches', type=int, default=2000000)
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help='Multiply every row count, e.g. 0.01 for a quick run')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skip-standings', action='store_true',
+            help='Do not rebuild standings after generating matches')
+        parser.add_argument(
+            '--skip-search', action='store_true',
+            help='Do not rebuild the name search index')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        scale = options['scale']
+        sizes = {name: max(1, int(options[name] * scale))
+                 for name in ('leagues', 'clubs', 'players', 'matches')}
+        # Numbers are unique per club and limited to 0-100
+        sizes['players'] = min(sizes['players'], sizes['clubs'] * 100)
+
+        with transaction.atomic():
+            position_ids = self.create_positions()
+            league_ids = self.create_leagues(sizes['leagues'])
+            clubs = self.create_clubs(sizes['clubs'], league_ids)
+            self.create_players(sizes['players'], clubs, position_ids)
+            self.create_matches(sizes['matches'], clubs)
+            changes.reset()
+        for model in (football_models.Position, football_models.League,
+                      football_models.Club, football_models.Player,
+                      football_models.Match):
+            caching.bump_version(model)
+        caching.bump_club_matches(
+            [pk for club_ids in clubs.values() for pk in club_ids])
+        fixtures.invalidate()
+        if not options['skip_standings']:
+            self.stdout.write('Rebuilding standings')
+            standings.rebuild_standings()
+        if not options['skip_search']:
+            self.stdout.write('Rebuilding search index')
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            'Generated ' + ', '.join(
+                f'{count} {name}' for name, count in sizes.items())))
+
+    def next_id(self, model):
+        return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def bulk_create(self, model, objects):
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+    def create_positions(self):
+        existing = list(football_models.Position.objects.values_list(
+            'pk', flat=True))
+        if existing:
+            return existing
+        football_models.Position.objects.bulk_create([
+            football_models.Position(short_name=short, long_name=long)
+            for short, long in POSITIONS
+        ])
+        return list(football_models.Position.objects.values_list(
+            'pk', flat=True))
+
+    def create_leagues(self, count):
+        codes = [code for code, name in countries]
+        first = self.next_id(football_models.League)
+        self.bulk_create(football_models.League, (
+            football_models.League(
+                pk=first + i, name=f'League {first + i}',
+                country=self.random.choice(codes))
+            for i in range(count)
+        ))
+        return list(range(first, first + count))
+
+    def create_clubs(self, count, league_ids):
+        """
+        Spread clubs evenly over leagues, returns ``{league: [club ids]}``
+        """
+        first = self.next_id(football_models.Club)
+        clubs = {}
+        objects = []
+        for i in range(count):
+            league_id = league_ids[i % len(league_ids)]
+            clubs.setdefault(league_id, []).append(first + i)
+            objects.append(football_models.Club(
+                pk=first + i, league_id=league_id, name=f'Club {first + i}'))
+        self.bulk_create(football_models.Club, objects)
+        return clubs
+
+    def create_players(self, count, clubs, position_ids):
+        codes = [code for code, name in countries]
+        club_ids = [pk for ids in clubs.values() for pk in ids]
+        first = self.next_id(football_models.Player)
+        self.bulk_create(football_models.Player, (
+            football_models.Player(
+                pk=first + i, name=f'Player {first + i}',
+                # Consecutive rounds over clubs take consecutive numbers
+                number=i // len(club_ids),
+                age=self.random.randint(16, 40),
+                nationality=self.random.choice(codes),
+                position_id=self.random.choice(position_ids),
+                club_id=club_ids[i % len(club_ids)])
+            for i in range(count)
+        ))
+
+    def create_matches(self, count, clubs):
+        leagues = [ids for ids in clubs.values() if len(ids) > 1]
+        if not leagues:
+            return
+        season_start = datetime.date.today() - datetime.timedelta(days=365)
+        first = self.next_id(football_models.Match)
+
+        def matches():
+            for i in range(count):
+                home, away = self.random.sample(
+                    leagues[i % len(leagues)], 2)
+                yield football_models.Match(
+                    pk=first + i, home_team_id=home, away_team_id=away,
+                    date=season_start + datetime.timedelta(
+                        days=self.random.randint(0, 400)),
+                    home_team_score=self.random.randint(0, 5),
+                    away_team_score=self.random.randint(0, 5))
+
+        self.bulk_create(football_models.Match, matches())
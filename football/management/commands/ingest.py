@@ -0,0 +1,40 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from football import ingest
+
+
+class Command(BaseCommand):
+    help = 'Bulk create or update clubs, players or matches from a feed file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(ingest.INGESTORS))
+        parser.add_argument(
+            'path', help='JSON array or NDJSON file, "-" for stdin')
+        parser.add_argument(
+            '--ndjson', action='store_true',
+            help='Read newline delimited JSON (default for .ndjson files)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        ndjson = options['ndjson'] or path.endswith(('.ndjson', '.jsonl'))
+        try:
+            if path == '-':
+                content = sys.stdin.read()
+            else:
+                with open(path, encoding='utf-8') as feed:
+                    content = feed.read()
+            rows = ingest.parse_rows(content, ndjson=ndjson)
+            report = ingest.ingest(options['kind'], rows)
+        except (OSError, ValueError, ingest.IngestError) as exc:
+            raise CommandError(exc)
+        for error in report['errors']:
+            self.stderr.write(json.dumps(error))
+        # Events are only appended, their report has no updates
+        summary = [f"Created {report['created']}"]
+        if 'updated' in report:
+            summary.append(f"updated {report['updated']}")
+        summary.append(f"rejected {len(report['errors'])}")
+        self.stdout.write(self.style.SUCCESS(', '.join(summary)))
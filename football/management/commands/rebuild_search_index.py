@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from football import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the name search index of clubs and players'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', action='append', choices=sorted(search.MODELS),
+            help='Only rebuild this kind, may be repeated')
+
+    def handle(self, *args, **options):
+        counts = search.rebuild(options['kind'])
+        self.stdout.write(self.style.SUCCESS(', '.join(
+            f'Indexed {count} {kind}s' for kind, count in counts.items())))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from football import standings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild league standings from match history or check them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--league', type=int, action='append', dest='leagues',
+            help='Limit to given league id (can be repeated)')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report standings that differ from match history')
+
+    def handle(self, *args, **options):
+        leagues = options['leagues']
+        if options['check']:
+            mismatches = standings.check_standings(leagues)
+            for club_id, (stored, expected) in sorted(mismatches.items()):
+                self.stderr.write(
+                    f'Club {club_id}: stored {stored}, expected {expected}')
+            if mismatches:
+                raise CommandError(
+                    f'{len(mismatches)} inconsistent standings')
+            self.stdout.write(self.style.SUCCESS('Standings are consistent'))
+            return
+        count = standings.rebuild_standings(leagues)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} standings'))
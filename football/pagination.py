@@ -0,0 +1,166 @@
+"""
+Keyset cursor pagination for football list endpoints
+
+Pages are selected with ``WHERE (date, id) > (...)`` style conditions on the
+ordering columns instead of OFFSET, so every page costs one index range scan.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import reduce
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_PAGE_SIZE = 1000
+
+
+def get_option(name, default):
+    return getattr(settings, 'FOOTBALL_PAGINATION', {}).get(name, default)
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination keyed on a unique ordering, ``(id)`` by default
+    """
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = get_option('PAGE_SIZE', DEFAULT_PAGE_SIZE)
+        max_page_size = get_option('MAX_PAGE_SIZE', DEFAULT_MAX_PAGE_SIZE)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return min(page_size, max_page_size)
+        if requested <= 0:
+            return min(page_size, max_page_size)
+        return min(requested, max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = [field.startswith('-') for field in self.ordering]
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(
+                    self.keyset_filter(cursor['k'], reverse))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        queryset = queryset.order_by(*self.get_ordering(reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_key = self.previous_key = None
+        if results:
+            first, last = self.get_key(results[0]), self.get_key(results[-1])
+            if reverse:
+                self.next_key = last
+                self.previous_key = first if has_more else None
+            else:
+                self.next_key = last if has_more else None
+                self.previous_key = first if cursor is not None else None
+        return results
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return list(self.ordering)
+        return [field[1:] if desc else '-' + field
+                for field, desc in zip(self.fields, self.descending)]
+
+    def keyset_filter(self, values, reverse=False):
+        """
+        Build ``(a, b) > (x, y)`` as ``a >= x AND (a > x OR b > y)``,
+        the leading range lets the database seek the index
+        """
+        conditions = []
+        for i, field in enumerate(self.fields):
+            after = self.descending[i] == reverse
+            lookup = f'{field}__gt' if after else f'{field}__lt'
+            condition = Q(**{lookup: values[i]})
+            for previous, value in zip(self.fields[:i], values[:i]):
+                condition &= Q(**{previous: value})
+            conditions.append(condition)
+        keyset = reduce(lambda a, b: a | b, conditions)
+        if len(self.fields) > 1:
+            after = self.descending[0] == reverse
+            lookup = f'{self.fields[0]}__gte' if after \
+                else f'{self.fields[0]}__lte'
+            keyset = Q(**{lookup: values[0]}) & keyset
+        return keyset
+
+    def get_key(self, instance):
+        if isinstance(instance, dict):
+            return [instance[field] for field in self.fields]
+        return [getattr(instance, field) for field in self.fields]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if len(cursor['k']) != len(self.fields):
+                raise ValueError
+            cursor['r'] = bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, key, reverse):
+        data = {'k': [str(value) for value in key], 'r': int(reverse)}
+        encoded = urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode()).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        return self.encode_cursor(self.next_key, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_key is None:
+            return None
+        return self.encode_cursor(self.previous_key, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class MatchCursorPagination(KeysetCursorPagination):
+    """
+    Cursor pagination for matches keyed on ``(date, id)``
+    """
+    ordering = ('date', 'id')
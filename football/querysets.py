@@ -0,0 +1,98 @@
+"""
+Queryset helpers deriving eager loading from serializer fields
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import relations, serializers
+
+
+@lru_cache(maxsize=None)
+def related_lookups(serializer_class):
+    """
+    Return ``(select_related, prefetch_related)`` lookups needed to render
+    ``serializer_class`` without extra queries per row
+    """
+    select, prefetch = set(), set()
+    _collect(serializer_class(), '', select, prefetch)
+    return tuple(sorted(select)), tuple(sorted(prefetch))
+
+
+def _needs_related_object(field):
+    """
+    Fields reading only the foreign key column do not need a join
+    """
+    if isinstance(field, relations.ManyRelatedField):
+        return True
+    if isinstance(field, relations.RelatedField):
+        return not (field.use_pk_only_optimization() and
+                    len(field.source_attrs) == 1)
+    return (isinstance(field, serializers.BaseSerializer) or
+            len(field.source_attrs) > 1)
+
+
+def _collect(serializer, prefix, select, prefetch, prefetched=False):
+    model = serializer.Meta.model
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        if not _needs_related_object(field):
+            continue
+        lookup, many, related_model = _walk(model, field.source_attrs)
+        if lookup is None:
+            continue
+        lookup = prefix + lookup
+        many = many or prefetched
+        (prefetch if many else select).add(lookup)
+        child = getattr(field, 'child', field)
+        if isinstance(child, serializers.ModelSerializer) and \
+                child.Meta.model is related_model:
+            _collect(child, lookup + '__', select, prefetch, many)
+
+
+def _walk(model, attrs):
+    """
+    Follow ``attrs`` through model relations.
+    Returns the lookup, whether it is many-valued and the related model.
+    """
+    path = []
+    for attr in attrs:
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not model_field.is_relation:
+            break
+        path.append(attr)
+        model = model_field.related_model
+        if model_field.many_to_many or model_field.one_to_many:
+            return '__'.join(path), True, model
+    if not path:
+        return None, False, None
+    return '__'.join(path), False, model
+
+
+def optimize_queryset(queryset, serializer_class):
+    """
+    Apply eager loading required by ``serializer_class`` to ``queryset``
+    """
+    select, prefetch = related_lookups(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def related_models(model, serializer_class):
+    """
+    Return ``model`` and every model ``serializer_class`` renders from it
+    """
+    models = {model}
+    select, prefetch = related_lookups(serializer_class)
+    for lookup in select + prefetch:
+        current = model
+        for name in lookup.split('__'):
+            current = current._meta.get_field(name).related_model
+            models.add(current)
+    return models
@@ -0,0 +1,205 @@
+"""
+Write-behind queue of score updates
+
+On SQLite every write takes the database lock, so a burst of concurrent
+score updates (a goal in several matches at once, or a feed resending a
+match) serializes on it and requests time out. With
+``FOOTBALL_SCORE_QUEUE['ENABLED']``, score updates are queued in process
+memory and a single writer thread flushes them every ``WINDOW_MS``, up to
+``MAX_BATCH`` at a time, in one transaction through
+``football.scores.apply_updates``. Updates to the same match within a
+window are checked in order and coalesced into one row write.
+
+``ACK`` chooses when writers are answered: ``commit`` waits for the flush
+and answers the update result, ``queued`` answers as soon as the update
+is queued, which is lost if the process dies and whose conflicts are only
+counted. Beyond ``MAX_PENDING`` queued updates, submitting raises
+``Overloaded`` so that feeds back off. Queue sizes, waits and flushes are
+exported by ``/metrics``.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections
+
+from core import metrics
+from football import scores
+
+logger = logging.getLogger(__name__)
+
+ACK_COMMIT = 'commit'
+ACK_QUEUED = 'queued'
+DEFAULT_WINDOW_MS = 20
+DEFAULT_MAX_BATCH = 500
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_ACK_TIMEOUT = 10
+# Lock waits that ran out: SQLite past its busy_timeout, PostgreSQL
+# lock_not_available, deadlock_detected and serialization_failure
+BUSY_MESSAGES = ('database is locked', 'database table is locked')
+BUSY_PGCODES = {'55P03', '40P01', '40001'}
+
+
+def get_option(name, default):
+    return getattr(settings, 'FOOTBALL_SCORE_QUEUE', {}).get(name, default)
+
+
+class Overloaded(Exception):
+    """
+    Raised when too many score updates are waiting to be written,
+    or an update was not written in time
+    """
+
+
+def should_retry(exc):
+    """
+    Return whether writers may retry after ``exc``, other database errors
+    are not solved by waiting
+    """
+    if isinstance(exc, Overloaded):
+        return True
+    if not isinstance(exc, OperationalError):
+        return False
+    return getattr(exc.__cause__, 'pgcode', None) in BUSY_PGCODES or any(
+        message in str(exc) for message in BUSY_MESSAGES)
+
+
+class ScoreQueue:
+    """
+    Pending score updates and the thread writing them
+    """
+    def __init__(self, window=None, max_batch=None, max_pending=None,
+                 autostart=True):
+        self.window = window if window is not None else get_option(
+            'WINDOW_MS', DEFAULT_WINDOW_MS) / 1000
+        self.max_batch = max_batch or get_option(
+            'MAX_BATCH', DEFAULT_MAX_BATCH)
+        self.max_pending = max_pending or get_option(
+            'MAX_PENDING', DEFAULT_MAX_PENDING)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._flushing = threading.Lock()
+        self._pending = []
+        # Without a writer thread, batches are written by calling flush()
+        self.autostart = autostart
+        self._thread = None
+        self._totals = dict.fromkeys(
+            ('submitted', 'coalesced', 'rejected', 'conflicts', 'failed',
+             'flushes'), 0)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._totals, pending=len(self._pending))
+
+    def submit(self, update):
+        """
+        Queue a ``ScoreUpdate``, returns a Future of its result
+        """
+        future = Future()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._totals['rejected'] += 1
+                raise Overloaded('Too many pending score updates')
+            self._pending.append((update, future, time.perf_counter()))
+            self._totals['submitted'] += 1
+            self._ready.notify()
+            if self.autostart and not (
+                    self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(
+                    target=self.run, name='score-queue', daemon=True)
+                self._thread.start()
+        return future
+
+    def run(self):
+        while True:
+            with self._ready:
+                while not self._pending:
+                    self._ready.wait()
+            # Let the burst gather
+            time.sleep(self.window)
+            try:
+                while self.flush() == self.max_batch:
+                    pass
+            except Exception:
+                # Keep writing later batches
+                logger.exception('Score queue flush failed')
+
+    def flush(self):
+        """
+        Write one batch of pending updates, returns its size
+        """
+        with self._flushing:
+            with self._lock:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            for _, _, queued in batch:
+                metrics.score_queue_wait.observe(start - queued)
+            close_old_connections()
+            failed = 0
+            try:
+                results = scores.apply_updates(
+                    [update for update, _, _ in batch])
+            except Exception as exc:
+                # Database errors, or errors of receivers of the writes
+                logger.exception('Could not write %d score updates',
+                                 len(batch))
+                results = [exc] * len(batch)
+                failed = len(batch)
+            finally:
+                close_old_connections()
+            metrics.score_queue_flush.observe(time.perf_counter() - start)
+            metrics.score_queue_batch.observe(len(batch))
+
+            with self._lock:
+                self._totals['flushes'] += 1
+                self._totals['failed'] += failed
+                self._totals['coalesced'] += len(batch) - len(
+                    {update.pk for update, _, _ in batch})
+                for result in results:
+                    if isinstance(result, scores.ScoreConflict):
+                        self._totals['conflicts'] += 1
+            for (_, future, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            return len(batch)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """
+    Return the process wide queue, creating it on first use
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = ScoreQueue()
+    return _queue
+
+
+def write(update):
+    """
+    Write a ``ScoreUpdate``, through the queue when enabled. Returns
+    ``(score, replayed)``, or None when only acknowledged as queued
+    """
+    if not get_option('ENABLED', False):
+        return scores.update_score(*update)
+    future = get_queue().submit(update)
+    if get_option('ACK', ACK_COMMIT) == ACK_QUEUED:
+        return None
+    try:
+        return future.result(
+            timeout=get_option('ACK_TIMEOUT', DEFAULT_ACK_TIMEOUT))
+    except FutureTimeoutError:
+        raise Overloaded('Score update not written in time')
@@ -0,0 +1,177 @@
+"""
+Optimistic concurrency for match score updates
+
+Feeds send the score together with the ``version`` of the match they
+last saw. A score write is one read and one conditional ``UPDATE`` of
+the match, not a single statement: matches are read with one indexed
+``values_list`` query, never loading the clubs, as conflicts and retries
+are answered from it without writing and standings need the previous
+score. The score columns are then written with ``UPDATE ... WHERE id =
+%s AND version = %s`` bumping the version, so of two concurrent updates
+based on the same version only one applies, and the match is read again
+only when the ``UPDATE`` matched nothing. A changed score then also
+updates standings, the change log and live subscribers. Each update may
+carry an ``update_id``: the one of the last applied update is kept on
+the match, so a retry of it answers the stored result instead of a
+conflict. Batches of updates (see ``football.score_queue``) are checked
+in order and write every match once.
+"""
+import contextlib
+import functools
+from collections import namedtuple
+
+from django.db import transaction
+from rest_framework import serializers
+
+from core import football_models
+from football import caching, changes, fixtures, signals, standings
+
+STATE_FIELDS = ('date', 'version', 'last_update_id') + signals.MATCH_FIELDS
+
+ScoreUpdate = namedtuple(
+    'ScoreUpdate',
+    'pk home_team_score away_team_score version update_id',
+    defaults=('',))
+
+
+class ScoreUpdateSerializer(serializers.Serializer):
+    """
+    Serializer for score updates of a Match
+    """
+    home_team_score = serializers.IntegerField(min_value=0)
+    away_team_score = serializers.IntegerField(min_value=0)
+    version = serializers.IntegerField(min_value=0)
+    update_id = serializers.CharField(
+        max_length=64, required=False, allow_blank=True, default='')
+
+
+class ScoreConflict(Exception):
+    """
+    Raised when the match was updated since the version given
+    """
+    def __init__(self, state):
+        super().__init__(state)
+        self.state = state
+
+
+def render(pk, state):
+    return {
+        'id': pk,
+        'home_team_score': state['home_team_score'],
+        'away_team_score': state['away_team_score'],
+        'version': state['version'],
+        'update_id': state['last_update_id'],
+    }
+
+
+def load_states(pks):
+    """
+    Return ``{pk: state}`` of existing matches among ``pks``
+    """
+    rows = football_models.Match.objects.filter(pk__in=pks).values_list(
+        'pk', *STATE_FIELDS)
+    return {row[0]: dict(zip(STATE_FIELDS, row[1:])) for row in rows}
+
+
+def match_state(state):
+    return tuple(state[field] for field in signals.MATCH_FIELDS)
+
+
+def update_score(pk, home_team_score, away_team_score, version,
+                 update_id=''):
+    """
+    Write the score of match ``pk`` if it is still at ``version``,
+    returns ``(score, replayed)``
+    """
+    result, = apply_updates([ScoreUpdate(
+        pk, home_team_score, away_team_score, version, update_id)])
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def apply_updates(updates):
+    """
+    Apply ``ScoreUpdate``s in order, writing every match once with its
+    last score. Returns for each update its ``(score, replayed)``, or the
+    ``ScoreConflict`` or ``DoesNotExist`` it failed with
+    """
+    results = [None] * len(updates)
+    # Read outside the transaction: a match still at the version read
+    # when written still has the score read, as every score write bumps it
+    states = load_states({update.pk for update in updates})
+    # {pk: (stored version, stored state, indexes of applied updates)}
+    written = {}
+    for index, update in enumerate(updates):
+        state = states.get(update.pk)
+        if state is None:
+            results[index] = football_models.Match.DoesNotExist()
+            continue
+        if update.update_id and state['last_update_id'] == update.update_id:
+            results[index] = (render(update.pk, state), True)
+            continue
+        if state['version'] != update.version:
+            results[index] = ScoreConflict(render(update.pk, state))
+            continue
+        written.setdefault(update.pk, (
+            state['version'], match_state(state), []))[2].append(index)
+        state.update(home_team_score=update.home_team_score,
+                     away_team_score=update.away_team_score,
+                     version=update.version + 1,
+                     last_update_id=update.update_id)
+        results[index] = (render(update.pk, state), False)
+    if not written:
+        return results
+
+    # A single unchanged score is one UPDATE, needing no transaction
+    single = len(written) == 1 and all(
+        match_state(states[pk]) == previous
+        for pk, (_, previous, _) in written.items())
+    with contextlib.nullcontext() if single else transaction.atomic():
+        changed = {}
+        for pk, (version, previous, indexes) in written.items():
+            state = states[pk]
+            updated = football_models.Match.objects.filter(
+                pk=pk, version=version).update(
+                    home_team_score=state['home_team_score'],
+                    away_team_score=state['away_team_score'],
+                    version=state['version'],
+                    last_update_id=state['last_update_id'])
+            if not updated:
+                # Lost a race with a concurrent write since the read
+                current = load_states([pk]).get(pk)
+                for index in indexes:
+                    results[index] = football_models.Match.DoesNotExist() \
+                        if current is None \
+                        else ScoreConflict(render(pk, current))
+            elif match_state(state) != previous:
+                changed[pk] = previous
+        if changed:
+            scores_changed(states, changed)
+    return results
+
+
+def scores_changed(states, changed):
+    """
+    Update standings, expire analytics and notify as saving would,
+    ``changed`` maps match pks to their previous state
+    """
+    deltas, club_ids = [], set()
+    for pk, previous in changed.items():
+        current = match_state(states[pk])
+        deltas.append(standings.match_deltas(*previous, sign=-1))
+        deltas.append(standings.match_deltas(*current))
+        club_ids.update(current[:2])
+    standings.apply_deltas(standings.merge_deltas(*deltas))
+    caching.bump_club_matches(club_ids)
+    changes.record(football_models.Match, list(changed))
+
+    leagues = dict(football_models.Club.objects.filter(
+        pk__in=club_ids).values_list('pk', 'league_id'))
+    for pk in changed:
+        state = states[pk]
+        transaction.on_commit(functools.partial(fixtures.match_written, pk))
+        signals.publish_match_score(football_models.Match(pk=pk, **{
+            field: state[field] for field in ('date',) + signals.MATCH_FIELDS
+        }), False, {leagues[state['home_team_id']],
+                    leagues[state['away_team_id']]})
@@ -0,0 +1,259 @@
+"""
+Name search of Clubs and Players
+
+Names are normalized (accents and case folded, punctuation removed) and
+stored as one ``SearchTerm`` per word, holding the name from that word to
+the end, plus their ``SearchTrigram``s. A query first looks for terms
+starting with it using index range scans, names starting with the query
+ranking before names with a later word starting with it, and shorter
+names first. When that finds too few results across kinds, names sharing
+most of the query trigrams are added, ranked by similarity.
+"""
+import math
+import unicodedata
+from collections import Counter
+
+from django.db import connections, transaction
+from django.db.models import Count
+
+from core import football_models
+
+BATCH_SIZE = 5000
+MIN_QUERY_LENGTH = 2
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Share of the query trigrams a fuzzy match must contain
+MIN_SIMILARITY = 0.5
+# Trigrams of more index rows only count towards names found by rarer ones
+COMMON_TRIGRAM_ROWS = 1000
+VERIFY_BATCH_SIZE = 100
+# Letters NFKD does not decompose
+FOLDED_LETTERS = str.maketrans({
+    'ł': 'l', 'ø': 'o', 'đ': 'd', 'ð': 'd', 'þ': 'th', 'æ': 'ae',
+    'œ': 'oe', 'ı': 'i',
+})
+MODELS = {
+    'club': football_models.Club,
+    'player': football_models.Player,
+}
+KINDS = {model: kind for kind, model in MODELS.items()}
+
+
+def normalize(name):
+    """
+    Fold accents and case, keeping words of letters and digits
+    """
+    name = unicodedata.normalize('NFKD', name.casefold())
+    name = ''.join(char for char in name
+                   if not unicodedata.combining(char))
+    name = name.translate(FOLDED_LETTERS)
+    return ' '.join(''.join(
+        char if char.isalnum() else ' ' for char in name).split())
+
+
+def trigrams(normalized):
+    padded = f'  {normalized} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def build_entries(kind, pk, name):
+    """
+    Return unsaved ``(terms, trigrams)`` of one object
+    """
+    normalized = normalize(name)
+    words = normalized.split(' ')
+    terms = []
+    for position in range(len(words) if normalized else 0):
+        terms.append(football_models.SearchTerm(
+            kind=kind, object_id=pk, term=' '.join(words[position:]),
+            tier=min(position, 1), position=position,
+            length=len(normalized)))
+    grams = [
+        football_models.SearchTrigram(kind=kind, object_id=pk, trigram=gram)
+        for gram in sorted(trigrams(normalized))
+    ] if normalized else []
+    return terms, grams
+
+
+def delete_entries(kind, pks):
+    football_models.SearchTerm.objects.filter(
+        kind=kind, object_id__in=pks).delete()
+    football_models.SearchTrigram.objects.filter(
+        kind=kind, object_id__in=pks).delete()
+
+
+def index_objects(model, rows):
+    """
+    Replace entries of ``(pk, name)`` rows of ``model``
+    """
+    kind = KINDS[model]
+    rows = list(rows)
+    with transaction.atomic(savepoint=False):
+        delete_entries(kind, [pk for pk, name in rows])
+        write_entries(kind, rows)
+
+
+def write_entries(kind, rows):
+    terms, grams = [], []
+    for pk, name in rows:
+        object_terms, object_grams = build_entries(kind, pk, name)
+        terms.extend(object_terms)
+        grams.extend(object_grams)
+    football_models.SearchTerm.objects.bulk_create(
+        terms, batch_size=BATCH_SIZE)
+    football_models.SearchTrigram.objects.bulk_create(
+        grams, batch_size=BATCH_SIZE)
+
+
+def rebuild(kinds=None):
+    """
+    Rebuild the index of given kinds, returns ``{kind: objects indexed}``
+    """
+    counts = {}
+    for kind in kinds or MODELS:
+        with transaction.atomic():
+            football_models.SearchTerm.objects.filter(kind=kind).delete()
+            football_models.SearchTrigram.objects.filter(kind=kind).delete()
+            rows = MODELS[kind].objects.order_by('pk').values_list(
+                'pk', 'name').iterator(chunk_size=BATCH_SIZE)
+            batch, count = [], 0
+            for row in rows:
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    write_entries(kind, batch)
+                    count += len(batch)
+                    batch = []
+            write_entries(kind, batch)
+            counts[kind] = count + len(batch)
+    return counts
+
+
+def prefix_matches(kind, query, limit):
+    """
+    Return ``{pk: rank}`` of names with a word starting with ``query``
+    """
+    found = {}
+    for tier in (0, 1):
+        if len(found) >= limit:
+            break
+        terms = football_models.SearchTerm.objects.filter(
+            kind=kind, tier=tier, term__gte=query,
+            term__lt=query + '\uffff',
+        ).order_by('term').values_list('object_id', 'position', 'length')
+        # Rank a few pages of terms, ordered by the index
+        for pk, position, length in terms[:limit * 5]:
+            rank = (position, length)
+            if pk not in found or rank < found[pk]:
+                found[pk] = rank
+    return found
+
+
+def capped_counts(querysets, cap):
+    """
+    Count up to ``cap`` rows of each queryset in a single query
+    """
+    selects, params = [], []
+    for queryset in querysets:
+        sql, query_params = queryset.values('pk')[:cap].query.sql_with_params()
+        selects.append(f'(SELECT COUNT(*) FROM ({sql}) counted)')
+        params.extend(query_params)
+    if not selects:
+        return []
+    with connections[querysets[0].db].cursor() as cursor:
+        cursor.execute(f"SELECT {', '.join(selects)}", params)
+        return list(cursor.fetchone())
+
+
+def shared_counts(matched, required, limit):
+    """
+    Count the rows of ``matched`` per object, ranking objects with at
+    least ``required`` of them
+    """
+    sql, params = matched.values('object_id').query.sql_with_params()
+    # Materialized so that rows are found by trigram before grouping,
+    # grouped inline the planner walks every row of the kind by object
+    with connections[matched.db].cursor() as cursor:
+        cursor.execute(
+            f'WITH matched AS MATERIALIZED ({sql}) '
+            'SELECT object_id, COUNT(*) AS shared FROM matched '
+            'GROUP BY object_id HAVING COUNT(*) >= %s '
+            'ORDER BY shared DESC, object_id LIMIT %s',
+            [*params, required, limit])
+        return dict(cursor.fetchall())
+
+
+def fuzzy_matches(kind, query, limit, exclude):
+    """
+    Return ``{pk: shared trigrams}`` of names similar to ``query``
+
+    Only names with one of the rare query trigrams are candidates, their
+    common trigrams are counted best candidates first. Names made of
+    common trigrams only are counted in full when they may still rank.
+    """
+    grams = sorted(trigrams(query))
+    required = math.ceil(len(grams) * MIN_SIMILARITY)
+    rows = football_models.SearchTrigram.objects.filter(kind=kind)
+    counts = capped_counts([rows.filter(trigram=gram) for gram in grams],
+                           COMMON_TRIGRAM_ROWS)
+    common = {gram for gram, count in zip(grams, counts)
+              if count == COMMON_TRIGRAM_ROWS}
+
+    candidates = Counter(rows.filter(
+        trigram__in=[gram for gram in grams if gram not in common]).exclude(
+            object_id__in=exclude).values_list('object_id', flat=True))
+    ordered = sorted(candidates, key=lambda pk: (-candidates[pk], pk))
+    found = []
+    for start in range(0, len(ordered), VERIFY_BATCH_SIZE):
+        # Candidates share at most their rare trigrams and all common ones,
+        # the remaining ones with the same bound have higher pks
+        bound = (-candidates[ordered[start]] - len(common), ordered[start])
+        if -bound[0] < required or (
+                len(found) >= limit and found[limit - 1] < bound):
+            break
+        batch = ordered[start:start + VERIFY_BATCH_SIZE]
+        shared = dict(rows.filter(
+            object_id__in=batch, trigram__in=common).values(
+                'object_id').annotate(shared=Count('pk')).values_list(
+                    'object_id', 'shared')) if common else {}
+        found = sorted(found + [
+            (-candidates[pk] - shared.get(pk, 0), pk) for pk in batch
+            if candidates[pk] + shared.get(pk, 0) >= required])
+
+    found = found[:limit]
+    if len(common) >= required and (
+            len(found) < limit or -found[-1][0] <= len(common)):
+        return shared_counts(rows.filter(trigram__in=grams).exclude(
+            object_id__in=exclude), required, limit)
+    return {pk: -rank for rank, pk in found}
+
+
+def search(query, kinds=None, limit=DEFAULT_LIMIT):
+    """
+    Return ranked ``[{'kind', 'id', 'name', 'match'}]`` for ``query``
+    """
+    query = normalize(query)
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+    kinds = kinds or list(MODELS)
+    prefix = {kind: prefix_matches(kind, query, limit) for kind in kinds}
+    ranked = [((0,) + rank, kind, pk, 'prefix')
+              for kind in kinds for pk, rank in prefix[kind].items()]
+    # Prefix matches rank first, fuzzy ones only fill the remaining places
+    missing = limit - len(ranked)
+    if missing > 0 and len(query) >= 3:
+        for kind in kinds:
+            fuzzy = fuzzy_matches(kind, query, missing, prefix[kind])
+            ranked.extend(((1, -shared, 0), kind, pk, 'fuzzy')
+                          for pk, shared in fuzzy.items())
+    ranked = sorted(ranked)[:limit]
+
+    names = {}
+    for kind in {kind for _, kind, _, _ in ranked}:
+        names[kind] = dict(MODELS[kind].objects.filter(pk__in=[
+            pk for _, entry_kind, pk, _ in ranked if entry_kind == kind
+        ]).values_list('pk', 'name'))
+    return [
+        {'kind': kind, 'id': pk, 'name': names[kind][pk], 'match': match}
+        for _, kind, pk, match in ranked
+        if pk in names[kind]
+    ]
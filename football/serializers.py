@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from core import football_models
-from django_countries.serializer_fields import CountryField
+from football.countries import CountryField
 
 
 class LeagueSerializer(serializers.ModelSerializer):
@@ -33,3 +33,50 @@ class PositionSerializer(serializers.ModelSerializer):
         model = football_models.Position
         fields = ('id', 'short_name', 'long_name')
         read_only_fields = ('id',)
+
+
+class PlayerSerializer(serializers.ModelSerializer):
+    nationality = CountryField(country_dict=True)
+    position = serializers.StringRelatedField()
+    """
+    Serializer for Player Objects
+    """
+    class Meta:
+        model = football_models.Player
+        fields = ('id', 'name', 'number', 'age', 'nationality', 'position')
+        read_only_fields = ('id',)
+
+
+class StandingSerializer(serializers.ModelSerializer):
+    club = serializers.StringRelatedField()
+    """
+    Serializer for Standing Objects
+    """
+    class Meta:
+        model = football_models.Standing
+        fields = ('rank', 'club_id', 'club', 'played', 'won', 'drawn',
+                  'lost', 'goals_for', 'goals_against', 'goal_difference',
+                  'points')
+        read_only_fields = fields
+
+
+class MatchEventSerializer(serializers.ModelSerializer):
+    """
+    Serializer for MatchEvent Objects
+    """
+    class Meta:
+        model = football_models.MatchEvent
+        fields = ('sequence', 'kind', 'side', 'minute', 'player', 'detail',
+                  'created')
+        read_only_fields = fields
+
+
+class MatchSerializer(serializers.ModelSerializer):
+    """
+    Serializer for Match Objects
+    """
+    class Meta:
+        model = football_models.Match
+        fields = ('id', 'home_team', 'away_team', 'date', 'home_team_score',
+                  'away_team_score', 'version')
+        read_only_fields = ('id', 'version')
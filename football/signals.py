@@ -0,0 +1,214 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core import football_models
+from football import caching, changes, fixtures, live, search, standings
+
+SCORE_FIELDS = ('home_team_score', 'away_team_score')
+MATCH_FIELDS = ('home_team_id', 'away_team_id') + SCORE_FIELDS
+
+# Loaded with deferred fields, previous state is read in pre_save
+UNKNOWN = object()
+
+
+def match_state(match):
+    return tuple(getattr(match, field) for field in MATCH_FIELDS)
+
+
+def _league_ids(match):
+    clubs = [
+        football_models.Match.home_team.field.get_cached_value(match, None),
+        football_models.Match.away_team.field.get_cached_value(match, None),
+    ]
+    if all(clubs):
+        return {club.league_id for club in clubs}
+    return set(football_models.Club.objects.filter(
+        pk__in=(match.home_team_id, match.away_team_id)
+    ).values_list('league_id', flat=True))
+
+
+@receiver(post_init, sender=football_models.Match)
+def remember_match_state(sender, instance, **kwargs):
+    """
+    Keep the loaded teams and score so that writes can be diffed
+    """
+    instance._loaded_date = instance.__dict__.get('date')
+    if instance.pk is None:
+        instance._loaded_state = None
+    elif all(field in instance.__dict__
+             for field in MATCH_FIELDS + ('date',)):
+        instance._loaded_state = match_state(instance)
+    else:
+        instance._loaded_state = UNKNOWN
+
+
+@receiver(pre_save, sender=football_models.Match)
+def load_match_state(sender, instance, raw=False, **kwargs):
+    """
+    Read the stored teams and score of a partially loaded match
+    """
+    if raw or instance._loaded_state is not UNKNOWN:
+        return
+    row = football_models.Match.objects.filter(
+        pk=instance.pk).values_list('date', *MATCH_FIELDS).first()
+    instance._loaded_date, instance._loaded_state = \
+        (row[0], row[1:]) if row else (None, None)
+
+
+@receiver(post_save, sender=football_models.Match)
+def match_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Update standings, expire club analytics and push the new score
+    to live subscribers
+    """
+    if raw:
+        return
+    previous, current = instance._loaded_state, match_state(instance)
+    # Form and head to head order matches by date, standings do not
+    rescheduled = instance._loaded_date != instance.date
+    instance._loaded_state = current
+    instance._loaded_date = instance.date
+    if previous == current and not rescheduled:
+        return
+
+    club_ids = set(current[:2])
+    if previous != current:
+        deltas = [standings.match_deltas(*current)]
+        if previous is not None:
+            deltas.append(standings.match_deltas(*previous, sign=-1))
+            club_ids.update(previous[:2])
+        standings.apply_deltas(standings.merge_deltas(*deltas))
+    caching.bump_club_matches(club_ids)
+
+    if previous is None or previous[2:] != current[2:]:
+        publish_match_score(instance, created)
+
+
+@receiver(post_delete, sender=football_models.Match)
+def match_deleted(sender, instance, **kwargs):
+    """
+    Revert the match contribution to standings and expire club analytics
+    """
+    state = instance._loaded_state
+    if state is None or state is UNKNOWN:
+        state = match_state(instance)
+    # Rows of clubs deleted along with the match are already gone
+    standings.apply_deltas(
+        standings.match_deltas(*state, sign=-1), create=False)
+    caching.bump_club_matches(state[:2])
+
+
+@receiver(post_save, sender=football_models.Club)
+def club_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep the Standing row of a club in its current league
+    """
+    if raw:
+        return
+    if created:
+        standings.ensure_standings([instance.pk])
+        standings.rerank(instance.league_id)
+    else:
+        standings.move_club(instance)
+
+
+@receiver(post_delete, sender=football_models.Club)
+def club_deleted(sender, instance, **kwargs):
+    """
+    Close the gap left in the ranks of the league of the club
+    """
+    standings.rerank(instance.league_id)
+
+
+def publish_match_score(match, created, league_ids=None):
+    """
+    Push the match score to live subscribers once the save is committed
+    """
+    if league_ids is None:
+        league_ids = _league_ids(match)
+    message = live.match_message(match, league_ids, created=created)
+    topics = live.match_topics(match, league_ids)
+    transaction.on_commit(lambda: live.get_hub().publish(topics, message))
+
+
+@receiver(post_save, sender=football_models.League)
+@receiver(post_delete, sender=football_models.League)
+@receiver(post_save, sender=football_models.Club)
+@receiver(post_delete, sender=football_models.Club)
+@receiver(post_save, sender=football_models.Position)
+@receiver(post_delete, sender=football_models.Position)
+def invalidate_responses(sender, **kwargs):
+    """
+    Expire cached responses rendering the written model
+    """
+    caching.bump_version(sender)
+
+
+@receiver(post_save, sender=football_models.League)
+@receiver(post_save, sender=football_models.Club)
+@receiver(post_save, sender=football_models.Position)
+@receiver(post_save, sender=football_models.Match)
+def log_saved(sender, instance, **kwargs):
+    """
+    Append the write to the change log for delta sync
+    """
+    changes.record(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=football_models.League)
+@receiver(post_delete, sender=football_models.Club)
+@receiver(post_delete, sender=football_models.Position)
+@receiver(post_delete, sender=football_models.Match)
+def log_deleted(sender, instance, **kwargs):
+    """
+    Append a tombstone to the change log for delta sync
+    """
+    changes.record(sender, [instance.pk], deleted=True)
+
+
+@receiver(post_save, sender=football_models.Match)
+@receiver(post_delete, sender=football_models.Match)
+def refresh_fixtures(sender, instance, **kwargs):
+    """
+    Refresh the fixtures index once the write is committed
+    """
+    pk = instance.pk
+    transaction.on_commit(lambda: fixtures.match_written(pk))
+
+
+@receiver(post_save, sender=football_models.Club)
+@receiver(post_delete, sender=football_models.Club)
+def refresh_club_fixtures(sender, instance, created=False, raw=False,
+                          **kwargs):
+    """
+    Refresh fixtures rendering the club name and league once committed
+    """
+    if created or raw:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: fixtures.clubs_written([pk]))
+
+
+@receiver(post_init, sender=football_models.Club)
+@receiver(post_init, sender=football_models.Player)
+def remember_name(sender, instance, **kwargs):
+    instance._indexed_name = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=football_models.Club)
+@receiver(post_save, sender=football_models.Player)
+def index_name(sender, instance, created, **kwargs):
+    """
+    Keep the search index of a renamed or created object
+    """
+    if created or instance.name != instance._indexed_name:
+        search.index_objects(sender, [(instance.pk, instance.name)])
+        instance._indexed_name = instance.name
+
+
+@receiver(post_delete, sender=football_models.Club)
+@receiver(post_delete, sender=football_models.Player)
+def unindex_name(sender, instance, **kwargs):
+    search.delete_entries(search.KINDS[sender], [instance.pk])
@@ -0,0 +1,233 @@
+"""
+League standings maintenance
+
+Every Match contributes a fixed delta to the Standing rows of its two clubs.
+Saves and deletes apply (or revert) that delta with ``F()`` updates, and
+only the ranks of the affected leagues are recomputed, so writes cost
+O(clubs in league) and reads never touch the Match table.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, When
+
+from core import football_models
+
+POINTS_FOR_WIN = 3
+POINTS_FOR_DRAW = 1
+
+COUNTERS = ('played', 'won', 'drawn', 'lost',
+            'goals_for', 'goals_against', 'points')
+
+
+def club_result(goals_for, goals_against):
+    """
+    Return the counter delta of a single club for one match
+    """
+    won = goals_for > goals_against
+    drawn = goals_for == goals_against
+    return {
+        'played': 1,
+        'won': int(won),
+        'drawn': int(drawn),
+        'lost': int(not won and not drawn),
+        'goals_for': goals_for,
+        'goals_against': goals_against,
+        'points': POINTS_FOR_WIN if won else POINTS_FOR_DRAW * drawn,
+    }
+
+
+def match_deltas(home_team_id, away_team_id,
+                 home_team_score, away_team_score, sign=1):
+    """
+    Return ``{club_id: counters}`` a match adds (or removes with sign=-1)
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    sides = (
+        (home_team_id, home_team_score, away_team_score),
+        (away_team_id, away_team_score, home_team_score),
+    )
+    for club_id, scored, conceded in sides:
+        for name, value in club_result(scored, conceded).items():
+            deltas[club_id][name] += sign * value
+    return deltas
+
+
+def merge_deltas(*deltas):
+    merged = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for delta in deltas:
+        for club_id, counters in delta.items():
+            for name, value in counters.items():
+                merged[club_id][name] += value
+    return {club_id: counters for club_id, counters in merged.items()
+            if any(counters.values())}
+
+
+def ensure_standings(club_ids):
+    """
+    Create missing Standing rows for given clubs
+    """
+    existing = set(football_models.Standing.objects.filter(
+        club_id__in=club_ids).values_list('club_id', flat=True))
+    missing = football_models.Club.objects.filter(
+        pk__in=set(club_ids) - existing).values_list('pk', 'league_id')
+    football_models.Standing.objects.bulk_create([
+        football_models.Standing(club_id=club_id, league_id=league_id)
+        for club_id, league_id in missing
+    ])
+
+
+def apply_deltas(deltas, create=True):
+    """
+    Add counter deltas to Standing rows and re-rank affected leagues,
+    skipping clubs without a row unless ``create``
+    """
+    if not deltas:
+        return
+    # Part of the write of the matches, no savepoint of its own
+    with transaction.atomic(savepoint=False):
+        if create:
+            ensure_standings(deltas.keys())
+        for club_id, counters in deltas.items():
+            football_models.Standing.objects.filter(club_id=club_id).update(
+                **{name: F(name) + value
+                   for name, value in counters.items() if value})
+        league_ids = set(football_models.Standing.objects.filter(
+            club_id__in=deltas.keys()).values_list('league_id', flat=True))
+        for league_id in league_ids:
+            rerank(league_id)
+
+
+def rerank(league_id):
+    """
+    Recompute ranks of a single league, writing only changed rows
+    """
+    standings = list(
+        football_models.Standing.objects.filter(league_id=league_id)
+        .annotate(difference=F('goals_for') - F('goals_against'))
+        .order_by('-points', '-difference', '-goals_for', 'club_id')
+        .only('pk', 'rank'))
+    changed = []
+    for rank, standing in enumerate(standings, start=1):
+        if standing.rank != rank:
+            standing.rank = rank
+            changed.append(standing)
+    football_models.Standing.objects.bulk_update(changed, ['rank'])
+
+
+def move_club(club):
+    """
+    Follow a club changing league, re-ranking both leagues
+    """
+    with transaction.atomic():
+        previous = set(football_models.Standing.objects.filter(
+            club=club).exclude(league_id=club.league_id)
+            .values_list('league_id', flat=True))
+        if not previous:
+            return
+        football_models.Standing.objects.filter(club=club).update(
+            league_id=club.league_id)
+        for league_id in previous | {club.league_id}:
+            rerank(league_id)
+
+
+def sync_league_clubs(league_ids):
+    """
+    Bring Standing rows of clubs in given leagues in line with their
+    current league, used after bulk writes which send no signals
+    """
+    with transaction.atomic():
+        clubs = football_models.Club.objects.filter(league_id__in=league_ids)
+        moved = football_models.Standing.objects.filter(
+            club__in=clubs).exclude(league_id=F('club__league_id'))
+        league_ids = set(league_ids) | set(
+            moved.values_list('league_id', flat=True))
+        for standing in moved.select_related('club'):
+            standing.league_id = standing.club.league_id
+            standing.save(update_fields=['league'])
+        ensure_standings(clubs.filter(
+            standing__isnull=True).values_list('pk', flat=True))
+        for league_id in league_ids:
+            rerank(league_id)
+
+
+def _side_totals(prefix, scored, conceded):
+    win = Q(**{f'{scored}__gt': F(conceded)})
+    draw = Q(**{scored: F(conceded)})
+    loss = Q(**{f'{scored}__lt': F(conceded)})
+
+    def count(condition):
+        return Sum(Case(When(condition, then=1), default=0,
+                        output_field=IntegerField()))
+
+    return (
+        football_models.Match.objects.values(prefix)
+        .annotate(played=Count('pk'), won=count(win), drawn=count(draw),
+                  lost=count(loss), goals_for=Sum(scored),
+                  goals_against=Sum(conceded))
+    )
+
+
+def compute_standings(league_ids=None):
+    """
+    Aggregate counters from the full match history,
+    returning ``{club_id: counters}``
+    """
+    clubs = football_models.Club.objects.all()
+    if league_ids is not None:
+        clubs = clubs.filter(league_id__in=league_ids)
+    totals = {club_id: dict.fromkeys(COUNTERS, 0)
+              for club_id in clubs.values_list('pk', flat=True)}
+    sides = (
+        _side_totals('home_team', 'home_team_score', 'away_team_score'),
+        _side_totals('away_team', 'away_team_score', 'home_team_score'),
+    )
+    for prefix, rows in zip(('home_team', 'away_team'), sides):
+        for row in rows.filter(**{f'{prefix}__in': list(totals)}):
+            counters = totals[row[prefix]]
+            for name in COUNTERS[:-1]:
+                counters[name] += row[name]
+    for counters in totals.values():
+        counters['points'] = (POINTS_FOR_WIN * counters['won'] +
+                              POINTS_FOR_DRAW * counters['drawn'])
+    return totals
+
+
+def check_standings(league_ids=None):
+    """
+    Return ``{club_id: (stored, expected)}`` for inconsistent rows
+    """
+    expected = compute_standings(league_ids)
+    stored = {
+        row.pop('club_id'): row
+        for row in football_models.Standing.objects.filter(
+            club_id__in=list(expected)).values('club_id', *COUNTERS)
+    }
+    return {
+        club_id: (stored.get(club_id), counters)
+        for club_id, counters in expected.items()
+        if stored.get(club_id) != counters
+    }
+
+
+def rebuild_standings(league_ids=None):
+    """
+    Replace Standing rows with counters computed from all matches
+    """
+    expected = compute_standings(league_ids)
+    leagues = dict(football_models.Club.objects.filter(
+        pk__in=list(expected)).values_list('pk', 'league_id'))
+    with transaction.atomic():
+        standings = football_models.Standing.objects.all()
+        if league_ids is not None:
+            standings = standings.filter(
+                Q(league_id__in=league_ids) | Q(club_id__in=list(expected)))
+        standings.delete()
+        football_models.Standing.objects.bulk_create([
+            football_models.Standing(
+                club_id=club_id, league_id=leagues[club_id], **counters)
+            for club_id, counters in expected.items()
+        ], batch_size=500)
+        for league_id in set(leagues.values()):
+            rerank(league_id)
+    return len(expected)
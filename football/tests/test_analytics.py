@@ -0,0 +1,156 @@
+import datetime
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from football import analytics, ingest, scores
+
+
+class AnalyticsTests(TestCase):
+    """
+    Test team form and head-to-head records
+    """
+    def setUp(self):
+        self.client = APIClient()
+        caches['football'].clear()
+        league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.legia = football_models.Club.objects.create(
+            league=league, name='Legia')
+        self.lech = football_models.Club.objects.create(
+            league=league, name='Lech')
+        self.wisla = football_models.Club.objects.create(
+            league=league, name='Wisla')
+        # Legia: W 2-0, D 1-1 (away), L 0-1, W 3-1 (away), most recent last
+        for day, home, away, score in (
+                (1, self.legia, self.lech, (2, 0)),
+                (2, self.wisla, self.legia, (1, 1)),
+                (3, self.legia, self.wisla, (0, 1)),
+                (4, self.lech, self.legia, (1, 3))):
+            football_models.Match.objects.create(
+                home_team=home, away_team=away,
+                date=datetime.date(2021, 1, day),
+                home_team_score=score[0], away_team_score=score[1])
+
+    def tearDown(self):
+        caches['football'].clear()
+
+    def test_team_form(self):
+        """
+        Test that the last matches are summarized, most recent first
+        """
+        form = analytics.team_form(self.legia, last=3)
+        self.assertEqual(form['form'], 'WLD')
+        self.assertEqual(
+            (form['played'], form['won'], form['drawn'], form['lost']),
+            (3, 1, 1, 1))
+        self.assertEqual((form['goals_for'], form['goals_against']), (4, 3))
+        self.assertEqual(form['points'], 4)
+        self.assertEqual(form['last_match'], datetime.date(2021, 1, 4))
+
+    def test_team_form_without_matches(self):
+        """
+        Test the form of a club that has not played yet
+        """
+        club = football_models.Club.objects.create(
+            league=self.legia.league, name='Rakow')
+        form = analytics.team_form(club)
+        self.assertEqual((form['form'], form['played']), ('', 0))
+
+    def test_head_to_head(self):
+        """
+        Test the record of a club against another one, home and away
+        """
+        record = analytics.head_to_head(self.legia, self.lech)
+        self.assertEqual((record['played'], record['won']), (2, 2))
+        self.assertEqual((record['goals_for'], record['goals_against']),
+                         (5, 1))
+        self.assertEqual(record['home']['goals_for'], 2)
+        self.assertEqual(record['away']['goals_for'], 3)
+        self.assertEqual(record['last_match'], datetime.date(2021, 1, 4))
+
+    def test_form_endpoint_is_cached_until_a_match_changes(self):
+        """
+        Test that the form is served from cache until a match is saved
+        """
+        url = reverse('football:club-form', args=[self.legia.id])
+        response = self.client.get(url, {'last': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['form'], 'WL')
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'last': 2})
+        self.assertEqual(response.json()['form'], 'WL')
+
+        match = football_models.Match.objects.get(date='2021-01-04')
+        match.home_team_score = 5
+        match.save()
+        response = self.client.get(url, {'last': 2})
+        self.assertEqual(response.data['form'], 'LL')
+
+    def test_form_endpoint_follows_rescheduled_matches(self):
+        """
+        Test that moving a match expires the form but not standings
+        """
+        url = reverse('football:club-form', args=[self.legia.id])
+        self.assertEqual(
+            self.client.get(url, {'last': 2}).json()['form'], 'WL')
+        standing = football_models.Standing.objects.get(club=self.legia)
+
+        match = football_models.Match.objects.get(date='2021-01-03')
+        match.date = datetime.date(2021, 1, 5)
+        match.save()
+        self.assertEqual(
+            self.client.get(url, {'last': 2}).json()['form'], 'LW')
+
+        match = football_models.Match.objects.only('date').get(pk=match.pk)
+        match.date = datetime.date(2021, 1, 3)
+        match.save(update_fields=['date'])
+        self.assertEqual(
+            self.client.get(url, {'last': 2}).json()['form'], 'WL')
+        self.assertEqual(
+            football_models.Standing.objects.get(club=self.legia).points,
+            standing.points)
+
+    def test_form_etag_follows_club_matches(self):
+        """
+        Test that the form expires with matches of the club only,
+        however they are written
+        """
+        url = reverse('football:club-form', args=[self.legia.id])
+        etag = self.client.get(url)['ETag']
+        ingest.ingest('matches', [{
+            'home_team': self.lech.id, 'away_team': self.wisla.id,
+            'date': '2021-01-06', 'home_team_score': 0,
+            'away_team_score': 0}])
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED)
+
+        match = football_models.Match.objects.get(date='2021-01-04')
+        scores.update_score(match.pk, 5, 3, match.version)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['form'], 'LLDW')
+
+    def test_head_to_head_endpoint(self):
+        """
+        Test the head-to-head endpoint and its validation
+        """
+        url = reverse('football:club-head-to-head',
+                      args=[self.legia.id, self.wisla.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data['drawn'], response.data['lost']), (1, 1))
+
+        response = self.client.get(reverse(
+            'football:club-head-to-head', args=[self.legia.id, 999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(
+            reverse('football:club-form', args=[self.legia.id]),
+            {'last': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
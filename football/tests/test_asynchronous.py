@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.handlers.wsgi import WSGIHandler
+from django.http import StreamingHttpResponse
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from app import asgi_urls
+from core import football_models
+from football import asynchronous, benchmark, urls
+
+
+class AsyncPatternsTests(TransactionTestCase):
+    """
+    Test the URLs of the ASGI application
+    """
+    def test_read_routes_are_async(self):
+        """
+        Test that list and retrieve routes get async views
+        """
+        patterns = asynchronous.async_patterns(urls.router.urls)
+        views = {pattern.name: pattern.callback for pattern in patterns}
+        for name in ('league-list', 'league-detail', 'club-detail',
+                     'match-list'):
+            with self.subTest(name):
+                self.assertTrue(asyncio.iscoroutinefunction(views[name]))
+                self.assertTrue(views[name].csrf_exempt)
+        self.assertFalse(asyncio.iscoroutinefunction(views['club-form']))
+        self.assertFalse(asyncio.iscoroutinefunction(views['api-root']))
+
+
+@override_settings(FOOTBALL_ASYNC={'URLCONF': asgi_urls.__name__})
+class AsyncViewsTests(TransactionTestCase):
+    """
+    Test that the ASGI application answers reads as the WSGI one
+    """
+    def setUp(self):
+        caches['football'].clear()
+        self.league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        for name in ('Legia', 'Lech', 'Wisła'):
+            football_models.Club.objects.create(league=self.league, name=name)
+        self.application = asynchronous.ASGIHandler()
+
+    def tearDown(self):
+        caches['football'].clear()
+
+    def asgi_get(self, url, headers=()):
+        """
+        Return the response start message and body of ``url``
+        """
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        path, _, query = url.partition('?')
+        asyncio.run(self.application({
+            'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': query.encode(),
+            'headers': [(b'host', b'testserver'), *headers],
+        }, receive, send))
+        return sent[0], b''.join(
+            message.get('body', b'') for message in sent[1:])
+
+    def test_same_responses(self):
+        """
+        Test that list and retrieve render the same JSON
+        """
+        for url in (reverse('football:club-list') + '?page_size=2',
+                    reverse('football:league-detail', args=[self.league.id]),
+                    reverse('football:league-list') + '?country=code',
+                    reverse('football:match-list')):
+            with self.subTest(url):
+                caches['football'].clear()
+                start, content = self.asgi_get(url)
+                self.assertEqual(start['status'], 200)
+                self.assertEqual(content, self.client.get(url).content)
+
+    def test_missing_object(self):
+        """
+        Test that errors of the viewsets are kept
+        """
+        start, _ = self.asgi_get(
+            reverse('football:league-detail', args=[self.league.id + 1]))
+        self.assertEqual(start['status'], 404)
+
+    def test_streaming_export(self):
+        """
+        Test that exports read the database outside the event loop
+        """
+        token = Token.objects.create(user=get_user_model().objects.create_user(
+            'partner@test.com', 'partnerpassword123'))
+        start, content = self.asgi_get(
+            reverse('football:export', args=['clubs']),
+            [(b'authorization', f'Token {token.key}'.encode())])
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(
+            [json.loads(line)['name'] for line in content.splitlines()],
+            ['Legia', 'Lech', 'Wisła'])
+
+    def test_streaming_uses_the_pool(self):
+        """
+        Test that streaming content is read in one thread of the pool,
+        which a gone client gives back
+        """
+        threads, closed = [], threading.Event()
+
+        def content():
+            for part in range(5):
+                threads.append(threading.current_thread().name)
+                yield b'%d' % part
+
+        async def send(message):
+            if message.get('body') == b'2':
+                raise OSError('Client disconnected')
+
+        response = StreamingHttpResponse(content())
+        response._resource_closers.append(closed.set)
+        with self.assertRaises(OSError):
+            asyncio.run(self.application.send_response(response, send))
+        self.assertTrue(closed.is_set())
+        self.assertLess(len(threads), 5)
+        self.assertEqual(len(set(threads)), 1)
+        self.assertTrue(threads[0].startswith('football-db'))
+
+    @override_settings(REQUEST_METRICS={'SAMPLE_RATE': 1.0,
+                                        'SLOW_REQUEST_MS': None})
+    def test_instrumented_queries(self):
+        """
+        Test that queries run in the pool are recorded
+        """
+        start, _ = self.asgi_get(
+            reverse('football:league-detail', args=[self.league.id]))
+        headers = dict(start['headers'])
+        self.assertIn(b'desc="1 queries"', headers[b'Server-Timing'])
+
+    def test_benchmark_clients(self):
+        """
+        Test that benchmark clients of both interfaces get responses
+        """
+        url = reverse('football:league-list')
+        self.assertEqual(
+            benchmark.wsgi_get(WSGIHandler(), url, 'testserver', 0), 200)
+        self.assertEqual(asyncio.run(benchmark.asgi_get(
+            self.application, url, 'testserver', 0)), 200)
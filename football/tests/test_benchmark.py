@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import football_models
+from football import benchmark, standings
+
+
+class GenerateFixturesTests(TestCase):
+    """
+    Test the synthetic dataset generator
+    """
+    def test_generate_small_dataset(self):
+        """
+        Test generating a seeded dataset with consistent standings
+        """
+        call_command('generate_fixtures', leagues=2, clubs=10, players=50,
+                     matches=40, stdout=StringIO())
+        self.assertEqual(football_models.League.objects.count(), 2)
+        self.assertEqual(football_models.Club.objects.count(), 10)
+        self.assertEqual(football_models.Player.objects.count(), 50)
+        self.assertEqual(football_models.Match.objects.count(), 40)
+        self.assertEqual(standings.check_standings(), {})
+
+
+class BenchmarkTests(TestCase):
+    """
+    Test the in-process benchmark runner
+    """
+    def test_percentile(self):
+        """
+        Test nearest-rank percentiles
+        """
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+
+    def test_benchmark_saves_and_compares_results(self):
+        """
+        Test that every endpoint is measured and saved as JSON
+        """
+        call_command('generate_fixtures', leagues=1, clubs=4, players=8,
+                     matches=6, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'run.json')
+            call_command('benchmark', requests=3, warmup=0, output=output,
+                         host='testserver',
+                         stdout=StringIO())
+            with open(output) as report:
+                results = json.load(report)['results']
+            out = StringIO()
+            call_command('benchmark', requests=3, warmup=0, compare=output,
+                         host='testserver',
+                         stdout=out)
+        # New read routes must be added to benchmark.endpoints
+        self.assertEqual(set(results), benchmark.read_routes())
+        for stats in results.values():
+            self.assertEqual(stats['status'], [200])
+            self.assertGreater(stats['bytes'], 0)
+        self.assertIn('football:club-list: p50_ms', out.getvalue())
@@ -0,0 +1,128 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from football import changes, ingest
+
+
+class ChangeLogTests(TestCase):
+    """
+    Test the change log and the delta sync endpoint
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('football:changes')
+        self.league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.version = changes.current_version()
+
+    def sync(self, since, **params):
+        response = self.client.get(self.url, dict(params, since=since))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_writes_are_returned_as_upserts_and_deletes(self):
+        """
+        Test that only objects written since the version are returned
+        """
+        legia = football_models.Club.objects.create(
+            league=self.league, name='Legia')
+        legia.name = 'Legia Warszawa'
+        legia.save()
+        position = football_models.Position.objects.create(
+            short_name='GK', long_name='Goalkeeper')
+        position_id = position.id
+        position.delete()
+
+        data = self.sync(self.version)
+        self.assertFalse(data['reset'])
+        self.assertEqual(list(data['upserts']), ['club'])
+        self.assertEqual(data['upserts']['club'][0]['name'],
+                         'Legia Warszawa')
+        self.assertEqual(data['deletes'], {'position': [position_id]})
+
+        data = self.sync(data['version'])
+        self.assertEqual((data['upserts'], data['deletes']), ({}, {}))
+
+    def test_appends_are_serialized(self):
+        """
+        Test that appends lock the log where ids are not given in commit
+        order, and that unsupported databases are refused
+        """
+        lock = {'postgresql': 'SELECT COUNT(*) FROM {table}'}
+        with mock.patch.object(connection, 'vendor', 'postgresql'), \
+                mock.patch.object(changes, 'LOCK_STATEMENTS', lock), \
+                CaptureQueriesContext(connection) as captured:
+            changes.record(football_models.League, [self.league.pk])
+        self.assertEqual(
+            [query['sql'].split()[0] for query in captured],
+            ['SELECT', 'INSERT'])
+        self.assertIn('"core_change"', captured[0]['sql'])
+
+        with mock.patch.object(connection, 'vendor', 'oracle'):
+            with self.assertRaises(ImproperlyConfigured):
+                changes.reset()
+
+    def test_sync_is_paginated(self):
+        """
+        Test that a client catches up page by page
+        """
+        for i in range(3):
+            football_models.League.objects.create(
+                name=f'League {i}', country='PL')
+        data = self.sync(self.version, page_size=2)
+        self.assertTrue(data['more'])
+        self.assertEqual(len(data['upserts']['league']), 2)
+        data = self.sync(data['version'], page_size=2)
+        self.assertFalse(data['more'])
+        self.assertEqual(data['upserts']['league'][0]['name'], 'League 2')
+
+    def test_ingest_is_logged(self):
+        """
+        Test that bulk ingested rows are in the change log
+        """
+        ingest.ingest('clubs', [{'name': 'Lech', 'league': self.league.id}])
+        data = self.sync(self.version)
+        self.assertEqual(data['upserts']['club'][0]['name'], 'Lech')
+
+    def test_missing_version_requires_reset(self):
+        """
+        Test that clients without a version are told to download everything
+        """
+        response = self.client.get(self.url)
+        self.assertTrue(response.data['reset'])
+        self.assertEqual(response.data['version'], self.version)
+
+    def test_compaction(self):
+        """
+        Test that superseded entries are dropped and expired ones reset
+        clients behind them
+        """
+        for name in ('A', 'B', 'C'):
+            self.league.name = name
+            self.league.save()
+        self.assertEqual(changes.compact(retention_days=None), 3)
+        data = self.sync(self.version)
+        self.assertEqual(data['upserts']['league'][0]['name'], 'C')
+
+        football_models.Change.objects.update(
+            created=timezone.now() - datetime.timedelta(days=60))
+        football_models.Position.objects.create(
+            short_name='GK', long_name='Goalkeeper')
+        out = StringIO()
+        call_command('compact_changes', stdout=out)
+        self.assertTrue(self.sync(self.version)['reset'])
+        latest = self.sync(changes.current_version() - 1)
+        self.assertFalse(latest['reset'])
+        self.assertEqual(list(latest['upserts']), ['position'])
@@ -0,0 +1,117 @@
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import translation
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from football import countries, fast, serializers
+
+
+class CountryTableTests(TestCase):
+    """
+    Test the precomputed country representations
+    """
+    def test_table_is_built_once_per_language(self):
+        """
+        Test that rows of a language share the same representation
+        """
+        self.assertIs(countries.get_table('en'), countries.get_table('en'))
+        self.assertEqual(countries.get_table('en')['DE'],
+                         {'code': 'DE', 'name': 'Germany'})
+        self.assertEqual(countries.get_table('pl')['DE']['name'], 'Niemcy')
+
+    def test_field_matches_django_countries(self):
+        """
+        Test that the field renders like the django-countries one
+        """
+        league = football_models.League(name='Bundesliga', country='DE')
+        with translation.override('pl'):
+            data = serializers.LeagueSerializer(league).data
+        self.assertEqual(data['country'], {'code': 'DE', 'name': 'Niemcy'})
+        league.country = ''
+        self.assertEqual(
+            serializers.LeagueSerializer(league).data['country'], '')
+
+    def test_code_only_serializer(self):
+        """
+        Test that the code only variant is built once and renders codes
+        """
+        serializer_class = countries.code_only(serializers.LeagueSerializer)
+        self.assertIs(
+            serializer_class,
+            countries.code_only(serializers.LeagueSerializer))
+        self.assertIs(countries.code_only(serializers.ClubSerializer),
+                      serializers.ClubSerializer)
+        league = football_models.League(name='Bundesliga', country='DE')
+        self.assertEqual(serializer_class(league).data['country'], 'DE')
+
+
+class CountryApiTests(TestCase):
+    """
+    Test country rendering of football endpoints
+    """
+    def setUp(self):
+        self.client = APIClient()
+        caches['football'].clear()
+        league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        football_models.League.objects.create(name='Bundesliga', country='DE')
+        self.club = football_models.Club.objects.create(
+            league=league, name='Legia')
+        position = football_models.Position.objects.create(
+            short_name='GK', long_name='Goalkeeper')
+        for number, nationality in ((12, 'DE'), (1, 'PL')):
+            football_models.Player.objects.create(
+                name=f'Player {number}', number=number, age=25,
+                nationality=nationality, position=position, club=self.club)
+
+    def tearDown(self):
+        caches['football'].clear()
+
+    def test_league_list_country_formats(self):
+        """
+        Test that leagues render country dicts, or codes when asked
+        """
+        url = reverse('football:league-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [league['country'] for league in response.json()['results']],
+            [{'code': 'PL', 'name': 'Poland'},
+             {'code': 'DE', 'name': 'Germany'}])
+
+        for fast_lists in (False, True):
+            with self.settings(FOOTBALL_FAST_LISTS=fast_lists):
+                caches['football'].clear()
+                response = self.client.get(url, {'country': 'code'})
+            self.assertEqual(
+                [league['country'] for league in response.json()['results']],
+                ['PL', 'DE'])
+
+    def test_code_only_fast_mapper(self):
+        """
+        Test that the lean path supports the code only variant
+        """
+        self.assertIsNotNone(fast.get_mapper(
+            countries.code_only(serializers.LeagueSerializer)))
+
+    def test_club_players(self):
+        """
+        Test that the squad of a club renders nationalities in one query
+        """
+        url = reverse('football:club-players', args=[self.club.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(player['number'], player['nationality'], player['position'])
+             for player in response.json()],
+            [(1, {'code': 'PL', 'name': 'Poland'}, 'Goalkeeper - GK'),
+             (12, {'code': 'DE', 'name': 'Germany'}, 'Goalkeeper - GK')])
+
+        response = self.client.get(url, {'country': 'code'})
+        self.assertEqual(
+            [player['nationality'] for player in response.json()],
+            ['PL', 'DE'])
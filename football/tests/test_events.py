@@ -0,0 +1,145 @@
+import datetime
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from football import ingest
+
+
+class MatchEventTests(TestCase):
+    """
+    Test appending match events and reading them back
+    """
+    def setUp(self):
+        league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.legia = football_models.Club.objects.create(
+            league=league, name='Legia')
+        self.lech = football_models.Club.objects.create(
+            league=league, name='Lech')
+        self.match = football_models.Match.objects.create(
+            home_team=self.legia, away_team=self.lech,
+            date=datetime.date(2021, 1, 1),
+            home_team_score=0, away_team_score=0)
+        self.other = football_models.Match.objects.create(
+            home_team=self.lech, away_team=self.legia,
+            date=datetime.date(2021, 2, 1),
+            home_team_score=0, away_team_score=0)
+
+    def goal(self, match, side, minute):
+        return {'match': match.id, 'kind': 'goal', 'side': side,
+                'minute': minute}
+
+    def test_events_are_numbered_per_match(self):
+        """
+        Test that sequences grow per match across batches
+        """
+        report = ingest.ingest('events', [
+            {'match': self.match.id, 'kind': 'period', 'detail': 'kick-off'},
+            self.goal(self.other, 'home', 3),
+            self.goal(self.match, 'away', 10),
+        ])
+        self.assertEqual(report['created'], 3)
+        self.assertEqual(report['sequences'],
+                         {self.match.id: 2, self.other.id: 1})
+        ingest.ingest('events', [self.goal(self.match, 'home', 20)])
+        self.assertEqual(
+            list(self.match.events.values_list('sequence', 'kind')),
+            [(1, 'period'), (2, 'goal'), (3, 'goal')])
+
+    def test_goals_update_score_and_standings(self):
+        """
+        Test that goals are added to the score and the league table
+        """
+        with self.assertNumQueries(12):
+            ingest.ingest('events', [
+                self.goal(self.match, 'home', 5),
+                self.goal(self.match, 'home', 50),
+                self.goal(self.match, 'away', 70),
+                {'match': self.match.id, 'kind': 'card', 'side': 'away',
+                 'detail': 'yellow'},
+            ])
+        self.match.refresh_from_db()
+        self.assertEqual(
+            (self.match.home_team_score, self.match.away_team_score), (2, 1))
+        self.assertEqual(self.match.last_event_sequence, 4)
+        standing = football_models.Standing.objects.get(club=self.legia)
+        self.assertEqual((standing.won, standing.points), (1, 4))
+
+    def test_invalid_events_are_reported(self):
+        """
+        Test that events of unknown matches or without a side are skipped
+        """
+        report = ingest.ingest('events', [
+            self.goal(self.match, 'home', 5),
+            {'match': 999, 'kind': 'period'},
+            {'match': self.match.id, 'kind': 'goal'},
+            dict(self.goal(self.match, 'away', 7), player=999),
+        ])
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([error['row'] for error in report['errors']],
+                         [1, 2, 3])
+        self.assertIn('match', report['errors'][0]['errors'])
+        self.assertIn('side', report['errors'][1]['errors'])
+        self.assertIn('player', report['errors'][2]['errors'])
+
+    def test_events_after_sequence(self):
+        """
+        Test reading events after a sequence number, page by page
+        """
+        ingest.ingest('events', [
+            self.goal(self.match, 'home', minute) for minute in (1, 2, 3)])
+        client = APIClient()
+        url = reverse('football:match-events', args=[self.match.id])
+        response = client.get(url, {'after': 1, 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['home_team_score'], 3)
+        self.assertEqual(
+            [event['sequence'] for event in response.data['events']], [2])
+        self.assertEqual(response.data['next_after'], 2)
+        response = client.get(url, {'after': 2})
+        self.assertEqual(
+            [event['minute'] for event in response.data['events']], [3])
+        self.assertIsNone(response.data['next_after'])
+
+        response = client.get(reverse('football:match-events', args=[999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ingest_events_endpoint(self):
+        """
+        Test posting NDJSON events as an admin
+        """
+        client = APIClient()
+        client.force_authenticate(
+            user=get_user_model().objects.create_superuser(
+                'admin@test.com', 'adminpassword123'))
+        body = '\n'.join(json.dumps(self.goal(self.match, 'home', minute))
+                         for minute in (1, 2))
+        response = client.post(
+            reverse('football:ingest', args=['events']), body,
+            content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+
+    def test_ingest_events_command(self):
+        """
+        Test appending NDJSON events from the command line
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as feed:
+            feed.write(json.dumps(self.goal(self.match, 'away', 5)) + '\n')
+            feed.write(json.dumps(self.goal(self.match, 'middle', 6)) + '\n')
+            feed.flush()
+            out, err = StringIO(), StringIO()
+            call_command('ingest', 'events', feed.name,
+                         stdout=out, stderr=err)
+        self.assertIn('Created 1, rejected 1', out.getvalue())
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.away_team_score, 1)
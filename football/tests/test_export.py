@@ -0,0 +1,144 @@
+import csv
+import datetime
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from football import export, ingest
+
+
+class ExportTests(TestCase):
+    """
+    Test streaming exports of football rows
+    """
+    def setUp(self):
+        self.client = APIClient()
+        partner = get_user_model().objects.create_user(
+            'partner@test.com', 'partnerpassword123')
+        self.client.force_authenticate(user=partner)
+        self.league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        other = football_models.League.objects.create(
+            name='Bundesliga', country='DE')
+        self.legia = football_models.Club.objects.create(
+            league=self.league, name='Legia')
+        self.lech = football_models.Club.objects.create(
+            league=self.league, name='Lech Poznań')
+        self.bayern = football_models.Club.objects.create(
+            league=other, name='Bayern')
+        self.dortmund = football_models.Club.objects.create(
+            league=other, name='Dortmund')
+        self.matches = [
+            football_models.Match.objects.create(
+                home_team=home, away_team=away,
+                date=datetime.date(2021, 1, day),
+                home_team_score=day, away_team_score=0)
+            for day, home, away in (
+                (1, self.legia, self.lech),
+                (2, self.bayern, self.dortmund),
+                (3, self.lech, self.legia))
+        ]
+
+    def get_rows(self, kind, **params):
+        response = self.client.get(
+            reverse('football:export', args=[kind]), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_export_matches_as_ndjson(self):
+        """
+        Test that matches are streamed in id order with ingest column names
+        """
+        rows = self.get_rows('matches')
+        self.assertEqual([row['id'] for row in rows],
+                         [match.id for match in self.matches])
+        self.assertEqual(rows[0], {
+            'id': self.matches[0].id, 'home_team': self.legia.id,
+            'away_team': self.lech.id, 'date': '2021-01-01',
+            'home_team_score': 1, 'away_team_score': 0})
+
+    def test_export_filters_and_resume(self):
+        """
+        Test filtering by league and date and resuming after an id
+        """
+        rows = self.get_rows('matches', league=self.league.id)
+        self.assertEqual([row['id'] for row in rows],
+                         [self.matches[0].id, self.matches[2].id])
+        rows = self.get_rows('matches', date_from='2021-01-02',
+                             date_to='2021-01-02')
+        self.assertEqual([row['id'] for row in rows], [self.matches[1].id])
+        rows = self.get_rows('matches', after=self.matches[0].id)
+        self.assertEqual([row['id'] for row in rows],
+                         [match.id for match in self.matches[1:]])
+
+    def test_export_league_of_away_team(self):
+        """
+        Test that matches of the league's clubs playing away are exported
+        """
+        friendly = football_models.Match.objects.create(
+            home_team=self.bayern, away_team=self.legia,
+            date=datetime.date(2021, 1, 4),
+            home_team_score=1, away_team_score=1)
+        rows = self.get_rows('matches', league=self.league.id)
+        self.assertEqual([row['id'] for row in rows],
+                         [self.matches[0].id, self.matches[2].id, friendly.id])
+
+    def test_invalid_export_requests(self):
+        """
+        Test that bad filters are rejected and anonymous users refused
+        """
+        url = reverse('football:export', args=['clubs'])
+        response = self.client.get(url, {'date_from': '2021-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'fmt': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(
+            reverse('football:export', args=['users']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_clubs_as_csv(self):
+        """
+        Test exporting clubs as CSV with a header line
+        """
+        response = self.client.get(
+            reverse('football:export', args=['clubs']), {'fmt': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0], ['id', 'name', 'league'])
+        self.assertEqual(rows[2], [
+            str(self.lech.id), 'Lech Poznań', str(self.league.id)])
+        self.assertEqual(len(rows), 5)
+
+    def test_export_with_small_chunks(self):
+        """
+        Test that every row is exported when reading one row per chunk
+        """
+        lines = export.stream('matches', chunk_size=1)
+        self.assertEqual(len(list(lines)), 3)
+
+    def test_export_command_round_trips_to_ingest(self):
+        """
+        Test that an exported file can be ingested back
+        """
+        out = StringIO()
+        call_command('export', 'matches', '--league', str(self.league.id),
+                     stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        for row in rows:
+            row['home_team_score'] = 5
+        report = ingest.ingest('matches', rows)
+        self.assertEqual(report['updated'], 2)
+        self.assertEqual(football_models.Match.objects.filter(
+            home_team_score=5).count(), 2)
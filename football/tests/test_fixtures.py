@@ -0,0 +1,178 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from core.routers import use_replica
+from football import fixtures, ingest
+
+
+def create_clubs():
+    ekstraklasa = football_models.League.objects.create(
+        name='Ekstraklasa', country='PL')
+    bundesliga = football_models.League.objects.create(
+        name='Bundesliga', country='DE')
+    return [
+        football_models.Club.objects.create(league=league, name=name)
+        for league, name in ((ekstraklasa, 'Legia'), (ekstraklasa, 'Lech'),
+                             (bundesliga, 'Bayern'))
+    ]
+
+
+def create_match(home, away, date, home_score=0, away_score=0):
+    return football_models.Match.objects.create(
+        home_team=home, away_team=away, date=date,
+        home_team_score=home_score, away_team_score=away_score)
+
+
+class FixturesIndexTests(TestCase):
+    """
+    Test the in-memory fixtures index
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.today = timezone.localdate()
+        self.legia, self.lech, self.bayern = create_clubs()
+        self.league = create_match(self.legia, self.lech, self.today)
+        self.friendly = create_match(self.bayern, self.legia, self.today)
+        create_match(self.lech, self.legia,
+                     self.today + datetime.timedelta(days=1))
+        fixtures.get_index().build()
+
+    def test_fixtures_are_served_from_memory(self):
+        """
+        Test that fixtures of the window are grouped by league without
+        querying the database
+        """
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('football:fixtures'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        leagues = response.data['leagues']
+        self.assertEqual(
+            [[match['id'] for match in league['matches']]
+             for league in leagues],
+            [[self.league.id, self.friendly.id], [self.friendly.id]])
+        self.assertEqual(leagues[0]['matches'][0]['home_team_name'], 'Legia')
+
+    def test_filter_by_league(self):
+        """
+        Test that fixtures can be limited to one league
+        """
+        response = self.client.get(reverse('football:fixtures'), {
+            'league': self.bayern.league_id})
+        self.assertEqual(len(response.data['leagues']), 1)
+        self.assertEqual(response.data['leagues'][0]['matches'][0]['id'],
+                         self.friendly.id)
+
+    def test_dates_out_of_window_are_read_from_database(self):
+        """
+        Test that other dates fall back to a database query
+        """
+        date = self.today - datetime.timedelta(days=10)
+        match = create_match(self.legia, self.bayern, date)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('football:fixtures'), {'date': str(date)})
+        self.assertEqual(response.data['leagues'][0]['matches'][0]['id'],
+                         match.id)
+
+    def test_warm_up_closes_connections(self):
+        """
+        Test that workers forked after warming up get their own connection
+        """
+        fixtures.invalidate()
+        with mock.patch.object(fixtures.connections, 'close_all') as close:
+            fixtures.warm_up()
+        close.assert_called_once_with()
+        self.assertFalse(fixtures.get_index().is_stale())
+
+    def test_other_worker_writes_trigger_rebuild(self):
+        """
+        Test that a bumped shared counter rebuilds the index on next read
+        """
+        football_models.Match.objects.filter(pk=self.league.pk).update(
+            home_team_score=3)
+        fixtures.invalidate()
+        load_matches = fixtures.load_matches
+        routed = []
+
+        def record_routing(*args, **kwargs):
+            routed.append(use_replica.get())
+            return load_matches(*args, **kwargs)
+
+        token = use_replica.set(True)
+        try:
+            with mock.patch.object(fixtures, 'load_matches', record_routing):
+                data = fixtures.fixtures(self.today)
+        finally:
+            use_replica.reset(token)
+        self.assertEqual(
+            data['leagues'][0]['matches'][0]['home_team_score'], 3)
+        # Rebuilt from the primary even in requests reading replicas
+        self.assertEqual(routed, [False])
+
+
+class FixturesSignalTests(TransactionTestCase):
+    """
+    Test that committed match writes refresh the index in place
+    """
+    def test_saved_and_deleted_matches_are_refreshed(self):
+        """
+        Test that saves and deletes update the index without a rebuild
+        """
+        today = timezone.localdate()
+        legia, lech, _ = create_clubs()
+        match = create_match(legia, lech, today)
+        index = fixtures.get_index()
+        index.build()
+
+        match.home_team_score = 2
+        match.save()
+        with self.assertNumQueries(0):
+            data = fixtures.fixtures(today)
+        self.assertEqual(
+            data['leagues'][0]['matches'][0]['home_team_score'], 2)
+
+        match.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(fixtures.fixtures(today)['leagues'][0]
+                             ['matches'], [])
+
+    def test_club_writes_are_refreshed(self):
+        """
+        Test that renamed, moved and deleted clubs update their matches
+        """
+        today = timezone.localdate()
+        legia, lech, bayern = create_clubs()
+        match = create_match(legia, lech, today)
+        fixtures.get_index().build()
+
+        legia.name = 'Legia Warszawa'
+        legia.league = bayern.league
+        legia.save()
+        response = APIClient().get(reverse('football:fixtures'))
+        leagues = response.data['leagues']
+        self.assertEqual([league['league'] for league in leagues],
+                         sorted([lech.league_id, bayern.league_id]))
+        self.assertEqual(leagues[0]['matches'][0]['home_team_name'],
+                         'Legia Warszawa')
+
+        ingest.ingest('clubs', [
+            {'id': lech.id, 'name': 'Lech Poznań', 'league': lech.league_id}])
+        with self.assertNumQueries(0):
+            data = fixtures.fixtures(today)
+        self.assertEqual(data['leagues'][0]['matches'][0]['away_team_name'],
+                         'Lech Poznań')
+
+        lech.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(fixtures.fixtures(today)['leagues'], [
+                {'league': league, 'matches': []}
+                for league in sorted([lech.league_id, bayern.league_id])])
+        self.assertFalse(
+            football_models.Match.objects.filter(pk=match.pk).exists())
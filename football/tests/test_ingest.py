@@ -0,0 +1,188 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from football import caching, changes, ingest, search
+
+
+class IngestTests(TestCase):
+    """
+    Test bulk ingestion of feed rows
+    """
+    def setUp(self):
+        self.league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.legia = football_models.Club.objects.create(
+            league=self.league, name='Legia')
+        self.lech = football_models.Club.objects.create(
+            league=self.league, name='Lech')
+        self.position = football_models.Position.objects.create(
+            short_name='GK', long_name='Goalkeeper')
+
+    def player_row(self, number, **extra):
+        row = {'name': f'Player {number}', 'number': number, 'age': 20,
+               'nationality': 'PL', 'position': self.position.id,
+               'club': self.legia.id}
+        row.update(extra)
+        return row
+
+    def test_clubs_are_created_with_standings(self):
+        """
+        Test ingesting clubs creates them and their standings
+        """
+        report = ingest.ingest('clubs', [
+            {'name': 'Wisla', 'league': self.league.id},
+            {'name': 'Gornik', 'league': 999},
+        ])
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['errors'][0]['row'], 1)
+        self.assertIn('league', report['errors'][0]['errors'])
+        wisla = football_models.Club.objects.get(name='Wisla')
+        self.assertEqual(wisla.standing.rank, 3)
+
+    def test_created_pks_with_explicit_ids(self):
+        """
+        Test that rows created with and without ids get their own pks
+        """
+        gap = football_models.Club.objects.create(
+            league=self.league, name='Gap').pk
+        top = football_models.Club.objects.create(
+            league=self.league, name='Top').pk
+        football_models.Club.objects.filter(pk=gap).delete()
+        ingest.ingest('clubs', [
+            {'name': 'Wisla', 'league': self.league.id},
+            {'id': gap, 'name': 'Gornik', 'league': self.league.id},
+            {'id': top + 5, 'name': 'Piast', 'league': self.league.id},
+            {'name': 'Jagiellonia', 'league': self.league.id},
+        ])
+        clubs = dict(football_models.Club.objects.values_list('name', 'pk'))
+        self.assertEqual((clubs['Gornik'], clubs['Piast']),
+                         (gap, top + 5))
+        for name in ('Wisla', 'Gornik', 'Piast', 'Jagiellonia'):
+            with self.subTest(name):
+                self.assertEqual(
+                    search.search(name, ['club'])[0]['id'], clubs[name])
+                self.assertTrue(football_models.Change.objects.filter(
+                    kind=changes.SYNCED_MODELS[football_models.Club],
+                    object_id=clubs[name], deleted=False).exists())
+
+    def test_players_are_validated_in_bulk(self):
+        """
+        Test that player rows use a constant number of queries
+        """
+        rows = [self.player_row(number) for number in range(1, 51)]
+        with self.assertNumQueries(13):
+            report = ingest.ingest('players', rows)
+        self.assertEqual(report['created'], 50)
+        self.assertEqual(report['errors'], [])
+
+    def test_reserved_numbers_are_rejected(self):
+        """
+        Test shirt numbers taken in the database or the batch
+        """
+        ingest.ingest('players', [self.player_row(7)])
+        report = ingest.ingest('players', [
+            self.player_row(7), self.player_row(8), self.player_row(8),
+            self.player_row(9, age='x'),
+        ])
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([error['row'] for error in report['errors']],
+                         [0, 2, 3])
+
+    def test_players_can_swap_into_free_numbers(self):
+        """
+        Test that an updated player releases its previous number
+        """
+        ingest.ingest('players', [self.player_row(7)])
+        player = football_models.Player.objects.get()
+        report = ingest.ingest('players', [
+            self.player_row(8, id=player.id), self.player_row(7)])
+        self.assertEqual((report['created'], report['updated']), (1, 1))
+        player.refresh_from_db()
+        self.assertEqual(player.number, 8)
+
+    def test_players_can_swap_numbers(self):
+        """
+        Test that players of a club can trade numbers within a batch
+        """
+        ingest.ingest('players', [self.player_row(n) for n in (7, 8, 9)])
+        pks = dict(football_models.Player.objects.values_list(
+            'number', 'pk'))
+        report = ingest.ingest('players', [
+            self.player_row(8, id=pks[7]), self.player_row(9, id=pks[8]),
+            self.player_row(7, id=pks[9])])
+        self.assertEqual((report['updated'], report['errors']), (3, []))
+        self.assertEqual(dict(football_models.Player.objects.values_list(
+            'pk', 'number')), {pks[7]: 8, pks[8]: 9, pks[9]: 7})
+
+    def test_rejected_update_keeps_its_number(self):
+        """
+        Test that the number of a rejected update is not given away
+        """
+        ingest.ingest('players', [self.player_row(n) for n in (7, 8)])
+        pks = dict(football_models.Player.objects.values_list(
+            'number', 'pk'))
+        report = ingest.ingest('players', [
+            self.player_row(8, id=pks[7]), self.player_row(7)])
+        self.assertEqual([error['row'] for error in report['errors']],
+                         [0, 1])
+        self.assertEqual(football_models.Player.objects.count(), 2)
+
+    def test_matches_update_standings(self):
+        """
+        Test that created and updated matches are applied to standings
+        """
+        row = {'home_team': self.legia.id, 'away_team': self.lech.id,
+               'date': '2021-01-01', 'home_team_score': 1,
+               'away_team_score': 0}
+        report = ingest.ingest('matches', [
+            row, dict(row, away_team=self.legia.id)])
+        self.assertEqual(report['created'], 1)
+        self.assertIn('non_field_errors', report['errors'][0]['errors'])
+        self.assertEqual(football_models.Standing.objects.get(
+            club=self.legia).points, 3)
+
+        match = football_models.Match.objects.get()
+        key = caching.club_matches_key(self.lech.id)
+        version, = caching.get_key_versions([key])
+        ingest.ingest('matches', [dict(row, id=match.id, away_team_score=1)])
+        standing = football_models.Standing.objects.get(club=self.legia)
+        self.assertEqual((standing.played, standing.points), (1, 1))
+        self.assertGreater(caching.get_key_versions([key])[0], version)
+
+    def test_ingest_endpoint_accepts_ndjson(self):
+        """
+        Test posting NDJSON rows as an admin
+        """
+        client = APIClient()
+        url = reverse('football:ingest', args=['players'])
+        body = '\n'.join(json.dumps(self.player_row(n)) for n in (1, 2))
+
+        response = client.post(url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        admin = get_user_model().objects.create_superuser(
+            'admin@test.com', 'adminpassword123')
+        client.force_authenticate(user=admin)
+        response = client.post(url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+
+    def test_ingest_command(self):
+        """
+        Test ingesting a JSON file from the command line
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as feed:
+            json.dump([self.player_row(1)], feed)
+            feed.flush()
+            out = StringIO()
+            call_command('ingest', 'players', feed.name, stdout=out)
+        self.assertIn('Created 1', out.getvalue())
@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+import json
+
+from django.test import TestCase, TransactionTestCase
+
+from core import football_models
+from football import ingest, live
+
+
+def create_clubs():
+    league = football_models.League.objects.create(
+        name='Ekstraklasa', country='PL')
+    home = football_models.Club.objects.create(league=league, name='Legia')
+    away = football_models.Club.objects.create(league=league, name='Lech')
+    return league, home, away
+
+
+class HubTests(TestCase):
+    """
+    Test the in-process pub/sub hub
+    """
+    def test_publish_reaches_matching_subscribers_only(self):
+        """
+        Test that messages are delivered only to subscribed topics
+        """
+        hub = live.Hub(live.LocalBackend())
+
+        async def scenario():
+            match = hub.subscribe({live.topic('match', 1)})
+            league = hub.subscribe({live.topic('league', 7)})
+            delivered = hub.publish([live.topic('match', 1)], {'match': 1})
+            await asyncio.sleep(0)
+            self.assertEqual(delivered, 1)
+            self.assertEqual(await match.get(), {'match': 1})
+            self.assertTrue(league.queue.empty())
+            hub.unsubscribe(match)
+            hub.unsubscribe(league)
+            self.assertEqual(hub.publish([live.topic('match', 1)], {}), 0)
+
+        asyncio.run(scenario())
+
+    def test_full_queue_drops_oldest_message(self):
+        """
+        Test that a slow subscriber keeps only the newest messages
+        """
+        hub = live.Hub(live.LocalBackend())
+
+        async def scenario():
+            subscription = hub.subscribe({'match:1'}, maxsize=2)
+            for score in range(3):
+                hub.publish(['match:1'], {'score': score})
+            await asyncio.sleep(0)
+            self.assertEqual((await subscription.get())['score'], 1)
+            self.assertEqual((await subscription.get())['score'], 2)
+
+        asyncio.run(scenario())
+
+    def test_subscription_topics_parses_query_string(self):
+        """
+        Test parsing match/club/league query parameters
+        """
+        topics = live.subscription_topics('match=1,2&club=3&league=x&foo=4')
+        self.assertEqual(topics, {'match:1', 'match:2', 'club:3'})
+
+
+class LiveScoreSignalTests(TransactionTestCase):
+    """
+    Test that Match saves are published to the hub
+    """
+    def setUp(self):
+        self.league, self.home, self.away = create_clubs()
+        self.hub = live.Hub(live.LocalBackend())
+        self.published = []
+        self.hub.publish = lambda topics, message: self.published.append(
+            (set(topics), message))
+        live._hub = self.hub
+
+    def tearDown(self):
+        live._hub = None
+
+    def test_score_change_is_published(self):
+        """
+        Test that created matches and score changes produce messages
+        """
+        match = football_models.Match.objects.create(
+            home_team=self.home, away_team=self.away,
+            date=datetime.date(2021, 1, 1),
+            home_team_score=0, away_team_score=0)
+        match = football_models.Match.objects.get(pk=match.pk)
+        match.home_team_score = 1
+        match.save()
+
+        self.assertEqual(len(self.published), 2)
+        topics, message = self.published[-1]
+        self.assertEqual(topics, {
+            f'match:{match.pk}', f'club:{self.home.pk}',
+            f'club:{self.away.pk}', f'league:{self.league.pk}'})
+        self.assertEqual(message['home_team_score'], 1)
+        self.assertFalse(message['created'])
+
+    def test_unchanged_score_is_not_published(self):
+        """
+        Test that saving a match without score change publishes nothing
+        """
+        match = football_models.Match.objects.create(
+            home_team=self.home, away_team=self.away,
+            date=datetime.date(2021, 1, 1),
+            home_team_score=0, away_team_score=0)
+        match.date = datetime.date(2021, 1, 2)
+        match.save()
+
+        self.assertEqual(len(self.published), 1)
+
+    def test_ingested_scores_are_published(self):
+        """
+        Test that bulk ingested matches are published once committed,
+        updated ones only when their score changes
+        """
+        match = football_models.Match.objects.create(
+            home_team=self.home, away_team=self.away,
+            date=datetime.date(2021, 1, 1),
+            home_team_score=0, away_team_score=0)
+        del self.published[:]
+        row = {'home_team': self.home.pk, 'away_team': self.away.pk,
+               'date': '2021-01-01', 'home_team_score': 0,
+               'away_team_score': 0}
+        ingest.ingest('matches', [
+            {**row, 'id': match.pk, 'home_team_score': 2},
+            {**row, 'date': '2021-01-08'}])
+        messages = {message['match']: message
+                    for _, message in self.published}
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[match.pk]['home_team_score'], 2)
+        self.assertFalse(messages[match.pk]['created'])
+        created, = set(messages) - {match.pk}
+        self.assertTrue(messages[created]['created'])
+        topics, _ = self.published[0]
+        self.assertIn(f'league:{self.league.pk}', topics)
+
+        del self.published[:]
+        ingest.ingest('matches', [{**row, 'id': match.pk, 'home_team_score': 2,
+                                   'date': '2021-01-02'}])
+        self.assertEqual(self.published, [])
+
+
+class LiveScoreAppTests(TestCase):
+    """
+    Test the Server-Sent Events ASGI application
+    """
+    def setUp(self):
+        live._hub = live.Hub(live.LocalBackend())
+
+    def tearDown(self):
+        live._hub = None
+
+    def test_stream_delivers_published_message(self):
+        """
+        Test that a subscribed client receives score events
+        """
+        sent = []
+
+        async def scenario():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(event):
+                sent.append(event)
+                if len(sent) == 2:
+                    live.get_hub().publish(['match:5'], {'match': 5})
+                if len(sent) == 3:
+                    disconnect.set()
+
+            scope = {'type': 'http', 'method': 'GET',
+                     'path': live.DEFAULT_PATH, 'query_string': b'match=5'}
+            await live.live_scores(scope, receive, send)
+
+        asyncio.run(scenario())
+        self.assertEqual(sent[0]['status'], 200)
+        body = sent[2]['body'].decode()
+        self.assertTrue(body.startswith('event: score\n'))
+        data = body.split('data: ', 1)[1].strip()
+        self.assertEqual(json.loads(data), {'match': 5})
+        self.assertEqual(live.get_hub().backend._subscribers, {})
+
+    def test_stream_requires_topics(self):
+        """
+        Test that subscribing without topics is rejected
+        """
+        sent = []
+
+        async def send(event):
+            sent.append(event)
+
+        scope = {'type': 'http', 'method': 'GET',
+                 'path': live.DEFAULT_PATH, 'query_string': b''}
+        asyncio.run(live.live_scores(scope, None, send))
+        self.assertEqual(sent[0]['status'], 400)
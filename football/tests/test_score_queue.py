@@ -0,0 +1,158 @@
+import datetime
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models, metrics
+from football import score_queue, scores
+
+
+def create_matches():
+    league = football_models.League.objects.create(
+        name='Ekstraklasa', country='PL')
+    legia = football_models.Club.objects.create(league=league, name='Legia')
+    lech = football_models.Club.objects.create(league=league, name='Lech')
+    return [
+        football_models.Match.objects.create(
+            home_team=home, away_team=away, date=datetime.date(2021, 1, 1),
+            home_team_score=0, away_team_score=0)
+        for home, away in ((legia, lech), (lech, legia))
+    ]
+
+
+class ScoreQueueTests(TestCase):
+    """
+    Test coalescing and backpressure of the score queue
+    """
+    def setUp(self):
+        self.match, self.other = create_matches()
+        self.queue = score_queue.ScoreQueue(
+            window=0, max_batch=10, max_pending=5, autostart=False)
+
+    def test_updates_are_coalesced(self):
+        """
+        Test that a batch checks updates in order and writes each match once
+        """
+        futures = [self.queue.submit(scores.ScoreUpdate(*update))
+                   for update in ((self.match.id, 1, 0, 0, 'a:1'),
+                                  (self.other.id, 0, 1, 0, 'b:1'),
+                                  (self.match.id, 2, 0, 1, 'a:2'),
+                                  (self.match.id, 0, 0, 1, 'c:1'),
+                                  (self.match.id, 2, 1, 2, 'a:3'))]
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.queue.flush(), 5)
+        self.assertEqual(len([
+            query for query in captured
+            if query['sql'].startswith('UPDATE "core_match"')]), 2)
+
+        self.assertEqual(futures[4].result()[0]['version'], 3)
+        with self.assertRaises(scores.ScoreConflict):
+            futures[3].result()
+        self.match.refresh_from_db()
+        self.assertEqual(
+            (self.match.home_team_score, self.match.away_team_score,
+             self.match.version, self.match.last_update_id),
+            (2, 1, 3, 'a:3'))
+        standing = football_models.Standing.objects.get(
+            club=self.match.home_team)
+        self.assertEqual((standing.played, standing.goals_for), (2, 3))
+        self.assertEqual(self.queue.stats(), {
+            'submitted': 5, 'coalesced': 3, 'rejected': 0, 'conflicts': 1,
+            'failed': 0, 'flushes': 1, 'pending': 0})
+
+    def test_failed_batch(self):
+        """
+        Test that errors of a batch are set on its futures
+        """
+        future = self.queue.submit(scores.ScoreUpdate(self.match.id, 1, 0, 0))
+        with mock.patch.object(scores, 'apply_updates',
+                               side_effect=ValueError('receiver failed')):
+            with self.assertLogs('football.score_queue', 'ERROR'):
+                self.assertEqual(self.queue.flush(), 1)
+        with self.assertRaises(ValueError):
+            future.result()
+        self.assertEqual(self.queue.stats()['failed'], 1)
+
+        future = self.queue.submit(scores.ScoreUpdate(self.match.id, 1, 0, 0))
+        self.queue.flush()
+        self.assertEqual(future.result()[0]['version'], 1)
+
+    def test_backpressure(self):
+        """
+        Test that submitting beyond the pending limit is rejected
+        """
+        for version in range(5):
+            self.queue.submit(scores.ScoreUpdate(self.match.id, 1, 0, version))
+        with self.assertRaises(score_queue.Overloaded):
+            self.queue.submit(scores.ScoreUpdate(self.match.id, 1, 0, 5))
+        self.assertEqual(self.queue.stats()['rejected'], 1)
+        self.assertIn('score_queue_batch_size', metrics.registry.render())
+
+
+@override_settings(FOOTBALL_SCORE_QUEUE={
+    'ENABLED': True, 'WINDOW_MS': 5, 'ACK': score_queue.ACK_COMMIT})
+class QueuedScoreEndpointTests(TransactionTestCase):
+    """
+    Test the score endpoint writing through the queue thread
+    """
+    def setUp(self):
+        self.match, _ = create_matches()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                email='admin@example.com', password='secret123'))
+        self.url = reverse('football:match-score', args=[self.match.id])
+
+    def test_commit_ack(self):
+        """
+        Test that writers are answered once their update is committed
+        """
+        response = self.client.patch(self.url, {
+            'home_team_score': 1, 'away_team_score': 0, 'version': 0},
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], 1)
+        response = self.client.patch(self.url, {
+            'home_team_score': 2, 'away_team_score': 0, 'version': 0},
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_writer_survives_errors(self):
+        """
+        Test that the queue thread keeps writing after a failed batch
+        """
+        data = {'home_team_score': 1, 'away_team_score': 0, 'version': 0}
+        with mock.patch.object(scores, 'apply_updates',
+                               side_effect=ValueError('receiver failed')):
+            with self.assertLogs('football.score_queue', 'ERROR'):
+                with self.assertRaises(ValueError):
+                    self.client.patch(self.url, data, format='json')
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], 1)
+
+    def test_queued_ack(self):
+        """
+        Test that writers can be answered as soon as the update is queued
+        """
+        queue = score_queue.get_queue()
+        flushes = queue.stats()['flushes']
+        with self.settings(FOOTBALL_SCORE_QUEUE={
+                'ENABLED': True, 'ACK': score_queue.ACK_QUEUED}):
+            response = self.client.patch(self.url, {
+                'home_team_score': 1, 'away_team_score': 0, 'version': 0},
+                format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        deadline = time.monotonic() + 5
+        while queue.stats()['flushes'] == flushes:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.version, 1)
@@ -0,0 +1,192 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from football import ingest, scores
+
+
+class ScoreUpdateTests(TestCase):
+    """
+    Test optimistic concurrency of match score updates
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='secret123')
+        self.client.force_authenticate(self.admin)
+        league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.legia = football_models.Club.objects.create(
+            league=league, name='Legia')
+        self.lech = football_models.Club.objects.create(
+            league=league, name='Lech')
+        self.match = football_models.Match.objects.create(
+            home_team=self.legia, away_team=self.lech,
+            date=datetime.date(2021, 1, 1),
+            home_team_score=0, away_team_score=0)
+        self.url = reverse('football:match-score', args=[self.match.id])
+
+    def patch(self, version, home=1, away=0, update_id=''):
+        return self.client.patch(self.url, {
+            'home_team_score': home, 'away_team_score': away,
+            'version': version, 'update_id': update_id}, format='json')
+
+    def test_update_score(self):
+        """
+        Test that an update at the current version is applied
+        """
+        response = self.patch(0, update_id='feed-a:1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'id': self.match.id, 'home_team_score': 1, 'away_team_score': 0,
+            'version': 1, 'update_id': 'feed-a:1', 'replayed': False})
+        self.match.refresh_from_db()
+        self.assertEqual(
+            (self.match.home_team_score, self.match.version), (1, 1))
+        self.assertEqual(self.legia.standing.points, 3)
+        self.assertTrue(football_models.Change.objects.filter(
+            kind='match', object_id=self.match.id).exists())
+
+    def test_unchanged_score_writes_one_update(self):
+        """
+        Test that the match row costs one read and one update
+        """
+        with self.assertNumQueries(2):
+            scores.update_score(self.match.id, 0, 0, 0)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.version, 1)
+
+    def test_queries_per_update(self):
+        """
+        Test the queries of score changes, conflicts and retries
+        """
+        # Savepoint and release (BEGIN and COMMIT outside of a test), read
+        # of the match, conditional UPDATE, standing rows to create, one
+        # F() update per club, leagues to rerank, ranks (unchanged, not
+        # written), change log, leagues of the clubs to notify
+        with self.assertNumQueries(11):
+            scores.update_score(self.match.id, 1, 0, 0, 'feed-a:1')
+        with self.assertNumQueries(1), self.assertRaises(
+                scores.ScoreConflict):
+            scores.update_score(self.match.id, 2, 0, 0, 'feed-b:1')
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                scores.update_score(self.match.id, 1, 0, 0, 'feed-a:1')[1])
+
+    def test_lost_race(self):
+        """
+        Test that a write since the read turns the update into a conflict
+        """
+        load_states = scores.load_states
+
+        def read_then_write(pks):
+            states = load_states(pks)
+            football_models.Match.objects.filter(pk=self.match.id).update(
+                home_team_score=3, version=1)
+            return states
+
+        with mock.patch.object(scores, 'load_states', read_then_write):
+            with self.assertRaises(scores.ScoreConflict) as conflict:
+                scores.update_score(self.match.id, 1, 0, 0)
+        self.assertEqual(conflict.exception.state['home_team_score'], 3)
+        self.assertEqual(self.legia.standing.played, 1)
+
+    def test_conflict(self):
+        """
+        Test that an update based on an old version is rejected
+        """
+        self.patch(0, update_id='feed-a:1')
+        response = self.patch(0, home=0, away=1, update_id='feed-b:1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['current']['home_team_score'], 1)
+        self.assertEqual(response.data['current']['version'], 1)
+        self.match.refresh_from_db()
+        self.assertEqual(
+            (self.match.away_team_score, self.match.version), (0, 1))
+
+    def test_retry_is_idempotent(self):
+        """
+        Test that retrying the last update answers its result again
+        """
+        self.patch(0, home=2, update_id='feed-a:1')
+        response = self.patch(0, home=2, update_id='feed-a:1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['replayed'])
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual(self.legia.standing.goals_for, 2)
+
+    def test_errors(self):
+        """
+        Test missing matches, invalid bodies and non admin users
+        """
+        self.url = reverse('football:match-score', args=[self.match.id + 1])
+        self.assertEqual(self.patch(0).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.url = reverse('football:match-score', args=[self.match.id])
+        self.assertEqual(self.patch(-1).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            email='user@example.com', password='secret123'))
+        self.assertEqual(self.patch(0).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stale_save_conflicts(self):
+        """
+        Test that saving a match loaded before a score write fails
+        """
+        match = football_models.Match.objects.get(pk=self.match.id)
+        scores.update_score(self.match.id, 2, 0, 0)
+        match.home_team_score = 5
+        with self.assertRaises(football_models.MatchConflict):
+            match.save()
+        self.assertEqual(match.version, 0)
+        standing = football_models.Standing.objects.get(club=self.legia)
+        self.assertEqual((standing.points, standing.goals_for), (3, 2))
+
+        match = football_models.Match.objects.get(pk=self.match.id)
+        match.home_team_score = 5
+        match.save()
+        self.assertEqual(match.version, 2)
+        standing.refresh_from_db()
+        self.assertEqual(standing.goals_for, 5)
+
+    def test_only_lock_errors_are_retried(self):
+        """
+        Test that a busy database answers 503, other errors are raised
+        """
+        with mock.patch.object(scores, 'update_score', side_effect=(
+                OperationalError('database is locked'))):
+            response = self.patch(0)
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        for error in (IntegrityError('NOT NULL constraint failed'),
+                      OperationalError('no such column: version')):
+            with self.subTest(error), mock.patch.object(
+                    scores, 'update_score', side_effect=error):
+                with self.assertRaises(type(error)):
+                    self.patch(0)
+
+    def test_other_writes_bump_version(self):
+        """
+        Test that saves bump the version without loading clubs to clean
+        """
+        match = football_models.Match.objects.get(pk=self.match.id)
+        with self.assertNumQueries(0):
+            match.clean()
+        match.home_team_score = 3
+        match.save()
+        self.assertEqual(match.version, 1)
+        self.assertEqual(self.patch(0).status_code, status.HTTP_409_CONFLICT)
+        ingest.ingest('matches', [{
+            'id': match.id, 'home_team': self.legia.id,
+            'away_team': self.lech.id, 'date': '2021-01-01',
+            'home_team_score': 3, 'away_team_score': 3}])
+        match.refresh_from_db()
+        self.assertEqual(match.version, 2)
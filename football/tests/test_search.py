@@ -0,0 +1,131 @@
+import math
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from football import ingest, search
+
+
+class SearchTests(TestCase):
+    """
+    Test the normalized name search index
+    """
+    def setUp(self):
+        self.client = APIClient()
+        league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.position = football_models.Position.objects.create(
+            short_name='FW', long_name='Forward')
+        self.clubs = {
+            name: football_models.Club.objects.create(
+                league=league, name=name)
+            for name in ('Legia Warszawa', 'Lech Poznań', 'Śląsk Wrocław',
+                         'Polonia Warszawa')
+        }
+
+    def names(self, query, **kwargs):
+        return [result['name'] for result in search.search(query, **kwargs)]
+
+    def test_normalize(self):
+        """
+        Test that accents, case and punctuation are folded
+        """
+        self.assertEqual(search.normalize('  Śląsk  WROCŁAW!'),
+                         'slask wroclaw')
+        self.assertEqual(search.normalize('Müller-Straße'), 'muller strasse')
+
+    def test_prefix_matches_are_ranked(self):
+        """
+        Test that names starting with the query rank before later words
+        """
+        self.assertEqual(self.names('le'), ['Lech Poznań', 'Legia Warszawa'])
+        self.assertEqual(self.names('WARS'),
+                         ['Legia Warszawa', 'Polonia Warszawa'])
+        self.assertEqual(self.names('slask wro'), ['Śląsk Wrocław'])
+
+    def test_fuzzy_matches(self):
+        """
+        Test that misspelled names are found by trigrams
+        """
+        self.assertEqual(self.names('poznam'), ['Lech Poznań'])
+        self.assertEqual(search.search('poznam')[0]['match'], 'fuzzy')
+
+    def test_fuzzy_matches_of_common_trigrams(self):
+        """
+        Test that names found by rare trigrams rank like a full count
+        """
+        for number in range(12):
+            football_models.Player.objects.create(
+                name=f'Player {number}', number=number + 1, age=20,
+                nationality='PL', position=self.position,
+                club=self.clubs['Legia Warszawa'])
+        for query, limit in (('plyer 11', 1), ('plyer 11', 5),
+                             ('plyer 1', 3), ('plyer 99', 5)):
+            grams = search.trigrams(query)
+            required = math.ceil(len(grams) * search.MIN_SIMILARITY)
+            expected = search.shared_counts(
+                football_models.SearchTrigram.objects.filter(
+                    kind='player', trigram__in=grams), required, limit)
+            with self.subTest(query, limit=limit), mock.patch.object(
+                    search, 'COMMON_TRIGRAM_ROWS', 3):
+                self.assertEqual(
+                    search.fuzzy_matches('player', query, limit, {}),
+                    expected)
+
+    def test_fuzzy_matches_only_fill_the_limit(self):
+        """
+        Test that trigrams are not read once prefix matches are enough
+        """
+        with self.assertNumQueries(5):
+            self.assertEqual(self.names('warszawa', limit=2),
+                             ['Legia Warszawa', 'Polonia Warszawa'])
+
+    def test_index_follows_writes(self):
+        """
+        Test that saves, deletes and ingestion keep the index up to date
+        """
+        club = self.clubs['Legia Warszawa']
+        club.name = 'Legia II'
+        club.save()
+        self.assertEqual(self.names('legia'), ['Legia II'])
+        club.delete()
+        self.assertEqual(self.names('legia'), [])
+
+        ingest.ingest('players', [{
+            'name': 'Robert Lewandowski', 'number': 9, 'age': 32,
+            'nationality': 'PL', 'position': self.position.id,
+            'club': self.clubs['Lech Poznań'].id}])
+        self.assertEqual(self.names('lewan', kinds=['player']),
+                         ['Robert Lewandowski'])
+
+    def test_rebuild_command(self):
+        """
+        Test rebuilding the index from the tables
+        """
+        football_models.SearchTerm.objects.all().delete()
+        football_models.SearchTrigram.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', '--kind', 'club', stdout=out)
+        self.assertIn('Indexed 4 clubs', out.getvalue())
+        self.assertEqual(self.names('polo'), ['Polonia Warszawa'])
+
+    def test_search_endpoint(self):
+        """
+        Test the search endpoint and its validation
+        """
+        url = reverse('football:search')
+        response = self.client.get(url, {'q': 'lech', 'kind': 'club'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{
+            'kind': 'club', 'id': self.clubs['Lech Poznań'].id,
+            'name': 'Lech Poznań', 'match': 'prefix'}])
+        response = self.client.get(url, {'q': 'l'})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(url, {'q': 'lech', 'limit': 500})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,147 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+
+
+class StandingsTests(TestCase):
+    """
+    Test incremental maintenance of league standings
+    """
+    def setUp(self):
+        self.league = football_models.League.objects.create(
+            name='Ekstraklasa', country='PL')
+        self.legia, self.lech, self.wisla = [
+            football_models.Club.objects.create(league=self.league, name=name)
+            for name in ('Legia', 'Lech', 'Wisla')
+        ]
+
+    def create_match(self, home, away, home_score, away_score):
+        return football_models.Match.objects.create(
+            home_team=home, away_team=away, date=datetime.date(2021, 1, 1),
+            home_team_score=home_score, away_team_score=away_score)
+
+    def standing(self, club):
+        return football_models.Standing.objects.get(club=club)
+
+    def test_club_gets_standing_on_create(self):
+        """
+        Test that every new club has an empty standing
+        """
+        standing = self.standing(self.legia)
+        self.assertEqual(standing.league, self.league)
+        self.assertEqual(standing.played, 0)
+
+    def test_match_create_updates_standings(self):
+        """
+        Test that a new match updates both clubs and ranks
+        """
+        self.create_match(self.lech, self.legia, 2, 1)
+        lech, legia = self.standing(self.lech), self.standing(self.legia)
+        self.assertEqual(
+            (lech.played, lech.won, lech.points, lech.goals_for), (1, 1, 3, 2))
+        self.assertEqual(
+            (legia.lost, legia.points, legia.goals_against), (1, 0, 2))
+        self.assertEqual(lech.rank, 1)
+        self.assertEqual(legia.rank, 3)
+        self.assertEqual(self.standing(self.wisla).rank, 2)
+
+    def test_match_edit_replaces_contribution(self):
+        """
+        Test that editing a match reverts its old result
+        """
+        match = self.create_match(self.lech, self.legia, 2, 1)
+        match = football_models.Match.objects.get(pk=match.pk)
+        match.away_team_score = 2
+        match.save()
+        lech = self.standing(self.lech)
+        self.assertEqual((lech.played, lech.won, lech.drawn, lech.points),
+                         (1, 0, 1, 1))
+
+    def test_match_team_change_moves_contribution(self):
+        """
+        Test that changing a team moves the result to the new club
+        """
+        match = self.create_match(self.lech, self.legia, 2, 1)
+        match.away_team = self.wisla
+        match.save()
+        self.assertEqual(self.standing(self.legia).played, 0)
+        self.assertEqual(self.standing(self.wisla).lost, 1)
+
+    def test_deferred_match_save(self):
+        """
+        Test that partially loaded matches are diffed against the database
+        """
+        match = self.create_match(self.lech, self.legia, 0, 0)
+        match = football_models.Match.objects.only('pk').get(pk=match.pk)
+        match.home_team_score = 1
+        match.save()
+        self.assertEqual(self.standing(self.lech).won, 1)
+        self.assertEqual(self.standing(self.lech).drawn, 0)
+
+    def test_match_delete_reverts_standings(self):
+        """
+        Test that deleting a match removes its contribution
+        """
+        match = self.create_match(self.lech, self.legia, 2, 1)
+        match.delete()
+        lech = self.standing(self.lech)
+        self.assertEqual((lech.played, lech.points, lech.goals_for), (0, 0, 0))
+
+    def test_club_and_league_delete(self):
+        """
+        Test that deleting clubs with matches reverts their results
+        and closes the gap in the ranks
+        """
+        self.create_match(self.lech, self.legia, 2, 1)
+        self.create_match(self.wisla, self.lech, 0, 1)
+        self.legia.delete()
+        lech, wisla = self.standing(self.lech), self.standing(self.wisla)
+        self.assertEqual((lech.played, lech.won, lech.points), (1, 1, 3))
+        self.assertEqual((lech.rank, wisla.rank), (1, 2))
+        self.assertFalse(football_models.Standing.objects.filter(
+            club_id=self.legia.id).exists())
+
+        club = football_models.Club.objects.create(
+            league=self.league, name='Piast')
+        club.delete()
+        self.assertEqual(self.standing(self.wisla).rank, 2)
+
+        self.league.delete()
+        self.assertFalse(football_models.Standing.objects.exists())
+        self.assertFalse(football_models.Match.objects.exists())
+
+    def test_standings_endpoint(self):
+        """
+        Test that the league table is served without touching matches
+        """
+        self.create_match(self.lech, self.legia, 2, 1)
+        url = reverse('football:league-standings', args=[self.league.id])
+        with self.assertNumQueries(2):
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['club'] for row in response.data],
+                         ['Lech', 'Wisla', 'Legia'])
+        self.assertEqual(response.data[0]['goal_difference'], 1)
+
+    def test_check_and_rebuild_command(self):
+        """
+        Test the consistency check and full rebuild
+        """
+        self.create_match(self.lech, self.legia, 2, 1)
+        call_command('rebuild_standings', '--check', stdout=StringIO())
+        football_models.Standing.objects.filter(club=self.lech).update(
+            points=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_standings', '--check',
+                         stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_standings', stdout=StringIO())
+        self.assertEqual(self.standing(self.lech).points, 3)
+        self.assertEqual(self.standing(self.lech).rank, 1)
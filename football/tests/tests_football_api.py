@@ -1,3 +1,363 @@
-# from django.test import TestCase
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db.models import Count
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import football_models
+from core.routers import ReplicaRouter, use_replica
+from football import caching, fast, serializers
+from football.management.commands import explain_queries
+from football.pagination import MatchCursorPagination
+from football.querysets import related_lookups
+
+
+def create_league(name='Ekstraklasa', country='PL'):
+    return football_models.League.objects.create(name=name, country=country)
+
+
+def create_club(league, name='Legia'):
+    return football_models.Club.objects.create(league=league, name=name)
+
+
+def create_position(short_name='GK', long_name='Goalkeeper'):
+    return football_models.Position.objects.create(
+        short_name=short_name, long_name=long_name)
+
+
+class QueryCountTests(TestCase):
+    """
+    Test that football endpoints run a constant number of queries
+    """
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertConstantQueries(self, url, create_row, num):
+        """
+        Assert that ``url`` runs ``num`` queries for one and for many rows
+        """
+        create_row(0)
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for i in range(1, 20):
+            create_row(i)
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_league_list_query_count(self):
+        """
+        Test listing leagues runs a single query
+        """
+        self.assertConstantQueries(
+            reverse('football:league-list'),
+            lambda i: create_league(name=f'League {i}'), 1)
+
+    def test_club_list_query_count(self):
+        """
+        Test listing clubs does not query league per club
+        """
+        leagues = [create_league(name=f'League {i}') for i in range(3)]
+        self.assertConstantQueries(
+            reverse('football:club-list'),
+            lambda i: create_club(leagues[i % 3], name=f'Club {i}'), 1)
+
+    def test_position_list_query_count(self):
+        """
+        Test listing positions runs a single query
+        """
+        self.assertConstantQueries(
+            reverse('football:position-list'),
+            lambda i: create_position(short_name=f'P{i}'), 1)
+
+    def test_club_detail_query_count(self):
+        """
+        Test retrieving a club joins its league
+        """
+        club = create_club(create_league())
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('football:club-detail', args=[club.id]))
+        self.assertEqual(response.data['league'], club.league.name)
+
+
+class RelatedLookupsTests(TestCase):
+    """
+    Test deriving eager loading from serializer fields
+    """
+    def test_string_related_field_is_selected(self):
+        """
+        Test that StringRelatedField relations are joined
+        """
+        self.assertEqual(
+            related_lookups(serializers.ClubSerializer), (('league',), ()))
+
+    def test_plain_fields_need_no_lookups(self):
+        """
+        Test that serializers without relations need no lookups
+        """
+        self.assertEqual(
+            related_lookups(serializers.PositionSerializer), ((), ()))
+
+
+class CursorPaginationTests(TestCase):
+    """
+    Test cursor pagination of football list endpoints
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('football:position-list')
+        self.positions = [
+            create_position(short_name=f'P{i}') for i in range(5)]
+
+    def test_walk_pages_forward_and_back(self):
+        """
+        Test following next and previous links returns stable pages
+        """
+        response = self.client.get(self.url, {'page_size': 2})
+        first_page = [row['id'] for row in response.data['results']]
+        self.assertEqual(first_page, [p.id for p in self.positions[:2]])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [p.id for p in self.positions[2:4]])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in response.data['results']], first_page)
+        self.assertIsNone(response.data['previous'])
+
+    def test_last_page_has_no_next_link(self):
+        """
+        Test that the last page does not link further
+        """
+        response = self.client.get(self.url, {'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+    def test_page_size_is_capped(self):
+        """
+        Test that page size can not exceed the configured maximum
+        """
+        with self.settings(FOOTBALL_PAGINATION={'MAX_PAGE_SIZE': 3}):
+            response = self.client.get(self.url, {'page_size': 50})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_cursor(self):
+        """
+        Test that a malformed cursor returns 404
+        """
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_composite_keyset_filter(self):
+        """
+        Test the (date, id) keyset condition
+        """
+        paginator = MatchCursorPagination()
+        paginator.fields = ['date', 'id']
+        paginator.descending = [False, False]
+        condition = paginator.keyset_filter(['2021-01-01', '7'])
+        self.assertEqual(
+            str(condition),
+            "(AND: ('date__gte', '2021-01-01'), "
+            "(OR: ('date__gt', '2021-01-01'), "
+            "(AND: ('id__gt', '7'), ('date', '2021-01-01'))))")
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Test validators and response caching of reference data
+    """
+    def setUp(self):
+        caches['football'].clear()
+        self.client = APIClient()
+        self.league = create_league()
+        self.club = create_club(self.league)
+        self.url = reverse('football:club-list')
+
+    def test_if_none_match_returns_304_without_queries(self):
+        """
+        Test that a matching ETag is answered without touching the database
+        """
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_returns_304(self):
+        """
+        Test that an unchanged list is not sent again
+        """
+        # Once the second of the last write is over
+        with mock.patch.object(caching, 'time') as clock:
+            clock.time.return_value = time.time() + 1
+            response = self.client.get(self.url)
+            response = self.client.get(
+                self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_with_writes_in_same_second(self):
+        """
+        Test that a write in the second of Last-Modified is not missed
+        """
+        second = int(time.time()) + 10
+        with mock.patch.object(caching, 'time') as clock:
+            now = clock.time
+            now.return_value = second + 0.2
+            caching.bump_version(football_models.Club)
+            now.return_value = second + 0.3
+            first = self.client.get(self.url)
+            now.return_value = second + 0.7
+            self.club.name = 'Renamed'
+            self.club.save()
+            response = self.client.get(
+                self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['results'][0]['name'], 'Renamed')
+
+            now.return_value = second + 1.5
+            response = self.client.get(
+                self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.get(
+                self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(
+                response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_full_response_is_cached(self):
+        """
+        Test that repeated requests are served from the cache
+        """
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_cached_responses_are_read_from_primary(self):
+        """
+        Test that bodies cached under primary versions are not rendered
+        from a replica
+        """
+        routed = []
+
+        def db_for_read(router, model, **hints):
+            routed.append(use_replica.get())
+            return 'default'
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(routed)
+        self.assertNotIn(True, routed)
+
+    def test_related_write_invalidates_response(self):
+        """
+        Test that renaming a league changes the club list
+        """
+        etag = self.client.get(self.url)['ETag']
+        self.league.name = 'Premier League'
+        self.league.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'][0]['league'],
+                         'Premier League')
+
+    def test_delete_invalidates_response(self):
+        """
+        Test that deleting a club changes the club list
+        """
+        self.client.get(self.url)
+        self.club.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['results'], [])
+
+
+class ExplainQueriesTests(TestCase):
+    """
+    Test that main endpoint queries are backed by indexes
+    """
+    def test_every_query_uses_an_index(self):
+        """
+        Test the explain_queries command passes on the migrated schema
+        """
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertNotIn('NO INDEX', out.getvalue())
+
+    def test_scans_and_unexpected_indexes_fail(self):
+        """
+        Test that index scans and searches on the wrong index are flagged
+        """
+        tables = {'core_searchtrigram'}
+        self.assertTrue(explain_queries.full_scan(
+            'SCAN core_searchtrigram USING COVERING INDEX idx', tables))
+        self.assertFalse(explain_queries.full_scan('SCAN matched', tables))
+
+        # Grouping by object walks every row of the kind
+        grouped = football_models.SearchTrigram.objects.filter(
+            kind='player', trigram__in=['lew', 'ewa']).values(
+                'object_id').annotate(shared=Count('pk'))
+        with mock.patch.object(explain_queries, 'endpoint_queries',
+                               return_value=[('name trigram count', grouped)]):
+            with self.assertRaises(CommandError):
+                call_command('explain_queries', stdout=StringIO())
+
+
+class FastListTests(TestCase):
+    """
+    Test that the lean list path renders the same bytes as the serializers
+    """
+    def setUp(self):
+        self.client = APIClient()
+        caches['football'].clear()
+        league = create_league(name='Liga Żółta', country='ES')
+        create_league(name='Süper Lig', country='TR')
+        create_club(league, name='Atlético')
+        create_club(league, name='Real "B"')
+        create_position()
+        create_position(short_name='ŚP', long_name='Środkowy pomocnik')
+
+    def tearDown(self):
+        caches['football'].clear()
+
+    def get_content(self, url, fast):
+        caches['football'].clear()
+        with self.settings(FOOTBALL_FAST_LISTS=fast):
+            with self.assertNumQueries(1):
+                response = self.client.get(url, {'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content
+
+    def test_fast_lists_are_byte_identical(self):
+        """
+        Test that lists render identically with and without the lean path
+        """
+        for name in ('league-list', 'club-list', 'position-list'):
+            url = reverse(f'football:{name}')
+            with self.subTest(name):
+                self.assertEqual(self.get_content(url, True),
+                                 self.get_content(url, False))
+                response = self.client.get(url, {'page_size': 1})
+                next_url = response.json()['next']
+                self.assertEqual(self.get_content(next_url, True),
+                                 self.get_content(next_url, False))
+
+    def test_unsupported_serializer_has_no_mapper(self):
+        """
+        Test that serializers with computed fields keep the regular path
+        """
+        self.assertIsNone(fast.get_mapper(serializers.StandingSerializer))
+        self.assertIsNotNone(fast.get_mapper(serializers.ClubSerializer))
@@ -6,8 +6,16 @@ router = DefaultRouter()
 router.register(r'leagues', views.LeagueViewSet)
 router.register(r'club', views.ClubViewSet)
 router.register(r'pos', views.PositionViewSet)
+router.register(r'matches', views.MatchViewSet)
 
 app_name = 'football'
 urlpatterns = [
     path(r'', include(router.urls)),
+    path(r'ingest/<str:kind>/', views.IngestView.as_view(), name='ingest'),
+    path(r'matches/<int:pk>/events/', views.MatchEventsView.as_view(),
+         name='match-events'),
+    path(r'search/', views.SearchView.as_view(), name='search'),
+    path(r'fixtures/', views.FixturesView.as_view(), name='fixtures'),
+    path(r'changes/', views.ChangesView.as_view(), name='changes'),
+    path(r'export/<str:kind>/', views.ExportView.as_view(), name='export'),
 ]
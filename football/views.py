@@ -1,28 +1,356 @@
 # from rest_framework import mixins
-from rest_framework import viewsets
+from django.db import OperationalError
+from django.http import (Http404, HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import fields, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from core import football_models
-from football import serializers
+from core.routers import primary_reads
+from football import (analytics, caching, changes, countries, export, fast,
+                      fixtures, ingest, score_queue, scores, search,
+                      serializers)
+from football.parsers import NDJSONParser
+from football.pagination import KeysetCursorPagination, MatchCursorPagination
+from football.querysets import optimize_queryset, related_models
 
 
-class LeagueViewSet(viewsets.ModelViewSet):
+class FootballViewSetMixin:
+    """
+    Eager load relations rendered by the serializer and paginate lists
+    """
+    pagination_class = KeysetCursorPagination
+
+    def get_serializer_class(self):
+        return self.with_country_format(super().get_serializer_class())
+
+    def with_country_format(self, serializer_class):
+        """
+        Render countries as bare codes when asked with ``?country=code``
+        """
+        if countries.wants_codes(getattr(self, 'request', None)):
+            return countries.code_only(serializer_class)
+        return serializer_class
+
+    def get_queryset(self):
+        return optimize_queryset(
+            super().get_queryset(), self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        mapper = fast.get_mapper(self.get_serializer_class()) \
+            if fast.is_enabled() else None
+        if mapper is None:
+            return super().list(request, *args, **kwargs)
+        # Rows are plain dicts of the rendered (and paginated) columns
+        columns = mapper.columns + tuple(
+            field.lstrip('-') for field in self.pagination_class.ordering)
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *dict.fromkeys(columns))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(mapper.map(page))
+        return Response(mapper.map(queryset))
+
+
+class CachedResponseMixin:
+    """
+    Answer list and retrieve with ETag/Last-Modified validators,
+    304 responses and cached JSON bodies
+    """
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_cache_dependencies(self):
+        return sorted(
+            related_models(self.queryset.model, self.get_serializer_class()),
+            key=lambda model: model._meta.label_lower)
+
+    def get_cache_versions(self):
+        return caching.get_versions(self.get_cache_dependencies())
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        versions = self.get_cache_versions()
+        etag = caching.make_etag(
+            request.get_full_path(), request.accepted_media_type, *versions)
+        last_modified = max(versions)
+
+        if caching.is_not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            cached = caching.get_response(etag)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                # Cached under versions bumped on the primary, a replica
+                # behind them would be served until the next write
+                with primary_reads():
+                    response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                response.accepted_renderer = request.accepted_renderer
+                response.accepted_media_type = request.accepted_media_type
+                response.renderer_context = self.get_renderer_context()
+                response.render()
+                caching.set_response(
+                    etag, response.content, response['Content-Type'])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(
+            caching.last_modified_second(last_modified))
+        return response
+
+
+class LeagueViewSet(CachedResponseMixin, FootballViewSetMixin,
+                    viewsets.ModelViewSet):
     """
     Manage Leagues in the database
     """
     queryset = football_models.League.objects.all()
     serializer_class = serializers.LeagueSerializer
 
+    @action(detail=True)
+    def standings(self, request, pk=None):
+        """
+        League table, ordered by rank
+        """
+        league = self.get_object()
+        queryset = optimize_queryset(
+            league.standings.order_by('rank'), serializers.StandingSerializer)
+        serializer = serializers.StandingSerializer(queryset, many=True)
+        return Response(serializer.data)
+
 
-class ClubViewSet(viewsets.ModelViewSet):
+class ClubViewSet(CachedResponseMixin, FootballViewSetMixin,
+                  viewsets.ModelViewSet):
     """
     Manage Clubs in the database
     """
     queryset = football_models.Club.objects.all()
     serializer_class = serializers.ClubSerializer
+    analytics_actions = ('form', 'head_to_head')
+
+    def get_cache_versions(self):
+        if self.action not in self.analytics_actions:
+            return super().get_cache_versions()
+        # Every match write bumps the keys of its clubs, including score
+        # updates which leave the Match model version alone
+        club_ids = [self.kwargs['pk'], self.kwargs.get('opponent')]
+        return caching.get_key_versions([
+            caching.club_matches_key(club_id)
+            for club_id in club_ids if club_id is not None])
+
+    @action(detail=True)
+    def form(self, request, pk=None):
+        """
+        Results of the last matches of a Club
+        """
+        return self.cached_response(self.get_form, request, pk=pk)
+
+    def get_form(self, request, pk=None):
+        last = fields.IntegerField(
+            min_value=1, max_value=analytics.MAX_FORM_LENGTH
+        ).run_validation(request.query_params.get(
+            'last', analytics.DEFAULT_FORM_LENGTH))
+        return Response(analytics.team_form(self.get_object(), last))
 
+    @action(detail=True, url_path=r'head-to-head/(?P<opponent>[0-9]+)',
+            url_name='head-to-head')
+    def head_to_head(self, request, pk=None, opponent=None):
+        """
+        All time record of a Club against another one
+        """
+        return self.cached_response(
+            self.get_head_to_head, request, pk=pk, opponent=opponent)
 
-class PositionViewSet(viewsets.ModelViewSet):
+    def get_head_to_head(self, request, pk=None, opponent=None):
+        opponent = get_object_or_404(football_models.Club, pk=opponent)
+        return Response(
+            analytics.head_to_head(self.get_object(), opponent))
+
+    @action(detail=True)
+    def players(self, request, pk=None):
+        """
+        Squad of a Club, ordered by shirt number
+        """
+        serializer_class = self.with_country_format(
+            serializers.PlayerSerializer)
+        queryset = optimize_queryset(
+            self.get_object().player_set.order_by('number'), serializer_class)
+        return Response(serializer_class(queryset, many=True).data)
+
+
+class PositionViewSet(CachedResponseMixin, FootballViewSetMixin,
+                      viewsets.ModelViewSet):
     """
     Manage Positions in the database
     """
     queryset = football_models.Position.objects.all()
     serializer_class = serializers.PositionSerializer
+
+
+class MatchViewSet(FootballViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    List Matches by date, scores change too often to cache responses
+    """
+    queryset = football_models.Match.objects.all()
+    serializer_class = serializers.MatchSerializer
+    pagination_class = MatchCursorPagination
+    lookup_value_regex = '[0-9]+'
+
+    @action(detail=True, methods=['patch'],
+            permission_classes=[permissions.IsAdminUser])
+    def score(self, request, pk=None):
+        """
+        Update the score if the match is still at the given version,
+        answer 409 with the current score otherwise
+        """
+        serializer = scores.ScoreUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = score_queue.write(scores.ScoreUpdate(
+                int(pk), **serializer.validated_data))
+        except football_models.Match.DoesNotExist:
+            raise Http404
+        except scores.ScoreConflict as exc:
+            return Response({
+                'detail': 'Match was updated since this version.',
+                'current': exc.state,
+            }, status=status.HTTP_409_CONFLICT)
+        except (score_queue.Overloaded, OperationalError) as exc:
+            if not score_queue.should_retry(exc):
+                raise
+            return Response(
+                {'detail': 'Too many score updates, retry later.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'})
+        if result is None:
+            return Response({'queued': True},
+                            status=status.HTTP_202_ACCEPTED)
+        score, replayed = result
+        return Response(dict(score, replayed=replayed))
+
+
+class IngestView(APIView):
+    """
+    Bulk create or update Clubs, Players or Matches from a JSON array
+    or NDJSON body
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request, kind):
+        if kind not in ingest.INGESTORS:
+            raise Http404
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of rows.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = ingest.ingest(kind, request.data)
+        except ingest.IngestError as exc:
+            return Response({'detail': str(exc)},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(report)
+
+
+class ExportView(APIView):
+    """
+    Stream all Clubs, Players or Matches as NDJSON or CSV
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, kind):
+        if kind not in export.EXPORTS:
+            raise Http404
+        filters = export.ExportFilterSerializer(
+            data=request.query_params,
+            context={'export': export.EXPORTS[kind]})
+        filters.is_valid(raise_exception=True)
+        fmt = filters.validated_data['fmt']
+        response = StreamingHttpResponse(
+            export.stream(kind, **filters.validated_data),
+            content_type=export.FORMATS[fmt])
+        response['Content-Disposition'] = \
+            f'attachment; filename="{kind}.{fmt}"'
+        return response
+
+
+class MatchEventsView(APIView):
+    """
+    Events of a Match after a given sequence number
+    """
+    def get(self, request, pk):
+        match = get_object_or_404(football_models.Match.objects.only(
+            'home_team_score', 'away_team_score', 'last_event_sequence'),
+            pk=pk)
+        after = fields.IntegerField(min_value=0).run_validation(
+            request.query_params.get('after', 0))
+        limit = KeysetCursorPagination().get_page_size(request)
+        events = list(match.events.filter(
+            sequence__gt=after).order_by('sequence')[:limit])
+        more = bool(events) and \
+            events[-1].sequence < match.last_event_sequence
+        return Response({
+            'match': match.pk,
+            'home_team_score': match.home_team_score,
+            'away_team_score': match.away_team_score,
+            'last_sequence': match.last_event_sequence,
+            'next_after': events[-1].sequence if more else None,
+            'events': serializers.MatchEventSerializer(
+                events, many=True).data,
+        })
+
+
+class ChangesView(APIView):
+    """
+    Leagues, Clubs, Positions and Matches written or deleted since
+    a version of the change log
+    """
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is not None:
+            since = fields.IntegerField(min_value=0).run_validation(since)
+        limit = KeysetCursorPagination().get_page_size(request)
+        return Response(changes.changes_since(since, limit))
+
+
+class FixturesView(APIView):
+    """
+    Matches of a day grouped by League, served from memory around today
+    """
+    def get(self, request):
+        date = request.query_params.get('date')
+        date = fields.DateField().run_validation(date) if date \
+            else timezone.localdate()
+        league = request.query_params.get('league')
+        if league is not None:
+            league = fields.IntegerField().run_validation(league)
+        return Response(fixtures.fixtures(date, league))
+
+
+class SearchView(APIView):
+    """
+    Clubs and Players ranked by how well their name matches ``q``
+    """
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        kind = request.query_params.get('kind')
+        if kind is not None:
+            kind = fields.ChoiceField(
+                choices=list(search.MODELS)).run_validation(kind)
+        limit = fields.IntegerField(
+            min_value=1, max_value=search.MAX_LIMIT
+        ).run_validation(request.query_params.get(
+            'limit', search.DEFAULT_LIMIT))
+        return Response({'results': search.search(
+            query, [kind] if kind else None, limit)})
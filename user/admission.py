@@ -0,0 +1,184 @@
+"""
+Admission control for password checks of token issuance
+
+Password hashing is CPU bound and deliberately slow. Checks run on a small
+bounded pool, so a burst of logins can occupy at most ``MAX_CONCURRENCY``
+cores, and requests arriving while ``MAX_QUEUE`` checks are already waiting
+are rejected with 503 right away instead of tying up request workers.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_MAX_CONCURRENCY = 2
+DEFAULT_MAX_QUEUE = 8
+DEFAULT_TIMEOUT = 10
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many login attempts in progress, '
+                       'try again later.')
+    default_code = 'overloaded'
+
+
+def _get_option(name, default):
+    return getattr(settings, 'TOKEN_ISSUANCE', {}).get(name, default)
+
+
+class AdmissionController:
+    """
+    Runs tasks on a bounded pool, shedding load by queue depth
+    """
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_queue=DEFAULT_MAX_QUEUE, timeout=DEFAULT_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix='admission')
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.pending >= self.max_concurrency + self.max_queue:
+                self.rejected += 1
+                raise Overloaded()
+            self.pending += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise Overloaded()
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+
+
+password_checks = AdmissionController(
+    max_concurrency=_get_option('MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY),
+    max_queue=_get_option('MAX_QUEUE', DEFAULT_MAX_QUEUE),
+    timeout=_get_option('TIMEOUT', DEFAULT_TIMEOUT),
+)
+
+
+def _check_password(password, encoded):
+    """
+    Returns ``(valid, needs_rehash)`` without touching the database
+    """
+    rehash = []
+    valid = check_password(password, encoded, setter=rehash.append)
+    return valid, bool(rehash)
+
+
+def authenticate(email, password):
+    """
+    Same checks as ``ModelBackend.authenticate``, with password hashing
+    running through ``password_checks``
+    """
+    UserModel = get_user_model()
+    try:
+        user = UserModel._default_manager.get_by_natural_key(email)
+    except UserModel.DoesNotExist:
+        # Hash anyway to reduce the timing difference for unknown users
+        password_checks.run(make_password, password)
+        return None
+    valid, needs_rehash = password_checks.run(
+        _check_password, password, user.password)
+    if not valid or not user.is_active:
+        return None
+    if needs_rehash:
+        user.password = password_checks.run(make_password, password)
+        user.save(update_fields=['password'])
+    return user
+
+
+class SlidingWindow:
+    """
+    In-memory sliding window log of request times per key
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._history = {}
+        self._hits = 0
+
+    def hit(self, key, num_requests, duration, now=None):
+        """
+        Record a request, returns seconds to wait or None if allowed
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            history = self._history.setdefault(key, deque())
+            while history and history[0] <= now - duration:
+                history.popleft()
+            if len(history) >= num_requests:
+                return history[0] + duration - now
+            history.append(now)
+            self._prune(now, duration)
+        return None
+
+    def _prune(self, now, duration):
+        # Forget idle keys from time to time to bound memory
+        self._hits += 1
+        if self._hits % 1024:
+            return
+        for key in [key for key, history in self._history.items()
+                    if not history or history[-1] <= now - duration]:
+            del self._history[key]
+
+    def clear(self):
+        with self._lock:
+            self._history.clear()
+
+
+class LoginRateThrottle(BaseThrottle):
+    """
+    Limits login attempts per client IP and per email,
+    using the ``login`` rate of ``DEFAULT_THROTTLE_RATES``
+    """
+    scope = 'login'
+    window = SlidingWindow()
+    default_rate = '10/min'
+
+    def get_rate(self):
+        rates = api_settings.DEFAULT_THROTTLE_RATES or {}
+        rate = rates.get(self.scope, self.default_rate)
+        num, period = rate.split('/')
+        return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+    def allow_request(self, request, view):
+        num_requests, duration = self.get_rate()
+        keys = [f'ip:{self.get_ident(request)}']
+        email = request.data.get('email') if hasattr(
+            request.data, 'get') else None
+        if email:
+            keys.append(f'email:{str(email).strip().lower()}')
+        self.wait_time = None
+        for key in keys:
+            wait = self.window.hit(key, num_requests, duration)
+            if wait is not None:
+                self.wait_time = wait
+                return False
+        return True
+
+    def wait(self):
+        return self.wait_time
@@ -1,7 +1,9 @@
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from user import admission
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user objects"""
@@ -60,12 +62,12 @@ class AuthTokenSerializer(serializers.Serializer):
         password = attrs.get('password')
 
         if username and password:
-            user = authenticate(request=self.context.get('request'),
-                                username=username, password=password)
+            # Password hashing runs on a bounded pool, raising 503
+            # when too many checks are already waiting
+            user = admission.authenticate(username, password)
 
             # The authenticate call simply returns None for is_active=False
-            # users. (Assuming the default ModelBackend authentication
-            # backend.)
+            # users.
             if not user:
                 msg = _('Unable to log in with provided credentials.')
                 raise serializers.ValidationError(msg, code='authorization')
@@ -0,0 +1,100 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import admission
+
+
+class AdmissionControllerTests(TestCase):
+    """
+    Test the bounded pool running password checks
+    """
+    def test_requests_beyond_queue_depth_are_rejected(self):
+        """
+        Test that a full pool sheds new work instead of queueing it
+        """
+        controller = admission.AdmissionController(
+            max_concurrency=1, max_queue=0)
+        started, release = threading.Event(), threading.Event()
+
+        def blocked():
+            started.set()
+            release.wait()
+            return 'done'
+
+        results = []
+        worker = threading.Thread(
+            target=lambda: results.append(controller.run(blocked)))
+        worker.start()
+        started.wait()
+        with self.assertRaises(admission.Overloaded):
+            controller.run(lambda: None)
+        release.set()
+        worker.join()
+        self.assertEqual(results, ['done'])
+        self.assertEqual(controller.run(lambda: 'next'), 'next')
+        self.assertEqual(controller.rejected, 1)
+
+    def test_sliding_window(self):
+        """
+        Test that old requests leave the window
+        """
+        window = admission.SlidingWindow()
+        self.assertIsNone(window.hit('key', 2, 60, now=0))
+        self.assertIsNone(window.hit('key', 2, 60, now=30))
+        self.assertEqual(window.hit('key', 2, 60, now=45), 15)
+        self.assertIsNone(window.hit('key', 2, 60, now=61))
+
+
+class TokenIssuanceTests(TestCase):
+    """
+    Test admission control of the token endpoint
+    """
+    def setUp(self):
+        admission.LoginRateThrottle.window.clear()
+        self.client = APIClient()
+        self.payload = {'email': 'test@test.com', 'password': 'testpass123'}
+        get_user_model().objects.create_user(**self.payload)
+
+    def tearDown(self):
+        admission.LoginRateThrottle.window.clear()
+
+    def test_token_is_issued(self):
+        """
+        Test that valid credentials still get a token
+        """
+        response = self.client.post(reverse('user:token'), self.payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('token', response.data)
+
+    def test_attempts_are_throttled_per_email(self):
+        """
+        Test that repeated attempts for one email get 429
+        """
+        rest_framework = dict(settings.REST_FRAMEWORK,
+                              DEFAULT_THROTTLE_RATES={'login': '2/min'})
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            for _ in range(2):
+                self.client.post(reverse('user:token'), self.payload)
+            response = self.client.post(reverse('user:token'), self.payload)
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_overloaded_pool_returns_503(self):
+        """
+        Test that logins are shed when too many checks are waiting
+        """
+        checks = admission.password_checks
+        checks.pending += checks.max_concurrency + checks.max_queue
+        try:
+            response = self.client.post(reverse('user:token'), self.payload)
+        finally:
+            checks.pending -= checks.max_concurrency + checks.max_queue
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
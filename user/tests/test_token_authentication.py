@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenCache, token_cache
+
+
+class TokenCacheTests(TestCase):
+    """
+    Test the bounded token cache
+    """
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com', password='testpassword123')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """
+        Test that the cache keeps at most max_size entries
+        """
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', self.user, None)
+        cache.set('b', self.user, None)
+        cache.get('a')
+        cache.set('c', self.user, None)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_expired_entry_is_a_miss(self):
+        """
+        Test that entries expire after their TTL
+        """
+        cache = TokenCache(max_size=2, ttl=0)
+        cache.set('a', self.user, None)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Test authenticating requests through the token cache
+    """
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com', password='testpassword123', name='test')
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('user:manage', kwargs={'pk': self.user.id})
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_query(self):
+        """
+        Test that a cached token saves the authentication query
+        """
+        self.client.get(self.url)
+        hits = token_cache.stats()['hits']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
+
+    def test_deleted_token_is_rejected(self):
+        """
+        Test that deleting a token evicts it
+        """
+        self.client.get(self.url)
+        self.token.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Test that deactivating a user evicts its tokens
+        """
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_evicts_tokens(self):
+        """
+        Test that changing password through the API evicts cached tokens
+        """
+        self.client.patch(self.url, {'password': 'newpass123'})
+        self.assertEqual(token_cache.stats()['size'], 0)
@@ -1,8 +1,10 @@
 from django.contrib.auth import get_user_model
-from rest_framework import authentication, generics, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from user.admission import LoginRateThrottle
+from user.authentication import CachedTokenAuthentication
 from user.permissions import IsOwnerOrAdmin
 from user.serializers import AuthTokenSerializer, UserSerializer
 
@@ -29,7 +31,7 @@ class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """
     serializer_class = UserSerializer
     permission_classes = [IsOwnerOrAdmin, permissions.IsAuthenticated]
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     queryset = get_user_model().objects.all()
 
     # def get_object(self):
@@ -42,3 +44,4 @@ class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
 class CreateAuthToken(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [LoginRateThrottle]